@@ -0,0 +1,169 @@
+"""
+Пакетный разбор: много файлов или zip-архивы в одном запросе (POST /parse-batch/).
+Файлы разбираются параллельно задачами пула разбора на одном снимке справочников;
+в ответе - результат по каждому файлу (варианты товаров или ошибка) и итоги пакета.
+Поврежденный или неподходящий файл не прерывает пакет
+"""
+
+import os
+import time
+import zipfile
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from business_logic import get_reference_snapshot, reference_source
+from pipeline import get_pipeline_executor
+from serialization import encode_with_raw_fields
+from uploads import MAX_UPLOAD_SIZE, SpooledUpload, copy_to_disk, spool_upload, too_large_detail
+
+# Максимум файлов в пакете (с учетом содержимого архивов) и размер всего запроса, МБ
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", 100))
+BATCH_MAX_UPLOAD_SIZE_MB = float(os.getenv("BATCH_MAX_UPLOAD_SIZE_MB", 500))
+BATCH_MAX_UPLOAD_SIZE = int(BATCH_MAX_UPLOAD_SIZE_MB * 1024 * 1024)
+
+EXCEL_EXTENSIONS = (".xlsx", ".xls")
+ZIP_EXTENSION = ".zip"
+
+
+class BatchFile:
+    """Файл пакета: загрузка на диске или причина, по которой файл не разбирается"""
+
+    __slots__ = ("filename", "upload", "error")
+
+    def __init__(self, filename: str, upload: Optional[SpooledUpload] = None, error: Optional[str] = None):
+        self.filename = filename
+        self.upload = upload
+        self.error = error
+
+
+def is_excel_name(name: str) -> bool:
+    return name.lower().endswith(EXCEL_EXTENSIONS)
+
+
+def too_many_files() -> HTTPException:
+    return HTTPException(status_code=400, detail=f"В пакете больше {BATCH_MAX_FILES} файлов")
+
+
+def expand_zip(filename: str, upload: SpooledUpload, max_files: int = BATCH_MAX_FILES,
+               max_size: int = MAX_UPLOAD_SIZE) -> List[BatchFile]:
+    """
+    Книги Excel из архива во временные файлы; каталоги, служебные файлы
+    (__MACOSX, скрытые) и другие форматы пропускаются. Архив удаляется
+    """
+    files: List[BatchFile] = []
+    try:
+        with zipfile.ZipFile(upload.path) as archive:
+            for member in archive.infolist():
+                name = member.filename
+                basename = os.path.basename(name)
+                if member.is_dir() or name.startswith("__MACOSX/") or basename.startswith(".") \
+                        or not is_excel_name(name):
+                    continue
+                if len(files) >= max_files:
+                    raise too_many_files()
+                label = f"{filename}/{name}"
+                if member.file_size > max_size:
+                    files.append(BatchFile(label, error=too_large_detail(max_size)))
+                    continue
+                try:
+                    with archive.open(member) as source:
+                        files.append(BatchFile(label, copy_to_disk(source, os.path.splitext(name)[1], max_size)))
+                except HTTPException as e:
+                    files.append(BatchFile(label, error=e.detail))
+                except Exception as e:
+                    # Зашифрованный файл, неподдерживаемое сжатие, поврежденные данные
+                    files.append(BatchFile(label, error=f"Ошибка чтения файла из архива: {str(e)}"))
+    except zipfile.BadZipFile as e:
+        return [BatchFile(filename, error=f"Ошибка чтения архива: {str(e)}")]
+    except BaseException:
+        remove_batch_files(files)
+        raise
+    finally:
+        upload.remove()
+
+    if not files:
+        return [BatchFile(filename, error="В архиве нет файлов .xlsx или .xls")]
+    return files
+
+
+async def collect_batch_files(files: List[UploadFile]) -> List[BatchFile]:
+    """
+    Загрузки пакета на диск (архивы распаковываются). Неподходящий
+    или слишком большой файл становится ошибкой этого файла
+    """
+    batch: List[BatchFile] = []
+    try:
+        for file in files:
+            name = file.filename or ""
+            if name.lower().endswith(ZIP_EXTENSION):
+                try:
+                    archive = await spool_upload(file, max_size=BATCH_MAX_UPLOAD_SIZE)
+                except HTTPException as e:
+                    batch.append(BatchFile(name, error=e.detail))
+                    continue
+                batch.extend(await run_in_threadpool(expand_zip, name, archive, BATCH_MAX_FILES - len(batch)))
+            elif is_excel_name(name):
+                try:
+                    batch.append(BatchFile(name, await spool_upload(file)))
+                except HTTPException as e:
+                    batch.append(BatchFile(name, error=e.detail))
+            else:
+                await file.close()
+                batch.append(BatchFile(name, error="Формат файла должен быть .xlsx, .xls или .zip"))
+            if len(batch) > BATCH_MAX_FILES:
+                raise too_many_files()
+    except BaseException:
+        remove_batch_files(batch)
+        raise
+    return batch
+
+
+def remove_batch_files(batch: List[BatchFile]):
+    for batch_file in batch:
+        if batch_file.upload is not None:
+            batch_file.upload.remove()
+
+
+async def process_batch(batch: List[BatchFile], engine: str = "streaming",
+                        started: Optional[float] = None) -> bytes:
+    """
+    Разбор файлов пакета и JSON-ответ: итоги пакета и "files" - по файлу
+    в порядке загрузки (варианты товаров или ошибка)
+    """
+    started = time.perf_counter() if started is None else started
+    snapshot = get_reference_snapshot()
+    ready = [(batch_file.filename, batch_file.upload.path) for batch_file in batch if batch_file.upload is not None]
+
+    processing_started = time.perf_counter()
+    results = iter(await get_pipeline_executor().run_batch(ready, reference_source(snapshot), engine))
+    processing_seconds = time.perf_counter() - processing_started
+
+    entries: List[bytes] = []
+    succeeded = products_count = 0
+    for batch_file in batch:
+        if batch_file.upload is None:
+            summary: Dict[str, Any] = {
+                "filename": batch_file.filename,
+                "status": "error",
+                "error_type": "invalid_file",
+                "error": batch_file.error,
+            }
+            body = None
+        else:
+            summary, body = next(results)
+        if body is not None:
+            succeeded += 1
+            products_count += summary["products_count"]
+        entries.append(encode_with_raw_fields(summary, {"products": body} if body is not None else {}))
+
+    return encode_with_raw_fields({
+        "files_count": len(batch),
+        "succeeded": succeeded,
+        "failed": len(batch) - succeeded,
+        "products_count": products_count,
+        "reference_version": snapshot.version,
+        "processing_seconds": round(processing_seconds, 4),
+        "seconds": round(time.perf_counter() - started, 4),
+    }, {"files": b"[" + b",".join(entries) + b"]"})
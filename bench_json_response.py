@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк сериализации ответа /parse-excel/: прежний путь
+JSONResponse(jsonable_encoder(...)) против ProductsJSONResponse
+(стандартный json и orjson, если установлен). Тела ответов должны совпадать
+"""
+
+import time
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+import business_logic
+import serialization
+from business_logic import iter_variant_records
+from price_parser import iter_product_records
+from records import record_to_dict
+from serialization import ProductsJSONResponse
+
+# Строки прайса, из которых собирается лист нужного размера
+SAMPLE_ROWS = [
+    ["Кредо GL(1190,1125)", "м2", "399оп//439гл"],
+    ["Ламонтерра МП", "м2", "520"],
+    ["Монтерроса S МП", "м2", "450гл/480мп"],
+    ["C10(1154,1100)sf", "м2", "362sf"],
+    ["Профнастил С-8", "м2", "362 sf"],
+    ["Квинта+GL(1210,1150)/ Трамонтана S МП(1195,1155)", "м2", "738гл/775мп"],
+]
+
+
+def build_variants(rows_count: int):
+    """Записи вариантов товаров для листа из rows_count строк"""
+    rows = [SAMPLE_ROWS[i % len(SAMPLE_ROWS)] for i in range(rows_count)]
+    return list(iter_variant_records(iter_product_records({"Прайс": rows})))
+
+
+def legacy_response(variants) -> bytes:
+    """Прежний путь: словари, jsonable_encoder и JSONResponse"""
+    products = [record_to_dict(variant) for variant in variants]
+    return JSONResponse(content=jsonable_encoder({
+        "filename": "прайс.xlsx", "products_count": len(products), "products": products
+    })).body
+
+
+def fast_response(variants) -> bytes:
+    return ProductsJSONResponse(content={
+        "filename": "прайс.xlsx", "products_count": len(variants), "products": variants
+    }).body
+
+
+def measure(handler, variants, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        handler(variants)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run_benchmark(rows_count: int = 50000, repeat: int = 3):
+    """Сравнивает время сериализации одного ответа"""
+    business_logic.set_reference_data(business_logic.FALLBACK_PRODUCT_MAPPING,
+                                      business_logic.FALLBACK_MARKUP_RULES)
+    variants = build_variants(rows_count)
+    print("=== Бенчмарк сериализации ответа ===")
+    print(f"Строк: {rows_count}, вариантов: {len(variants)}, orjson: {serialization.orjson is not None}\n")
+
+    expected = legacy_response(variants)
+    modes = [("jsonable_encoder + JSONResponse", legacy_response, None),
+             ("ProductsJSONResponse (json)", fast_response, False)]
+    if serialization.orjson is not None:
+        modes.append(("ProductsJSONResponse (orjson)", fast_response, True))
+
+    saved = serialization.FAST_JSON_ENABLED
+    results = []
+    try:
+        for name, handler, fast in modes:
+            if fast is not None:
+                serialization.FAST_JSON_ENABLED = fast
+            assert handler(variants) == expected, name
+            seconds = measure(handler, variants, repeat)
+            results.append(seconds)
+            print(f"{name:32} {seconds * 1000:8.1f} мс  ({len(expected) / seconds / 1e6:6.1f} МБ/с)")
+    finally:
+        serialization.FAST_JSON_ENABLED = saved
+
+    print(f"\nУскорение: x{results[0] / min(results[1:]):.2f} (тела ответов совпадают побайтно)")
+
+
+if __name__ == "__main__":
+    run_benchmark()
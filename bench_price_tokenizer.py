@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарк разбора ячеек цен: прежний разбор регулярными выражениями
+(классификация + parse_prices/parse_profnastil_price) против токенизатора
+price_tokenizer. Выводит стоимость обработки одной ячейки
+"""
+
+import re
+import timeit
+from business_logic import determine_thickness_coating, profnastil_prices_from_cell
+from price_parser import prices_from_cell
+from price_tokenizer import tokenize_price_cell
+
+# Типичные ячейки из прайсов поставщиков
+SAMPLE_CELLS = [
+    "362sf", "399оп//439гл/421мп", "450гл/480мп", "520двс", "738гл/775мп",
+    "540", "1 234", "362 sf", "700гл/720мп/740", "415оп", "-", "600двс/610двс",
+]
+
+
+def legacy_parse_prices(price_str):
+    """Прежняя реализация price_parser.parse_prices"""
+    prices = []
+    for part in re.split(r"[\/]+", price_str):
+        part = part.strip()
+        if not part or part == "-":
+            continue
+        match = re.match(r"(\d+)([а-яa-z]*)", part, re.IGNORECASE)
+        if match:
+            prices.append({
+                "price": int(match.group(1)),
+                "brand": match.group(2).lower() if match.group(2) else None
+            })
+    return prices
+
+
+def legacy_parse_profnastil_price(price_str):
+    """Прежняя реализация business_logic.parse_profnastil_price"""
+    results = []
+    for part in re.split(r'[/]{1,2}', price_str):
+        part = part.strip()
+        if not part or part == "-":
+            continue
+        match = re.match(r'(\d+)\s*([а-яa-z]*)', part, re.IGNORECASE)
+        if match:
+            price = int(match.group(1))
+            brand = match.group(2).lower() if match.group(2) else None
+            thickness, coating = determine_thickness_coating(brand, price)
+            results.append({"price": price, "brand": brand, "thickness": thickness, "coating": coating})
+    return results
+
+
+def legacy_cell(price, profnastil):
+    """Прежняя обработка ячейки в parse_excel_rows: до трех предварительных проверок"""
+    if not re.search(r'\d', price):
+        return None
+    if re.search(r'\d+(гл|мп|sf|оп|двс)', price):
+        return legacy_parse_profnastil_price(price) if profnastil else legacy_parse_prices(price)
+    match = re.search(r'(\d+)', price)
+    return int(match.group(1)) if match else None
+
+
+def tokenized_cell(price, profnastil):
+    """Обработка ячейки через токенизатор: один проход по строке"""
+    # Сам токенизатор, без мемоизации повторяющихся ячеек (parse_memo)
+    price_cell = tokenize_price_cell.__wrapped__(price)
+    if not price_cell.has_digit:
+        return None
+    if price_cell.has_brand_suffix:
+        return profnastil_prices_from_cell(price_cell) if profnastil else prices_from_cell(price_cell)
+    return price_cell.first_number
+
+
+def run_benchmark(number: int = 20000):
+    """Сравнивает стоимость обработки ячейки до и после"""
+    print("=== Микробенчмарк разбора ячеек цен ===")
+    print(f"Ячеек в наборе: {len(SAMPLE_CELLS)}, повторов: {number}\n")
+
+    for profnastil in (False, True):
+        # Результаты обеих реализаций должны совпадать
+        for price in SAMPLE_CELLS:
+            assert legacy_cell(price, profnastil) == tokenized_cell(price, profnastil), price
+
+        label = "профнастил" if profnastil else "обычные товары"
+        results = {}
+        for name, handler in (("regex (до)", legacy_cell), ("токенизатор (после)", tokenized_cell)):
+            seconds = timeit.timeit(
+                lambda: [handler(price, profnastil) for price in SAMPLE_CELLS], number=number
+            )
+            results[name] = seconds / (number * len(SAMPLE_CELLS)) * 1e9
+            print(f"{label:15} {name:22} {results[name]:8.0f} нс/ячейку")
+
+        before, after = results.values()
+        print(f"{label:15} ускорение: x{before / after:.2f}\n")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк чтения .xlsx: pandas (read_excel_frames), openpyxl в режиме read_only
+и быстрый читатель xlsx_reader - все строки и только столбцы название, единица, цена.
+Книги - из генератора прайсов (price_list_generator): обычная и с лишними столбцами.
+Строки openpyxl и быстрого читателя должны совпадать
+"""
+
+import sys
+import time
+from typing import List
+import excel_parser
+from excel_parser import PRICE_COLUMNS, iter_excel_rows, read_excel_frames
+from price_list_generator import build_workbook, generate_price_list
+
+# Лишние столбцы широкой книги (артикул, остатки, примечания и т.п.)
+EXTRA_COLUMNS = 12
+
+
+def wide_price_list(price_list):
+    """Тот же прайс с EXTRA_COLUMNS заполненными столбцами справа"""
+    return {
+        sheet_name: [row + [f"доп. {index}-{column}" for column in range(EXTRA_COLUMNS)]
+                     for index, row in enumerate(rows)]
+        for sheet_name, rows in price_list.items()
+    }
+
+
+def read_rows(content: bytes, fast: bool, options=None) -> List:
+    saved = excel_parser.XLSX_FAST_READER
+    excel_parser.XLSX_FAST_READER = fast
+    try:
+        return list(iter_excel_rows(content, options=options))
+    finally:
+        excel_parser.XLSX_FAST_READER = saved
+
+
+def read_frames(content: bytes) -> int:
+    return sum(len(frame) for frame in read_excel_frames(content).values())
+
+
+def measure(handler, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        handler()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run_benchmark(sheets: int = 5, rows: int = 5000, repeat: int = 3):
+    """Сравнивает время чтения книг генератора разными способами"""
+    price_list = generate_price_list(sheets, rows, seed=0)
+    workbooks = [("обычная", build_workbook(price_list)),
+                 (f"+{EXTRA_COLUMNS} столбцов", build_workbook(wide_price_list(price_list)))]
+    print("=== Бенчмарк чтения .xlsx ===")
+    print(f"Листов: {sheets}, строк на листе: {rows}\n")
+
+    for label, content in workbooks:
+        # Быстрый читатель отдает те же строки, что openpyxl
+        assert read_rows(content, True) == read_rows(content, False), label
+        assert read_rows(content, True, PRICE_COLUMNS) == read_rows(content, False, PRICE_COLUMNS), label
+
+        modes = [
+            ("pandas read_excel", lambda: read_frames(content)),
+            ("openpyxl read_only", lambda: read_rows(content, False)),
+            ("openpyxl, 3 столбца", lambda: read_rows(content, False, PRICE_COLUMNS)),
+            ("xlsx_reader", lambda: read_rows(content, True)),
+            ("xlsx_reader, 3 столбца", lambda: read_rows(content, True, PRICE_COLUMNS)),
+        ]
+        print(f"Книга {label}: {len(content) / 1024 / 1024:.1f} МБ")
+        results = []
+        for name, handler in modes:
+            seconds = measure(handler, repeat)
+            results.append(seconds)
+            print(f"  {name:24} {seconds * 1000:8.1f} мс  ({sheets * rows / seconds / 1000:7.1f} тыс. строк/с)")
+        print(f"  Ускорение к pandas: x{results[0] / results[-1]:.2f}, к openpyxl: x{results[1] / results[-1]:.2f}\n")
+
+
+if __name__ == "__main__":
+    run_benchmark(*(int(arg) for arg in sys.argv[1:3]))
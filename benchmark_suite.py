@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк этапов разбора на синтетическом прайсе (price_list_generator).
+Отдельно измеряются parse_excel_file, parse_excel_rows, apply_business_rules,
+цепочка iter_pipeline_records, которой разбирает API (движки streaming и columnar),
+и эндпоинт /parse-excel/ целиком: лучшее время из нескольких запусков, строк в секунду
+и пиковая память (tracemalloc, отдельным запуском - трассировка замедляет код).
+Для эндпоинта память считается только в процессе API: разбор идет в пуле процессов.
+
+Справочники - статические данные (FALLBACK_*), кэш результатов выключен.
+Результат сохраняется в JSON, чтобы сравнивать коммиты:
+    python benchmark_suite.py --sheets 5 --rows 2000 --output before.json
+    python benchmark_suite.py --sheets 5 --rows 2000 --output after.json --compare before.json
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi.testclient import TestClient
+
+import business_logic
+import main
+from business_logic import apply_business_rules
+from excel_parser import parse_excel_file
+from pipeline import iter_pipeline_records
+from price_list_generator import build_workbook, generate_price_list
+from price_parser import parse_excel_rows
+
+MB = 1024 * 1024
+
+
+def measure(stage: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    """Лучшее время из repeat запусков и пиковая память отдельного запуска"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = stage()
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        stage()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": round(best, 4), "peak_mb": round(peak / MB, 2), "output_count": output_count(result)}
+
+
+def output_count(result: Any) -> int:
+    if isinstance(result, dict):
+        return sum(len(rows) for rows in result.values())
+    return len(result)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(sheets: int, rows: int, seed: int, repeat: int) -> Dict[str, Any]:
+    """Генерирует прайс и измеряет все этапы"""
+    price_list = generate_price_list(sheets, rows, seed)
+    content = build_workbook(price_list)
+    rows_count = sum(len(sheet_rows) for sheet_rows in price_list.values())
+
+    business_logic.set_reference_data(business_logic.FALLBACK_PRODUCT_MAPPING, business_logic.FALLBACK_MARKUP_RULES)
+    excel_data = parse_excel_file(content)
+    products = parse_excel_rows(excel_data)
+
+    stages = {}
+    stages["parse_excel_file"] = measure(lambda: parse_excel_file(content), repeat)
+    stages["parse_excel_rows"] = measure(lambda: parse_excel_rows(excel_data), repeat)
+    stages["apply_business_rules"] = measure(lambda: apply_business_rules(products), repeat)
+    for engine in ("streaming", "columnar"):  # API разбирает движком PARSER_ENGINE
+        stages[f"pipeline_{engine}"] = measure(lambda: list(iter_pipeline_records(content, engine)), repeat)
+
+    saved_cache = main.RESULT_CACHE_ENABLED
+    main.RESULT_CACHE_ENABLED = False
+    try:
+        with TestClient(main.app) as client:
+            def endpoint():
+                response = client.post("/parse-excel/", files={"file": ("benchmark.xlsx", content)})
+                response.raise_for_status()
+                return response.json()["products"]
+            endpoint()  # прогрев пула разбора
+            stages["endpoint"] = measure(endpoint, repeat)
+    finally:
+        main.RESULT_CACHE_ENABLED = saved_cache
+
+    for stats in stages.values():
+        stats["rows_per_sec"] = round(rows_count / stats["seconds"]) if stats["seconds"] else None
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "parser_engine": main.PARSER_ENGINE,
+        "params": {"sheets": sheets, "rows": rows, "seed": seed, "repeat": repeat},
+        "rows_count": rows_count,
+        "file_bytes": len(content),
+        "stages": stages,
+    }
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    print(f"=== Бенчмарк этапов разбора (коммит {report['commit']}) ===")
+    print(f"Листов: {report['params']['sheets']}, строк: {report['rows_count']}, "
+          f"файл: {report['file_bytes'] / 1024:.0f} КБ\n")
+    for name, stats in report["stages"].items():
+        line = (f"{name:22} {stats['seconds'] * 1000:9.1f} мс {stats['rows_per_sec'] or 0:10} строк/с "
+                f"{stats['peak_mb']:8.1f} МБ  (результат: {stats['output_count']})")
+        previous = (baseline or {}).get("stages", {}).get(name)
+        if previous and stats["seconds"]:
+            line += f"  x{previous['seconds'] / stats['seconds']:.2f} к {baseline.get('commit')}"
+        print(line)
+
+
+def main_cli(argv: List[str]) -> bool:
+    parser = argparse.ArgumentParser(description="Бенчмарк этапов разбора прайса")
+    parser.add_argument("--sheets", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=2000, help="строк на листе")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="benchmark_results.json", help="файл для результатов (JSON)")
+    parser.add_argument("--compare", help="результаты предыдущего запуска для сравнения")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    report = run_suite(args.sheets, args.rows, args.seed, args.repeat)
+    print_report(report, baseline)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты сохранены в {args.output}")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main_cli(sys.argv[1:]) else 1)
@@ -1,81 +1,226 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+import hashlib
+import json
+import os
 import re
+import threading
+from contextlib import contextmanager
 from database import get_db_manager
+from price_tokenizer import PriceCell, tokenize_price_cell
+from mapping_index import ProductMappingIndex
+from fuzzy_index import TrigramIndex
+from reference_cache import ReferenceDataCache, ReferenceSnapshot
+from parse_memo import memoize, on_reference_change as reset_parse_memos
+from records import (ParsedProduct, ProductLike, ProductVariant, ProfnastilVariant, StandardVariant,
+                     SuggestedProduct, as_product, is_suggestion)
 
-# Кэш для данных из БД
-_product_mapping_cache = None
-_markup_rules_cache = None
+# Нечеткий поиск категорий для товаров без соответствия в category_mapping
+FUZZY_MATCH_ENABLED = os.getenv('FUZZY_MATCH_ENABLED', 'false').lower() == 'true'
+FUZZY_MATCH_THRESHOLD = float(os.getenv('FUZZY_MATCH_THRESHOLD', 0.6))
 
-def get_product_mapping() -> Dict[str, Dict[str, str]]:
+# Fallback на статические данные (соответствует category_mapping), если БД недоступна
+FALLBACK_PRODUCT_MAPPING = {
+    "Кредо GL": {"unit": "м2", "category_id": "1156"},
+    "Классик GL": {"unit": "м2", "category_id": "1145"},
+    "Камея GL": {"unit": "м2", "category_id": "1155"},
+    "Квинта+GL": {"unit": "м2", "category_id": "1157"},
+    "Модерн GL": {"unit": "м2", "category_id": "1144"},
+    "Квадро Профи GL": {"unit": "м2", "category_id": "1146"},
+    "Ламонтерра МП": {"unit": "м2", "category_id": "2262"},
+    "Ламонтерра Х МП": {"unit": "м2", "category_id": "2266"},
+    "Монтекристо S": {"unit": "м2", "category_id": "2263"},
+    "Монтерроса S МП": {"unit": "м2", "category_id": "2265"},
+    "Трамонтана S МП": {"unit": "м2", "category_id": "2264"},
+    "Профиль мет. тип \"Монтеррей\"": {"unit": "м2", "category_id": "2393"},
+    "Профнастил С-8": {"unit": "м2", "category_id": "2291"},
+    "Профнастил C10 фигурный": {"unit": "м2", "category_id": "2393"},
+    "Профнастил МП-10": {"unit": "м2", "category_id": "1142"},
+    "Профнастил GL-10": {"unit": "м2", "category_id": "1142"},
+    "Профнастил C10": {"unit": "м2", "category_id": "1142"},
+    "Профнастил С-20": {"unit": "м2", "category_id": "1140"},
+    "Профнастил С-21": {"unit": "м2", "category_id": "1141"},
+    "Профнастил С-44": {"unit": "м2", "category_id": "2258"},
+    "Профнастил НС-35": {"unit": "м2", "category_id": "1148"},
+    "Плоский лист": {"unit": "м2", "category_id": "1393"},
+}
+
+# Fallback на статические данные наценок
+FALLBACK_MARKUP_RULES = [
+    {"color": "1015", "coating": "PE 0,45", "region": "spb_nn_kirov_penza", "markup": 7.0, "unit_markup": 0.7},
+    {"color": "1018", "coating": "Satin", "region": "all", "markup": 50.0, "unit_markup": 5.0},
+    {"color": "standard", "coating": "PE 0,45 двс", "region": "all", "markup": 50.0, "unit_markup": 5.0},
+    {"color": "standard", "coating": "PE 0,7", "region": "all", "markup": 50.0, "unit_markup": 5.0},
+    {"color": "standard", "coating": "PE 0,8", "region": "all", "markup": 55.0, "unit_markup": 5.5},
+]
+
+def build_reference_snapshot(product_mapping: Dict[str, Dict[str, str]], markup_rules: List[Dict[str, Any]],
+                             db_version: Optional[str] = None, is_fallback: bool = False) -> ReferenceSnapshot:
     """
-    Получает соответствие товаров и категорий из БД с кэшированием
+    Собирает снимок справочных данных и строит по нему индексы поиска
     """
-    global _product_mapping_cache
+    content = json.dumps([list(product_mapping.items()), markup_rules], ensure_ascii=False, default=str)
+    version = hashlib.sha1(content.encode("utf-8")).hexdigest()[:16]
     
-    if _product_mapping_cache is None:
-        try:
-            db = get_db_manager()
-            _product_mapping_cache = db.get_product_categories()
-        except Exception as e:
-            print(f"Ошибка получения категорий из БД: {e}")
-            # Fallback на статические данные (соответствует category_mapping)
-            _product_mapping_cache = {
-                "Кредо GL": {"unit": "м2", "category_id": "1156"},
-                "Классик GL": {"unit": "м2", "category_id": "1145"},
-                "Камея GL": {"unit": "м2", "category_id": "1155"},
-                "Квинта+GL": {"unit": "м2", "category_id": "1157"},
-                "Модерн GL": {"unit": "м2", "category_id": "1144"},
-                "Квадро Профи GL": {"unit": "м2", "category_id": "1146"},
-                "Ламонтерра МП": {"unit": "м2", "category_id": "2262"},
-                "Ламонтерра Х МП": {"unit": "м2", "category_id": "2266"},
-                "Монтекристо S": {"unit": "м2", "category_id": "2263"},
-                "Монтерроса S МП": {"unit": "м2", "category_id": "2265"},
-                "Трамонтана S МП": {"unit": "м2", "category_id": "2264"},
-                "Профиль мет. тип \"Монтеррей\"": {"unit": "м2", "category_id": "2393"},
-                "Профнастил С-8": {"unit": "м2", "category_id": "2291"},
-                "Профнастил C10 фигурный": {"unit": "м2", "category_id": "2393"},
-                "Профнастил МП-10": {"unit": "м2", "category_id": "1142"},
-                "Профнастил GL-10": {"unit": "м2", "category_id": "1142"},
-                "Профнастил C10": {"unit": "м2", "category_id": "1142"},
-                "Профнастил С-20": {"unit": "м2", "category_id": "1140"},
-                "Профнастил С-21": {"unit": "м2", "category_id": "1141"},
-                "Профнастил С-44": {"unit": "м2", "category_id": "2258"},
-                "Профнастил НС-35": {"unit": "м2", "category_id": "1148"},
-                "Плоский лист": {"unit": "м2", "category_id": "1393"},
-            }
+    snapshot = ReferenceSnapshot(product_mapping, markup_rules, version, db_version, is_fallback)
+    snapshot.mapping_index = ProductMappingIndex(product_mapping)
+    snapshot.markup_index = MarkupIndex(markup_rules)
+    if FUZZY_MATCH_ENABLED:
+        snapshot.fuzzy_index = TrigramIndex(product_mapping)
+    return snapshot
+
+def load_reference_snapshot() -> ReferenceSnapshot:
+    """
+    Загружает категории и наценки из БД.
+    Пустой результат означает ошибку запроса (execute_query возвращает []),
+    такие данные не кэшируются как рабочие - используется fallback
+    """
+    db_version = None
+    product_mapping = {}
+    markup_rules = []
     
-    return _product_mapping_cache
+    try:
+        db = get_db_manager()
+        db_version = db.get_reference_data_version()
+        product_mapping = db.get_product_categories()
+        markup_rules = db.get_markup_rules()
+    except Exception as e:
+        print(f"Ошибка получения справочников из БД: {e}")
+    
+    is_fallback = not product_mapping or not markup_rules
+    if not product_mapping:
+        print("Категории из БД не получены, используются статические данные")
+        product_mapping = FALLBACK_PRODUCT_MAPPING
+    if not markup_rules:
+        print("Наценки из БД не получены, используются статические данные")
+        markup_rules = FALLBACK_MARKUP_RULES
+    
+    return build_reference_snapshot(product_mapping, markup_rules, db_version, is_fallback)
+
+def check_reference_version() -> Optional[str]:
+    """
+    Дешевая проверка изменений справочников в БД
+    """
+    try:
+        return get_db_manager().get_reference_data_version()
+    except Exception as e:
+        print(f"Ошибка проверки версии справочников: {e}")
+        return None
+
+# Кэш для данных из БД (TTL, фоновое обновление, атомарная подмена снимка)
+_reference_cache = ReferenceDataCache(load_reference_snapshot, check_reference_version)
+# Запомненные результаты разбора сбрасываются вместе со снимком (в т.ч. clear_cache)
+_reference_cache.add_listener(reset_parse_memos)
+
+def get_reference_cache() -> ReferenceDataCache:
+    """Кэш справочных данных процесса"""
+    return _reference_cache
+
+# Снимок, закрепленный за потоком (пакетная обработка: все файлы пакета - по одному снимку)
+_pinned = threading.local()
+
+def get_reference_snapshot() -> ReferenceSnapshot:
+    """
+    Текущий снимок справочных данных (категории, наценки и индексы)
+    """
+    snapshot = getattr(_pinned, "snapshot", None)
+    if snapshot is not None:
+        return snapshot
+    return _reference_cache.get()
+
+@contextmanager
+def pinned_reference_snapshot(snapshot: ReferenceSnapshot) -> Iterator[ReferenceSnapshot]:
+    """
+    Внутри блока with поток использует snapshot, даже если кэш
+    справочников тем временем обновился
+    """
+    previous = getattr(_pinned, "snapshot", None)
+    _pinned.snapshot = snapshot
+    try:
+        yield snapshot
+    finally:
+        _pinned.snapshot = previous
+
+# Данные снимка без индексов: (версия, категории, наценки, версия в БД, признак fallback)
+ReferenceSource = Tuple[str, Dict[str, Dict[str, str]], List[Dict[str, Any]], Optional[str], bool]
+
+# Последний снимок, построенный по переданным данным (reference_source), в этом процессе
+_source_snapshot: Optional[ReferenceSnapshot] = None
+
+def reference_source(snapshot: ReferenceSnapshot) -> ReferenceSource:
+    """
+    Данные снимка для передачи в рабочий процесс (индексы строятся на месте)
+    """
+    return (snapshot.version, snapshot.product_mapping, snapshot.markup_rules,
+            snapshot.db_version, snapshot.is_fallback)
+
+def snapshot_from_source(source: ReferenceSource) -> ReferenceSnapshot:
+    """
+    Снимок той же версии, что и source: текущий снимок процесса, если версии
+    совпадают, иначе построенный по переданным данным (строится один раз на версию)
+    """
+    global _source_snapshot
+    version, product_mapping, markup_rules, db_version, is_fallback = source
+    current = _reference_cache.get()
+    if current.version == version:
+        return current
+    snapshot = _source_snapshot
+    if snapshot is None or snapshot.version != version:
+        snapshot = _source_snapshot = build_reference_snapshot(product_mapping, markup_rules, db_version, is_fallback)
+    return snapshot
+
+def get_product_mapping() -> Dict[str, Dict[str, str]]:
+    """
+    Получает соответствие товаров и категорий из БД с кэшированием
+    """
+    return get_reference_snapshot().product_mapping
+
+def get_product_mapping_index() -> ProductMappingIndex:
+    """
+    Возвращает индекс для поиска категорий текущего снимка
+    """
+    return get_reference_snapshot().mapping_index
+
+def get_fuzzy_index() -> TrigramIndex:
+    """
+    Возвращает триграммный индекс категорий текущего снимка
+    (если нечеткий поиск был выключен при загрузке - строит при первом запросе)
+    """
+    snapshot = get_reference_snapshot()
+    if snapshot.fuzzy_index is None:
+        snapshot.fuzzy_index = TrigramIndex(snapshot.product_mapping)
+    return snapshot.fuzzy_index
 
 def get_markup_rules() -> List[Dict[str, Any]]:
     """
     Получает правила наценок из БД с кэшированием
     """
-    global _markup_rules_cache
-    
-    if _markup_rules_cache is None:
-        try:
-            db = get_db_manager()
-            _markup_rules_cache = db.get_markup_rules()
-        except Exception as e:
-            print(f"Ошибка получения наценок из БД: {e}")
-            # Fallback на статические данные
-            _markup_rules_cache = [
-                {"color": "1015", "coating": "PE 0,45", "region": "spb_nn_kirov_penza", "markup": 7.0, "unit_markup": 0.7},
-                {"color": "1018", "coating": "Satin", "region": "all", "markup": 50.0, "unit_markup": 5.0},
-                {"color": "standard", "coating": "PE 0,45 двс", "region": "all", "markup": 50.0, "unit_markup": 5.0},
-                {"color": "standard", "coating": "PE 0,7", "region": "all", "markup": 50.0, "unit_markup": 5.0},
-                {"color": "standard", "coating": "PE 0,8", "region": "all", "markup": 55.0, "unit_markup": 5.5},
-            ]
-    
-    return _markup_rules_cache
+    return get_reference_snapshot().markup_rules
+
+def get_markup_index() -> "MarkupIndex":
+    """
+    Возвращает индекс наценок текущего снимка
+    """
+    return get_reference_snapshot().markup_index
+
+def set_reference_data(product_mapping: Dict[str, Dict[str, str]], markup_rules: List[Dict[str, Any]]) -> ReferenceSnapshot:
+    """
+    Устанавливает справочные данные напрямую, минуя БД
+    """
+    snapshot = build_reference_snapshot(product_mapping, markup_rules)
+    _reference_cache.install(snapshot)
+    return snapshot
+
+def refresh_reference_data() -> ReferenceSnapshot:
+    """
+    Принудительно перезагружает справочники из БД и атомарно подменяет снимок
+    """
+    return _reference_cache.refresh()
 
 def clear_cache():
     """
     Очищает кэш данных БД (для обновления данных)
     """
-    global _product_mapping_cache, _markup_rules_cache
-    _product_mapping_cache = None
-    _markup_rules_cache = None
+    _reference_cache.invalidate()
 
 
 # Таблица толщин и покрытий для профнастила
@@ -99,6 +244,12 @@ PROFNASTIL_THICKNESS_COATING = {
     "pe_0.45_dvs": {"coating": "Полиэстер", "thickness": "0,45двс", "coating_code": "PE"},
 }
 
+# Точные совпадения для профнастила (подстроки в названии в нижнем регистре)
+PROFNASTIL_KEYWORDS = [
+    "профнастил", "плоский лист", "мп-10", "с-8", "с-20", "с-21",
+    "с-44", "нс-35", "gl-10", "c10"
+]
+
 
 def extract_base_name(product_name: str) -> str:
     """
@@ -114,41 +265,81 @@ def find_product_mapping(product_name: str) -> Optional[Dict[str, Any]]:
     """
     Находит соответствие товара в таблице категорий из БД
     """
+    # Индекс снимка входит в ключ: результат для прежних справочников не вернется
+    return _find_product_mapping(get_product_mapping_index(), product_name)
+
+@memoize("find_product_mapping")
+def _find_product_mapping(mapping_index: ProductMappingIndex, product_name: str) -> Optional[Dict[str, Any]]:
     base_name = extract_base_name(product_name)
-    product_mapping = get_product_mapping()
     
-    # Точное совпадение
-    if base_name in product_mapping:
-        return product_mapping[base_name]
+    # Точное совпадение, затем частичное (ключ входит в название или
+    # название в ключ) - через индекс, без перебора всех категорий
+    return mapping_index.find(base_name)
+
+def suggest_product_mapping(product_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Подсказка категории для товара без соответствия: лучший кандидат
+    нечеткого поиска, если его оценка не ниже FUZZY_MATCH_THRESHOLD
+    """
+    if not FUZZY_MATCH_ENABLED:
+        return None
+    
+    match = get_fuzzy_index().best_match(product_name)
+    if match is None or match.score < FUZZY_MATCH_THRESHOLD:
+        return None
+    
+    # category_id не заполняется: категорию подтверждает оператор
+    return {
+        "category_id": None,
+        "unit": match.mapping["unit"],
+        "suggested_category_id": match.mapping["category_id"],
+        "suggested_category_name": match.name,
+        "match_score": round(match.score, 3),
+    }
+
+# Регионы, наценки которых применяются: "all" или регионы, включающие НН (Дружный)
+MARKUP_REGIONS = ("all", "spb_nn_kirov_penza")
+
+class MarkupIndex:
+    """
+    Правила наценок, заранее отобранные по региону и покрытию.
+    Строится один раз на загрузку кэша наценок, дальше выбор наценок
+    для товара - поиск в словаре вместо прохода по всем правилам
+    """
     
-    # Частичное совпадение
-    for key, value in product_mapping.items():
-        if key in base_name or base_name in key:
-            return value
+    def __init__(self, markup_rules: List[Dict[str, Any]]):
+        self.rules = markup_rules
+        
+        # Наценки для товаров без покрытия: все правила подходящих регионов
+        self.without_coating: Tuple[Dict[str, Any], ...] = tuple(
+            markup for markup in markup_rules if markup["region"] in MARKUP_REGIONS
+        )
+        
+        # Покрытие товара -> правила, покрытие которых входит в него.
+        # Заранее заполняется для покрытий из самих правил, остальные - при первом запросе
+        self.by_coating: Dict[str, Tuple[Dict[str, Any], ...]] = {}
+        for markup in self.without_coating:
+            self.for_coating(markup["coating"])
     
-    return None
+    def for_coating(self, coating: Optional[str]) -> Tuple[Dict[str, Any], ...]:
+        """
+        Применимые наценки для покрытия товара (в порядке правил)
+        """
+        if not coating:
+            return self.without_coating
+        
+        applicable = self.by_coating.get(coating)
+        if applicable is None:
+            applicable = tuple(markup for markup in self.without_coating if markup["coating"] in coating)
+            self.by_coating[coating] = applicable
+        return applicable
 
 def get_applicable_markups(product_name: str, coating: str = None) -> List[Dict[str, Any]]:
     """
     Возвращает применимые наценки для товара из БД
     Фильтрует только наценки для Дружный (НН) или всех регионов
     """
-    applicable = []
-    markup_rules = get_markup_rules()
-    
-    for markup in markup_rules:
-        # Проверяем регион - только "all" или регионы, включающие НН (Дружный)
-        region = markup["region"]
-        if region not in ["all", "spb_nn_kirov_penza"]:
-            continue
-            
-        # Проверяем, подходит ли покрытие
-        if coating and markup["coating"] not in coating:
-            continue
-            
-        applicable.append(markup)
-    
-    return applicable
+    return list(get_markup_index().for_coating(coating))
 
 def parse_profnastil_price(price_str: str) -> List[Dict[str, Any]]:
     """
@@ -156,31 +347,29 @@ def parse_profnastil_price(price_str: str) -> List[Dict[str, Any]]:
     Пример: "362 sf" -> [{"price": 362, "brand": "sf", "thickness": "0,3", "coating": "Цинк"}]
     Пример: "399оп//439гл/421мп" -> [{"price": 399, "brand": "оп", ...}, {"price": 439, "brand": "гл", ...}]
     """
+    return [dict(price) for price in _profnastil_prices(price_str)]
+
+@memoize("parse_profnastil_price")
+def _profnastil_prices(price_str: str) -> Tuple[Dict[str, Any], ...]:
+    """Запоминаемый результат разбора; словари копирует parse_profnastil_price"""
+    return tuple(profnastil_prices_from_cell(tokenize_price_cell(price_str)))
+
+def profnastil_prices_from_cell(price_cell: PriceCell) -> List[Dict[str, Any]]:
+    """
+    Цены профнастила из токенов ячейки (бренд может быть отделен пробелом)
+    """
     results = []
     
-    # Разделяем по // и /
-    parts = re.split(r'[/]{1,2}', price_str)
-    
-    for part in parts:
-        part = part.strip()
-        if not part or part == "-":
-            continue
-            
-        # Ищем цену и бренд
-        match = re.match(r'(\d+)\s*([а-яa-z]*)', part, re.IGNORECASE)
-        if match:
-            price = int(match.group(1))
-            brand = match.group(2).lower() if match.group(2) else None
-            
-            # Определяем толщину и покрытие по бренду
-            thickness, coating = determine_thickness_coating(brand, price)
-            
-            results.append({
-                "price": price,
-                "brand": brand,
-                "thickness": thickness,
-                "coating": coating
-            })
+    for token in price_cell.tokens:
+        # Определяем толщину и покрытие по бренду
+        thickness, coating = determine_thickness_coating(token.brand, token.price)
+        
+        results.append({
+            "price": token.price,
+            "brand": token.brand,
+            "thickness": thickness,
+            "coating": coating
+        })
     
     return results
 
@@ -243,20 +432,15 @@ def determine_thickness_coating(brand: str, price: int) -> tuple:
     
     return thickness, coating
 
+@memoize("is_profnastil_product")
 def is_profnastil_product(product_name: str) -> bool:
     """
     Проверяет, является ли товар профнастилом
     """
     name_lower = product_name.lower()
     
-    # Точные совпадения для профнастила
-    profnastil_exact = [
-        "профнастил", "плоский лист", "мп-10", "с-8", "с-20", "с-21", 
-        "с-44", "нс-35", "gl-10", "c10"
-    ]
-    
     # Проверяем точные совпадения
-    for keyword in profnastil_exact:
+    for keyword in PROFNASTIL_KEYWORDS:
         if keyword in name_lower:
             return True
     
@@ -268,112 +452,89 @@ def is_profnastil_product(product_name: str) -> bool:
     
     return False
 
-def process_profnastil_product(product: Dict[str, Any]) -> List[Dict[str, Any]]:
+def profnastil_variants(product: ParsedProduct) -> List[ProductVariant]:
     """
-    Обрабатывает товары профнастила с определением толщины и покрытия
+    Варианты профнастила с толщиной и покрытием (записи ProfnastilVariant);
+    для подсказки нечеткого поиска - одна запись SuggestedProduct без цены продажи
     """
-    variants = []
-    
-    # Находим категорию товара
-    mapping = find_product_mapping(product["parsed_name"])
+    # Находим категорию товара (или подсказку нечеткого поиска)
+    mapping = find_product_mapping(product.parsed_name) or suggest_product_mapping(product.parsed_name)
     if not mapping:
-        return variants
+        return []
+    if is_suggestion(mapping):
+        return [SuggestedProduct(product, mapping)]
     
-    # Если есть информация о толщине и покрытии из парсинга цен
-    if "thickness" in product and "coating" in product:
-        thickness = product["thickness"]
-        coating = product["coating"]
-        
-        # Создаем вариант с определенной толщиной и покрытием
-        variant = {
-            "original_name": product["original_name"],
-            "parsed_name": product["parsed_name"],
-            "category_id": mapping["category_id"],
-            "unit": mapping["unit"],
-            "base_price": product["price"],
-            "final_price": product["price"],  # Для профнастила пока без наценок
-            "markup": 0,
-            "thickness": thickness,
-            "coating": coating,
-            "brand": product.get("brand"),
-            "sheet": product.get("sheet"),
-            "product_type": "profnastil"
-        }
-        variants.append(variant)
-    else:
-        # Если нет информации о толщине/покрытии, создаем базовый вариант
-        variant = {
-            "original_name": product["original_name"],
-            "parsed_name": product["parsed_name"],
-            "category_id": mapping["category_id"],
-            "unit": mapping["unit"],
-            "base_price": product["price"],
-            "final_price": product["price"],
-            "markup": 0,
-            "thickness": "0,35",  # По умолчанию
-            "coating": "Цинк",    # По умолчанию
-            "brand": product.get("brand"),
-            "sheet": product.get("sheet"),
-            "product_type": "profnastil"
-        }
-        variants.append(variant)
+    # Если есть информация о толщине и покрытии из парсинга цен - используем ее,
+    # иначе базовый вариант с толщиной и покрытием по умолчанию
+    if product.thickness is not None:
+        return [ProfnastilVariant(product, mapping, product.thickness, product.coating)]
+    return [ProfnastilVariant(product, mapping, "0,35", "Цинк")]
+
+def standard_variants(product: ParsedProduct) -> List[ProductVariant]:
+    """
+    Варианты обычного товара по цветам/покрытиям (записи StandardVariant);
+    для подсказки нечеткого поиска - одна запись SuggestedProduct без наценок
+    """
+    # Находим категорию товара (или подсказку нечеткого поиска)
+    mapping = find_product_mapping(product.parsed_name) or suggest_product_mapping(product.parsed_name)
+    if not mapping:
+        return []
+    if is_suggestion(mapping):
+        return [SuggestedProduct(product, mapping)]
     
-    return variants
+    # Находим применимые наценки (готовый кортеж из индекса); вариант ссылается
+    # на товар, категорию и правило наценки, а не копирует их поля
+    price = product.price
+    return [
+        StandardVariant(product, mapping, markup, price + markup["markup"])
+        for markup in get_markup_index().for_coating(product.coating)
+    ]
+
+def process_profnastil_product(product: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Обрабатывает товары профнастила с определением толщины и покрытия
+    """
+    return [variant.to_dict() for variant in profnastil_variants(as_product(product))]
 
 def process_standard_product(product: Dict[str, Any]) -> List[Dict[str, Any]]:
     """
     Обрабатывает обычные товары (не профнастил)
     """
-    variants = []
-    
-    # Находим категорию товара
-    mapping = find_product_mapping(product["parsed_name"])
-    if not mapping:
-        return variants
-        
-    # Находим применимые наценки
-    markups = get_applicable_markups(product["parsed_name"], product.get("coating"))
-    
-    # Создаем варианты товара с разными цветами/покрытиями
-    for markup in markups:
-        final_price = product["price"] + markup["markup"]
-        
-        variant = {
-            "original_name": product["original_name"],
-            "parsed_name": product["parsed_name"],
-            "category_id": mapping["category_id"],
-            "unit": mapping["unit"],
-            "base_price": product["price"],
-            "final_price": final_price,
-            "markup": markup["markup"],
-            "color": markup["color"],
-            "coating": markup["coating"],
-            "region": markup["region"],
-            "brand": product.get("brand"),
-            "sheet": product.get("sheet"),
-            "product_type": "standard"
-        }
-        
-        variants.append(variant)
-    
-    return variants
+    return [variant.to_dict() for variant in standard_variants(as_product(product))]
 
-def apply_business_rules(products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def iter_variant_records(products: Iterable[ProductLike], stats=None) -> Iterator[ProductVariant]:
     """
-    Применяет бизнес-правила: категории, наценки, создание вариантов по цветам
-    Специальная обработка для профнастила с толщиной и покрытием
+    Бизнес-правила над записями товаров: варианты отдаются записями
+    (словари строятся только на границе API, см. records.record_to_dict).
+    stats (metrics.PipelineStats) - счетчики товаров без категории и с подсказкой категории
     """
-    enriched_products = []
-    
     for product in products:
+        product = as_product(product)
         # Проверяем, является ли товар профнастилом
-        if is_profnastil_product(product["parsed_name"]):
+        if is_profnastil_product(product.parsed_name):
             # Специальная обработка профнастила
-            profnastil_variants = process_profnastil_product(product)
-            enriched_products.extend(profnastil_variants)
+            variants = profnastil_variants(product)
         else:
             # Обычная обработка товаров
-            standard_variants = process_standard_product(product)
-            enriched_products.extend(standard_variants)
-    
-    return enriched_products
+            variants = standard_variants(product)
+        if stats is not None:
+            if not variants:
+                stats.unmatched += 1
+            elif type(variants[0]) is SuggestedProduct:
+                stats.suggested += 1
+        yield from variants
+
+def iter_business_rules(products: Iterable[ProductLike]) -> Iterator[Dict[str, Any]]:
+    """
+    Потоковый вариант apply_business_rules: варианты товаров отдаются
+    по мере обработки, без накопления всего результата
+    """
+    for variant in iter_variant_records(products):
+        yield variant.to_dict()
+
+def apply_business_rules(products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Применяет бизнес-правила: категории, наценки, создание вариантов по цветам
+    Специальная обработка для профнастила с толщиной и покрытием
+    """
+    return list(iter_business_rules(products))
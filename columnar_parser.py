@@ -0,0 +1,220 @@
+"""
+Колоночный движок разбора прайса на pandas.
+Обрабатывает столбцы названий/единиц/цен целиком вместо цикла по строкам
+и возвращает тот же список товаров, что и price_parser.parse_excel_rows
+"""
+
+import re
+import numpy as np
+import pandas as pd
+from typing import List, Dict, Any, Callable, Tuple
+from name_parser import parse_names, extract_individual_products
+from business_logic import determine_thickness_coating, PROFNASTIL_KEYWORDS
+from price_parser import ExcelRows, iter_sheet_rows
+from records import ParsedProduct
+
+# Те же проверки, что и в parse_excel_rows, но для целого столбца
+BRAND_SUFFIX_PATTERN = r'\d+(?:гл|мп|sf|оп|двс)'
+PROFNASTIL_PATTERN = "|".join(re.escape(keyword) for keyword in PROFNASTIL_KEYWORDS)
+STANDARD_PRICE_PATTERN = r'^(\d+)([а-яa-z]*)'
+PROFNASTIL_PRICE_PATTERN = r'^(\d+)\s*([а-яa-z]*)'
+
+COLUMNS = ["sheet", "name", "unit", "price"]
+
+
+def build_rows_frame(excel_data: ExcelRows) -> pd.DataFrame:
+    """
+    Собирает первые три столбца всех листов в один DataFrame.
+    Принимает словарь {лист: [строки]}, поток пар (лист, строка)
+    или словарь {лист: DataFrame} из read_excel_frames
+    """
+    if isinstance(excel_data, dict) and any(isinstance(df, pd.DataFrame) for df in excel_data.values()):
+        frames = []
+        for sheet_name, df in excel_data.items():
+            # Строки короче трех ячеек parse_excel_rows пропускает
+            if df.shape[1] < 3:
+                continue
+            # NaN/NaT -> "", как в parse_excel_file
+            frame = df.iloc[:, :3].astype(object)
+            frame = frame.where(frame.notna(), "")
+            frame.columns = COLUMNS[1:]
+            frame.insert(0, "sheet", sheet_name)
+            frames.append(frame)
+        if not frames:
+            return pd.DataFrame(columns=COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+
+    sheets, names, units, prices = [], [], [], []
+    for sheet_name, row in iter_sheet_rows(excel_data):
+        if len(row) < 3:
+            continue
+        sheets.append(sheet_name)
+        names.append(row[0])
+        units.append(row[1])
+        prices.append(row[2])
+    return pd.DataFrame({"sheet": sheets, "name": names, "unit": units, "price": prices}, dtype=object)
+
+
+def text_column(values: pd.Series) -> pd.Series:
+    """
+    Аналог str(cell).strip() if cell else "" для целого столбца
+    """
+    texts = [str(value).strip() if value else "" for value in values.tolist()]
+    return pd.Series(texts, index=values.index, dtype=object)
+
+
+def names_table(names: pd.Series, splitter: Callable[[str], List[str]]) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Разбивает уникальные названия: таблица (name_code, position, parsed_name)
+    и первое название для каждого кода (или исходное, если разбиение пустое)
+    """
+    split = names.map(splitter)
+    exploded = split.explode().dropna()
+    table = pd.DataFrame({
+        "name_code": exploded.index.to_numpy(),
+        "position": exploded.groupby(level=0).cumcount().to_numpy(),
+        "parsed_name": exploded.to_numpy(),
+    })
+    first = split.str[0].where(split.str.len() > 0, names)
+    return table, first
+
+
+def prices_table(prices: pd.Series, pattern: str) -> pd.DataFrame:
+    """
+    Разворачивает уникальные цены с брендами ('738гл/775мп')
+    в таблицу (price_code, position, price, brand)
+    """
+    parts = prices.str.split(r'/+', regex=True).explode().str.strip()
+    matches = parts.str.extract(pattern, flags=re.IGNORECASE).dropna(subset=[0])
+    brands = matches[1].str.lower()
+    return pd.DataFrame({
+        "price_code": matches.index.to_numpy(),
+        "position": matches.groupby(level=0).cumcount().to_numpy(),
+        "price": matches[0].map(int).to_numpy(),
+        "brand": brands.where(brands != "", None).to_numpy(),
+    })
+
+
+def simple_products(rows: pd.DataFrame, prices: pd.Series) -> pd.DataFrame:
+    """
+    Строки с простой ценой: первое число из цены на каждое название
+    """
+    if rows.empty:
+        return rows.iloc[0:0]
+
+    codes = rows["price_code"].unique()
+    numbers = prices.loc[codes].str.extract(r'(\d+)', expand=False).map(int)
+
+    unique_names = rows.drop_duplicates("name_code").set_index("name_code")["name"]
+    names, _ = names_table(unique_names, extract_individual_products)
+    result = rows.merge(names, on="name_code")
+    result["price"] = numbers.loc[result["price_code"]].to_numpy()
+    result["brand"] = None
+    result["kind"] = "simple"
+    return result
+
+
+def priced_products(rows: pd.DataFrame, prices: pd.Series, pattern: str,
+                    splitter: Callable[[str], List[str]], kind: str) -> pd.DataFrame:
+    """
+    Строки с ценами по брендам: цены разворачиваются в отдельные товары,
+    i-я цена получает i-е название
+    """
+    if rows.empty:
+        return rows.iloc[0:0]
+
+    codes = rows["price_code"].unique()
+    result = rows.merge(prices_table(prices.loc[codes], pattern), on="price_code")
+
+    # names[i] if i < len(names) else names[0] if names else name
+    unique_names = rows.drop_duplicates("name_code").set_index("name_code")["name"]
+    names, first = names_table(unique_names, splitter)
+    result = result.merge(names, on=["name_code", "position"], how="left")
+    fallback = first.loc[result["name_code"]].to_numpy()
+    result["parsed_name"] = result["parsed_name"].where(result["parsed_name"].notna(), fallback)
+
+    if kind == "profnastil":
+        pairs = list(zip(result["brand"], result["price"]))
+        resolved = {pair: determine_thickness_coating(*pair) for pair in set(pairs)}
+        result["thickness"] = [resolved[pair][0] for pair in pairs]
+        result["coating"] = [resolved[pair][1] for pair in pairs]
+
+    result["kind"] = kind
+    return result
+
+
+def to_records(products: pd.DataFrame) -> List[ParsedProduct]:
+    """
+    Преобразует итоговый DataFrame в список записей ParsedProduct (формат parse_excel_rows)
+    """
+    has_thickness = "thickness" in products
+    columns = zip(
+        products["kind"].tolist(), products["name"].tolist(), products["parsed_name"].tolist(),
+        products["unit"].tolist(), products["price"].tolist(), products["brand"].tolist(),
+        products["thickness"].tolist() if has_thickness else [None] * len(products),
+        products["coating"].tolist() if has_thickness else [None] * len(products),
+        products["sheet"].tolist(),
+    )
+    return [
+        ParsedProduct(name, parsed_name, unit, int(price), brand, sheet, thickness, coating)
+        if kind == "profnastil" else
+        ParsedProduct(name, parsed_name, unit, int(price), brand, sheet)
+        for kind, name, parsed_name, unit, price, brand, thickness, coating, sheet in columns
+    ]
+
+
+def parse_excel_rows_columnar(excel_data: ExcelRows) -> List[Dict[str, Any]]:
+    """
+    Колоночный аналог parse_excel_rows (список словарей)
+    """
+    return [product.to_dict() for product in product_records_columnar(excel_data)]
+
+
+def product_records_columnar(excel_data: ExcelRows) -> List[ParsedProduct]:
+    """
+    Колоночный разбор в записи ParsedProduct: фильтрация, классификация цен
+    (простая / с брендами / профнастил) и разворачивание составных цен
+    выполняются над столбцами целиком. Регулярные выражения применяются
+    к уникальным значениям цен и названий, а не к каждой строке
+    """
+    frame = build_rows_frame(excel_data)
+    if frame.empty:
+        return []
+
+    rows = pd.DataFrame({
+        "row": np.arange(len(frame)),
+        "sheet": frame["sheet"].to_numpy(),
+        "name": text_column(frame["name"]).to_numpy(),
+        "unit": text_column(frame["unit"]).to_numpy(),
+    })
+    price_codes, price_values = pd.factorize(text_column(frame["price"]))
+    name_codes, name_values = pd.factorize(rows["name"])
+    rows["price_code"] = price_codes
+    rows["name_code"] = name_codes
+
+    # Классификация уникальных цен и названий
+    prices = pd.Series(price_values, dtype=object)
+    names = pd.Series(name_values, dtype=object)
+    valid_price = ((prices != "") & (prices != "-") & prices.str.contains(r'\d', regex=True)).to_numpy()
+    branded_price = prices.str.contains(BRAND_SUFFIX_PATTERN, regex=True).to_numpy()
+    profnastil_name = names.str.lower().str.contains(PROFNASTIL_PATTERN, regex=True).to_numpy()
+
+    rows = rows[(rows["name"] != "").to_numpy() & valid_price[price_codes]]
+    if rows.empty:
+        return []
+    branded = branded_price[rows["price_code"].to_numpy()]
+    profnastil = branded & profnastil_name[rows["name_code"].to_numpy()]
+
+    parts = [
+        simple_products(rows[~branded], prices),
+        priced_products(rows[branded & ~profnastil], prices, STANDARD_PRICE_PATTERN, parse_names, "standard"),
+        priced_products(rows[profnastil], prices, PROFNASTIL_PRICE_PATTERN, extract_individual_products, "profnastil"),
+    ]
+    parts = [part for part in parts if not part.empty]
+    if not parts:
+        return []
+
+    # Восстанавливаем исходный порядок: строка листа, затем позиция внутри строки
+    products = pd.concat(parts, ignore_index=True)
+    products = products.sort_values(["row", "position"], kind="stable")
+    return to_records(products)
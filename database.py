@@ -5,13 +5,21 @@
 
 import mysql.connector
 from mysql.connector import Error
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Sequence
+from contextlib import contextmanager
 import os
+import threading
 from dotenv import load_dotenv
+from db_pool import ConnectionPool
+from metrics import db_query_timer
 
 # Загружаем переменные окружения
 load_dotenv()
 
+# Столбцы справочных таблиц для пакетной записи
+CATEGORY_COLUMNS = ("name_ru", "unit", "category_id")
+MARKUP_COLUMNS = ("color", "coating", "thickness", "markup_price", "markup_percent")
+
 class DatabaseManager:
     def __init__(self):
         self.connection = None
@@ -30,44 +38,86 @@ class DatabaseManager:
         # Дополнительные настройки подключения
         self.connection_timeout = int(os.getenv('DB_CONNECTION_TIMEOUT', 30))
         self.autocommit = os.getenv('DB_AUTOCOMMIT', 'true').lower() == 'true'
+        
+        # Пул соединений (DB_POOL_SIZE=0 - одно соединение на процесс, как раньше)
+        self.pool_size = int(os.getenv('DB_POOL_SIZE', 5))
+        self.pool_timeout = float(os.getenv('DB_POOL_TIMEOUT', 10))
+        self.pool_health_check_interval = float(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', 30))
+        self.pool: Optional[ConnectionPool] = None
+        self._lock = threading.RLock()
+        
+        # Размер пачки для пакетной записи (bulk_insert)
+        self.bulk_batch_size = int(os.getenv('DB_BULK_BATCH_SIZE', 1000))
+
+    def _connection_config(self) -> Dict[str, Any]:
+        """Параметры подключения с поддержкой SSL"""
+        # Базовые параметры подключения
+        connection_config = {
+            'host': self.host,
+            'port': self.port,
+            'user': self.user,
+            'password': self.password,
+            'database': self.database,
+            'charset': 'utf8mb4',
+            'collation': 'utf8mb4_unicode_ci',
+            'autocommit': self.autocommit,
+            'connection_timeout': self.connection_timeout,
+            'raise_on_warnings': True,
+            'use_unicode': True
+        }
+        
+        # SSL настройки
+        if not self.ssl_disabled:
+            ssl_config = {}
+            if self.ssl_ca:
+                ssl_config['ca'] = self.ssl_ca
+            if self.ssl_cert:
+                ssl_config['cert'] = self.ssl_cert
+            if self.ssl_key:
+                ssl_config['key'] = self.ssl_key
+            
+            if ssl_config:
+                connection_config['ssl'] = ssl_config
+            else:
+                # Для облачных провайдеров обычно нужно только ssl_disabled=False
+                connection_config['ssl_disabled'] = False
+        else:
+            connection_config['ssl_disabled'] = True
+        
+        return connection_config
+
+    def _open_connection(self):
+        """Новое соединение с MySQL"""
+        return mysql.connector.connect(**self._connection_config())
+
+    def get_pool(self) -> Optional[ConnectionPool]:
+        """Пул соединений (создается при первом обращении); None в режиме одного соединения"""
+        if self.pool_size <= 0:
+            return None
+        if self.pool is None:
+            with self._lock:
+                if self.pool is None:
+                    self.pool = ConnectionPool(
+                        self._open_connection,
+                        size=self.pool_size,
+                        timeout=self.pool_timeout,
+                        health_check_interval=self.pool_health_check_interval,
+                    )
+        return self.pool
 
     def connect(self):
         """Подключение к базе данных с поддержкой SSL"""
         try:
-            # Базовые параметры подключения
-            connection_config = {
-                'host': self.host,
-                'port': self.port,
-                'user': self.user,
-                'password': self.password,
-                'database': self.database,
-                'charset': 'utf8mb4',
-                'collation': 'utf8mb4_unicode_ci',
-                'autocommit': self.autocommit,
-                'connection_timeout': self.connection_timeout,
-                'raise_on_warnings': True,
-                'use_unicode': True
-            }
-            
-            # SSL настройки
-            if not self.ssl_disabled:
-                ssl_config = {}
-                if self.ssl_ca:
-                    ssl_config['ca'] = self.ssl_ca
-                if self.ssl_cert:
-                    ssl_config['cert'] = self.ssl_cert
-                if self.ssl_key:
-                    ssl_config['key'] = self.ssl_key
-                
-                if ssl_config:
-                    connection_config['ssl'] = ssl_config
-                else:
-                    # Для облачных провайдеров обычно нужно только ssl_disabled=False
-                    connection_config['ssl_disabled'] = False
-            else:
-                connection_config['ssl_disabled'] = True
+            pool = self.get_pool()
+            if pool is not None:
+                # Проверяем доступность БД; соединение остается в пуле
+                with pool.connection():
+                    pass
+                print(f"Подключение к MySQL базе данных '{self.database}' на {self.host} успешно "
+                      f"(пул из {self.pool_size} соединений)")
+                return True
             
-            self.connection = mysql.connector.connect(**connection_config)
+            self.connection = self._open_connection()
             
             if self.connection.is_connected():
                 print(f"Подключение к MySQL базе данных '{self.database}' на {self.host} успешно")
@@ -78,43 +128,143 @@ class DatabaseManager:
 
     def disconnect(self):
         """Отключение от базы данных"""
+        if self.pool is not None:
+            self.pool.close_all()
+            print("Соединения пула MySQL закрыты")
         if self.connection and self.connection.is_connected():
             self.connection.close()
             print("Соединение с MySQL закрыто")
 
+    @contextmanager
+    def session(self) -> Iterator[Any]:
+        """
+        Соединение на время блока with: из пула или (DB_POOL_SIZE=0)
+        единственное соединение процесса, доступ к которому сериализуется
+        """
+        pool = self.get_pool()
+        if pool is not None:
+            with pool.connection() as connection:
+                yield connection
+            return
+
+        with self._lock:
+            if not self.connection or not self.connection.is_connected():
+                self.connection = self._open_connection()
+            yield self.connection
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Метрики пула соединений"""
+        pool = self.get_pool()
+        if pool is None:
+            return {"size": 0, "single_connection": True}
+        return pool.get_stats()
+
     def execute_query(self, query: str, params: tuple = None) -> List[Dict[str, Any]]:
         """Выполнение SELECT запроса"""
-        if not self.connection or not self.connection.is_connected():
-            if not self.connect():
-                return []
-
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            cursor.execute(query, params)
-            result = cursor.fetchall()
-            cursor.close()
-            return result
+            with db_query_timer("query"), self.session() as connection:
+                cursor = connection.cursor(dictionary=True)
+                try:
+                    cursor.execute(query, params)
+                    return cursor.fetchall()
+                finally:
+                    cursor.close()
         except Error as e:
             print(f"Ошибка выполнения запроса: {e}")
             return []
 
     def execute_update(self, query: str, params: tuple = None) -> bool:
         """Выполнение INSERT/UPDATE/DELETE запроса"""
-        if not self.connection or not self.connection.is_connected():
-            if not self.connect():
-                return False
-
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(query, params)
-            self.connection.commit()
-            cursor.close()
-            return True
+            with db_query_timer("update"), self.session() as connection:
+                cursor = connection.cursor()
+                try:
+                    cursor.execute(query, params)
+                    connection.commit()
+                    return True
+                except Error:
+                    self._rollback(connection)
+                    raise
+                finally:
+                    cursor.close()
         except Error as e:
             print(f"Ошибка выполнения обновления: {e}")
-            self.connection.rollback()
             return False
 
+    @staticmethod
+    def _rollback(connection):
+        try:
+            connection.rollback()
+        except Error:
+            pass
+
+    def bulk_insert(self, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]],
+                    on_duplicate: str = "error", update_columns: Optional[Sequence[str]] = None,
+                    batch_size: Optional[int] = None) -> int:
+        """
+        Пакетная вставка строк: executemany собирает пачку в один INSERT
+        с многострочным VALUES, каждая пачка - отдельная транзакция.
+        on_duplicate: "error" - обычный INSERT, "update" - upsert
+        (ON DUPLICATE KEY UPDATE по update_columns, по умолчанию все столбцы),
+        "ignore" - существующие строки не меняются.
+        Возвращает число строк в успешно записанных пачках; на первой
+        ошибке пачка откатывается и запись прекращается
+        """
+        if on_duplicate not in ("error", "update", "ignore"):
+            raise ValueError(f"Неизвестный режим on_duplicate: {on_duplicate}")
+        batch_size = batch_size or self.bulk_batch_size
+        written = 0
+
+        try:
+            with db_query_timer("bulk_insert"), self.session() as connection:
+                query = self._bulk_insert_query(connection, table, columns, on_duplicate, update_columns)
+                for batch in _batches(rows, batch_size):
+                    cursor = connection.cursor()
+                    try:
+                        if not connection.in_transaction:
+                            connection.start_transaction()
+                        cursor.executemany(query, batch)
+                        connection.commit()
+                    except Error:
+                        self._rollback(connection)
+                        raise
+                    finally:
+                        cursor.close()
+                    written += len(batch)
+        except Error as e:
+            print(f"Ошибка пакетной записи в {table} (записано строк: {written}): {e}")
+
+        return written
+
+    def _bulk_insert_query(self, connection, table: str, columns: Sequence[str],
+                           on_duplicate: str, update_columns: Optional[Sequence[str]]) -> str:
+        """
+        INSERT для executemany (одной строкой: коннектор переписывает VALUES в многострочный).
+        INSERT IGNORE не используется: при raise_on_warnings дубликат стал бы ошибкой
+        """
+        column_list = ", ".join(f"`{column}`" for column in columns)
+        placeholders = ", ".join(["%s"] * len(columns))
+        query = f"INSERT INTO `{table}` ({column_list}) VALUES ({placeholders})"
+        if on_duplicate == "error":
+            return query
+
+        if on_duplicate == "ignore":
+            assignments = [f"`{columns[0]}` = `{columns[0]}`"]
+        elif self._supports_row_alias(connection):
+            # MySQL 8.0.19+: VALUES() в ON DUPLICATE KEY UPDATE устарела и дает предупреждение
+            query += " AS new"
+            assignments = [f"`{column}` = new.`{column}`" for column in update_columns or columns]
+        else:
+            assignments = [f"`{column}` = VALUES(`{column}`)" for column in update_columns or columns]
+        return f"{query} ON DUPLICATE KEY UPDATE {', '.join(assignments)}"
+
+    @staticmethod
+    def _supports_row_alias(connection) -> bool:
+        """Синтаксис INSERT ... AS new (MySQL 8.0.19+, в MariaDB нет)"""
+        if "mariadb" in (connection.get_server_info() or "").lower():
+            return False
+        return tuple(connection.get_server_version() or ()) >= (8, 0, 19)
+
     def get_product_categories(self) -> Dict[str, Dict[str, str]]:
         """Получение соответствия товаров и категорий из БД"""
         query = """
@@ -157,6 +307,14 @@ class DatabaseManager:
         
         return markup_rules
 
+    def get_reference_data_version(self) -> Optional[str]:
+        """Отметка изменений справочных таблиц (контрольные суммы); None, если БД недоступна"""
+        result = self.execute_query("CHECKSUM TABLE category_mapping, color_coating_markup")
+        if not result:
+            return None
+        
+        return ";".join(f"{row['Table']}={row['Checksum']}" for row in result)
+
     def create_tables(self):
         """Создание таблиц в базе данных (если они не существуют)"""
         
@@ -167,7 +325,7 @@ class DatabaseManager:
             name_ru VARCHAR(255) NOT NULL,
             unit VARCHAR(10) NOT NULL DEFAULT 'м2',
             category_id VARCHAR(50) NOT NULL,
-            INDEX idx_name_ru (name_ru),
+            UNIQUE KEY uq_name_ru (name_ru),
             INDEX idx_category_id (category_id)
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
         """
@@ -181,7 +339,7 @@ class DatabaseManager:
             thickness VARCHAR(20),
             markup_price DECIMAL(10,2),
             markup_percent DECIMAL(5,2),
-            INDEX idx_color (color),
+            UNIQUE KEY uq_color_coating_thickness (color, coating, thickness),
             INDEX idx_coating (coating),
             INDEX idx_thickness (thickness)
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -231,26 +389,23 @@ class DatabaseManager:
             ("standard", "PE 0,8", "0,8", 55.0, 5.5),
         ]
 
-        # Вставка категорий
-        insert_category_query = """
-        INSERT IGNORE INTO category_mapping (name_ru, unit, category_id) 
-        VALUES (%s, %s, %s)
-        """
-        
-        for category in categories_data:
-            self.execute_update(insert_category_query, category)
-
-        # Вставка наценок
-        insert_markup_query = """
-        INSERT IGNORE INTO color_coating_markup (color, coating, thickness, markup_price, markup_percent) 
-        VALUES (%s, %s, %s, %s, %s)
-        """
-        
-        for markup in markup_data:
-            self.execute_update(insert_markup_query, markup)
+        # Вставка категорий и наценок пачками; уже существующие строки не меняются
+        self.bulk_insert("category_mapping", CATEGORY_COLUMNS, categories_data, on_duplicate="ignore")
+        self.bulk_insert("color_coating_markup", MARKUP_COLUMNS, markup_data, on_duplicate="ignore")
 
         print("Начальные данные загружены в базу данных")
 
+def _batches(rows: Iterable[Sequence[Any]], size: int) -> Iterator[List[Sequence[Any]]]:
+    """Разбивает поток строк на пачки по size"""
+    batch = []
+    for row in rows:
+        batch.append(tuple(row))
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
 # Глобальный экземпляр менеджера БД
 db_manager = DatabaseManager()
 
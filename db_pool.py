@@ -0,0 +1,159 @@
+"""
+Ограниченный пул соединений с MySQL.
+Каждый запрос берет отдельное соединение на время выполнения, поэтому
+параллельные загрузки не делят один сокет между потоками. Проверка
+соединения (ping) выполняется только после простоя, а не перед каждым запросом
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+
+
+class ConnectionPool:
+    """
+    Пул не более size соединений.
+    connect - фабрика нового соединения; если все соединения заняты,
+    получение ждет освобождения не дольше timeout секунд
+    """
+
+    def __init__(self, connect: Callable[[], Any], size: int = 5, timeout: float = 10.0,
+                 health_check_interval: float = 30.0):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        # Свободные соединения с временем возврата; берем последнее вернувшееся (LIFO),
+        # чтобы редко используемые соединения закрывались сервером, а не мешали
+        self._idle: List[Tuple[Any, float]] = []
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+
+        self._in_use = 0
+        self._created = 0
+        self._closed = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._health_check_failures = 0
+        self._wait_seconds_total = 0.0
+        self._max_wait_seconds = 0.0
+
+    def acquire(self):
+        """Берет соединение из пула (или открывает новое); PoolError по истечении timeout"""
+        started = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._waits += 1
+            if not self._slots.acquire(timeout=self.timeout):
+                with self._lock:
+                    self._timeouts += 1
+                raise PoolError(f"Нет свободных соединений в пуле за {self.timeout} сек. (размер пула {self.size})")
+        waited = time.monotonic() - started
+
+        try:
+            connection = self._checkout_idle()
+            if connection is None:
+                connection = self._connect()
+                with self._lock:
+                    self._created += 1
+        except BaseException:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_seconds_total += waited
+            self._max_wait_seconds = max(self._max_wait_seconds, waited)
+        return connection
+
+    def _checkout_idle(self):
+        """Свободное рабочее соединение или None; давно простаивавшие проверяются ping'ом"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                connection, released_at = self._idle.pop()
+
+            if time.monotonic() - released_at < self.health_check_interval:
+                return connection
+            if self._is_healthy(connection):
+                return connection
+
+            with self._lock:
+                self._health_check_failures += 1
+            self._close(connection)
+
+    def release(self, connection, discard: bool = False):
+        """Возвращает соединение в пул; discard=True - закрыть (например, после сетевой ошибки)"""
+        try:
+            if discard:
+                self._close(connection)
+            else:
+                with self._lock:
+                    self._idle.append((connection, time.monotonic()))
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """Соединение на время блока with; после ошибки MySQL проверяется перед возвратом в пул"""
+        connection = self.acquire()
+        discard = False
+        try:
+            yield connection
+        except Error:
+            discard = not self._is_healthy(connection)
+            raise
+        except BaseException:
+            discard = True
+            raise
+        finally:
+            self.release(connection, discard=discard)
+
+    def close_all(self):
+        """Закрывает свободные соединения; занятые закроются при возврате через discard"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            self._close(connection)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Метрики использования пула"""
+        with self._lock:
+            return {
+                "size": self.size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "created": self._created,
+                "closed": self._closed,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "health_check_failures": self._health_check_failures,
+                "wait_seconds_total": round(self._wait_seconds_total, 6),
+                "max_wait_seconds": round(self._max_wait_seconds, 6),
+            }
+
+    @staticmethod
+    def _is_healthy(connection) -> bool:
+        try:
+            return connection.is_connected()
+        except Exception:
+            return False
+
+    def _close(self, connection):
+        with self._lock:
+            self._closed += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
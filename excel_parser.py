@@ -1,20 +1,214 @@
 import pandas as pd
 import io
-from typing import Dict, Any
+import os
+import re
+import datetime
+from fnmatch import fnmatchcase
+from typing import Dict, Any, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
 from fastapi import HTTPException
+from openpyxl import load_workbook
+from xlsx_reader import UnsupportedXlsxError, XlsxWorkbook
 
-def parse_excel_file(file_content: bytes) -> Dict[str, Any]:
+# Сигнатура zip-архива: .xlsx можно читать потоково через openpyxl
+XLSX_SIGNATURE = b"PK\x03\x04"
+
+# Содержимое файла в памяти или путь к файлу на диске (загрузка, перенесенная во временный файл)
+ExcelSource = Union[bytes, str]
+
+# Потоковое чтение .xlsx быстрым читателем xlsx_reader (false - через openpyxl)
+XLSX_FAST_READER = os.getenv("XLSX_FAST_READER", "true").lower() == "true"
+
+# Столбцы название, единица, цена по умолчанию (индексы с 0)
+DEFAULT_COLUMNS = (0, 1, 2)
+
+# Сколько первых строк листа просматривается в поисках строки заголовка
+HEADER_SCAN_ROWS = int(os.getenv("HEADER_SCAN_ROWS", 20))
+
+# Начала заголовков столбцов (в нижнем регистре) для поиска строки заголовка
+HEADER_KEYWORDS = {
+    "name": ("наименование", "название", "номенклатура", "товар", "продукция"),
+    "unit": ("ед.", "ед ", "едини", "изм"),
+    "price": ("цена", "стоимость"),
+}
+
+
+class ReadOptionsError(ValueError):
+    """Неверные параметры чтения книги (неизвестный лист, столбец)"""
+
+
+class ReadOptions(NamedTuple):
+    """
+    Что читать из книги: листы (имена, маски * и ? или индексы с 0) и столбцы
+    название/единица/цена (индексы с 0, -1 - столбца нет) либо поиск строки
+    заголовка. Невыбранные листы не открываются, лишние столбцы не попадают в строки
+    """
+    sheets: Optional[Tuple[str, ...]] = None
+    columns: Optional[Tuple[int, int, int]] = None
+    detect_header: bool = False
+
+    @property
+    def projects_columns(self) -> bool:
+        return self.columns is not None or self.detect_header
+
+
+# Чтение для разбора прайса: все листы, только столбцы название, единица, цена
+PRICE_COLUMNS = ReadOptions(columns=DEFAULT_COLUMNS)
+
+
+def column_index(value: str) -> int:
+    """Индекс столбца с 0 по букве Excel (A, C, AB) или номеру с 1"""
+    value = value.strip().upper()
+    if value.isdigit() and int(value) >= 1:
+        return int(value) - 1
+    if re.fullmatch(r"[A-Z]{1,3}", value):
+        index = 0
+        for letter in value:
+            index = index * 26 + ord(letter) - ord("A") + 1
+        return index - 1
+    raise ReadOptionsError(f"Неверный столбец: {value!r} (ожидается буква или номер с 1)")
+
+
+def parse_read_options(sheets: Optional[Sequence[str]] = None, columns: Optional[str] = None,
+                       detect_header: bool = False) -> Optional[ReadOptions]:
+    """
+    Параметры запроса: sheets - листы, columns - "A,B,C" или "1,2,3"
+    (название, единица, цена; пустое значение - столбца нет). None - читать как обычно
+    """
+    column_tuple = None
+    if columns:
+        parts = columns.split(",")
+        if len(parts) != 3:
+            raise ReadOptionsError("columns: ожидается три столбца - название, единица, цена")
+        column_tuple = tuple(column_index(part) if part.strip() else -1 for part in parts)
+        if column_tuple[0] < 0 or column_tuple[2] < 0:
+            raise ReadOptionsError("columns: столбцы названия и цены обязательны")
+    sheet_tuple = tuple(sheet for sheet in sheets if sheet) if sheets else None
+    if not sheet_tuple and column_tuple is None and not detect_header:
+        return None
+    return ReadOptions(sheet_tuple or None, column_tuple, detect_header)
+
+
+def select_sheets(sheet_names: Sequence[str], selectors: Iterable[str]) -> List[str]:
+    """
+    Листы по именам, маскам (*, ?) или индексам (с 0, отрицательные - с конца),
+    в порядке книги. Селектор без совпадений - ReadOptionsError
+    """
+    selected = set()
+    for selector in selectors:
+        if selector in sheet_names:
+            matched = [selector]
+        elif re.fullmatch(r"-?\d+", selector):
+            index = int(selector)
+            matched = [sheet_names[index]] if -len(sheet_names) <= index < len(sheet_names) else []
+        else:
+            matched = [name for name in sheet_names if fnmatchcase(name, selector)]
+        if not matched:
+            raise ReadOptionsError(f"Лист не найден: {selector}")
+        selected.update(matched)
+    return [name for name in sheet_names if name in selected]
+
+
+def selected_sheet_names(sheet_names: Sequence[str], sheets: Optional[Sequence[str]] = None,
+                         options: Optional[ReadOptions] = None) -> List[str]:
+    """Листы книги с учетом явного списка sheets и выбора в options"""
+    names = list(sheet_names)
+    if options is not None and options.sheets:
+        names = select_sheets(names, options.sheets)
+    if sheets is not None:
+        names = [name for name in names if name in sheets]
+    return names
+
+
+def find_header(rows: Sequence[Sequence[Any]]) -> Optional[Tuple[int, Tuple[int, int, int]]]:
+    """
+    Строка заголовка среди rows: есть столбцы названия и цены (единица - если есть).
+    Возвращает (номер строки с 0, столбцы название/единица/цена) или None
+    """
+    for row_index, row in enumerate(rows):
+        texts = [str(cell).strip().lower() if cell is not None else "" for cell in row]
+        found: Dict[str, int] = {}
+        for field in ("name", "price", "unit"):
+            for column, text in enumerate(texts):
+                if column not in found.values() and text.startswith(HEADER_KEYWORDS[field]):
+                    found[field] = column
+                    break
+        if "name" in found and "price" in found:
+            return row_index, (found["name"], found.get("unit", -1), found["price"])
+    return None
+
+
+def project_row(row: Sequence[Any], columns: Sequence[int]) -> List[Any]:
+    """Ячейки столбцов columns (нет столбца или ячейки - пустая строка)"""
+    return [clean_cell(row[index]) if 0 <= index < len(row) else "" for index in columns]
+
+
+def read_projected_frame(xls: pd.ExcelFile, sheet_name: str, options: ReadOptions) -> pd.DataFrame:
+    """
+    Лист как DataFrame из трех столбцов (название, единица, цена): читаются
+    только нужные столбцы (usecols), строки до заголовка пропускаются
+    """
+    columns = options.columns or DEFAULT_COLUMNS
+    skiprows = None
+    if options.detect_header:
+        head = pd.read_excel(xls, sheet_name=sheet_name, header=None, nrows=HEADER_SCAN_ROWS)
+        found = find_header(head.where(head.notna(), None).values.tolist())
+        if found is not None:
+            header_index, columns = found
+            skiprows = header_index + 1
+    wanted = set(columns)
+    df = pd.read_excel(xls, sheet_name=sheet_name, header=None, skiprows=skiprows,
+                       usecols=lambda column: column in wanted)
+    # usecols сохраняет порядок столбцов листа: переставляем в порядок название, единица, цена
+    df = df.reindex(columns=list(columns))
+    df.columns = range(len(columns))
+    return df
+
+class ExcelParseError(HTTPException):
+    """
+    Файл не удалось прочитать как книгу Excel (поврежден или другой формат).
+    Остается HTTPException(500) для прежних обработчиков; текст ошибки - detail
+    """
+
+    def __init__(self, error: Exception):
+        super().__init__(status_code=500, detail=f"Ошибка при парсинге Excel: {str(error)}")
+
+    def __str__(self) -> str:
+        return self.detail
+
+def excel_source(source: ExcelSource):
+    """
+    Объект для openpyxl/pandas: путь передается как есть (файл читается с диска
+    по мере надобности), содержимое в памяти оборачивается в BytesIO
+    """
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    return source
+
+def is_xlsx(source: ExcelSource) -> bool:
+    """Файл - zip-архив (.xlsx), а не старый формат .xls"""
+    if isinstance(source, (bytes, bytearray)):
+        return source.startswith(XLSX_SIGNATURE)
+    with open(source, "rb") as f:
+        return f.read(len(XLSX_SIGNATURE)) == XLSX_SIGNATURE
+
+def parse_excel_file(file_content: ExcelSource, sheets: Optional[Sequence[str]] = None,
+                     options: Optional[ReadOptions] = None) -> Dict[str, Any]:
     """
     Парсинг Excel файла с множественными листами
+    (sheets - только перечисленные листы, options - выбор листов и столбцов)
     """
     try:
         # Читаем все листы Excel файла
-        xls = pd.ExcelFile(io.BytesIO(file_content))
+        xls = pd.ExcelFile(excel_source(file_content))
         result = {}
         
-        for sheet_name in xls.sheet_names:
-            # Читаем лист как есть, без предположений о структуре
-            df = pd.read_excel(xls, sheet_name=sheet_name, header=None)
+        for sheet_name in selected_sheet_names(xls.sheet_names, sheets, options):
+            if options is not None and options.projects_columns:
+                # Только столбцы название, единица, цена
+                df = read_projected_frame(xls, sheet_name, options)
+            else:
+                # Читаем лист как есть, без предположений о структуре
+                df = pd.read_excel(xls, sheet_name=sheet_name, header=None)
             
             # Преобразуем в список словарей для удобства
             sheet_data = []
@@ -34,5 +228,130 @@ def parse_excel_file(file_content: bytes) -> Dict[str, Any]:
         
         return result
         
+    except ReadOptionsError:
+        raise
+    except Exception as e:
+        raise ExcelParseError(e)
+
+def clean_cell(cell: Any) -> Any:
+    """
+    Приводит значение ячейки openpyxl к виду, который отдает parse_excel_file
+    """
+    if cell is None:
+        return ""
+    if isinstance(cell, (datetime.datetime, datetime.timedelta)):
+        return str(cell)
+    return cell
+
+def open_workbook(file_content: ExcelSource):
+    """
+    Книга .xlsx для потокового чтения: быстрый читатель xlsx_reader, а если он
+    книгу не поддерживает (или выключен XLSX_FAST_READER) - openpyxl в режиме read_only
+    """
+    if XLSX_FAST_READER:
+        try:
+            return XlsxWorkbook(excel_source(file_content))
+        except UnsupportedXlsxError:
+            pass
+    return load_workbook(excel_source(file_content), read_only=True, data_only=True)
+
+def list_sheet_names(file_content: ExcelSource) -> List[str]:
+    """
+    Названия листов в порядке книги (без чтения содержимого листов)
+    """
+    try:
+        if not is_xlsx(file_content):
+            return pd.ExcelFile(excel_source(file_content)).sheet_names
+        workbook = open_workbook(file_content)
+        try:
+            return workbook.sheetnames
+        finally:
+            workbook.close()
+    except Exception as e:
+        raise ExcelParseError(e)
+
+def iter_excel_rows(file_content: ExcelSource, sheets: Optional[Sequence[str]] = None,
+                    options: Optional[ReadOptions] = None) -> Iterator[Tuple[str, List[Any]]]:
+    """
+    Потоковое чтение Excel файла: отдает пары (лист, строка) по одной,
+    не собирая листы целиком в памяти.
+    .xlsx читается быстрым читателем xlsx_reader (или openpyxl в режиме read_only),
+    остальные форматы (.xls) - через pandas, как в parse_excel_file.
+    file_content - содержимое файла или путь к нему, sheets - только перечисленные листы,
+    options - выбор листов и столбцов (строки - название, единица, цена)
+    """
+    try:
+        xlsx = is_xlsx(file_content)
+    except OSError as e:
+        raise ExcelParseError(e)
+
+    if not xlsx:
+        for sheet_name, sheet_data in parse_excel_file(file_content, sheets, options).items():
+            for row in sheet_data:
+                yield sheet_name, row
+        return
+
+    try:
+        workbook = open_workbook(file_content)
+    except Exception as e:
+        raise ExcelParseError(e)
+
+    try:
+        worksheets = workbook.worksheets
+        if sheets is not None or options is not None:
+            # Листы-диаграммы есть в sheetnames, но не в worksheets
+            names = set(selected_sheet_names(workbook.sheetnames, sheets, options))
+            worksheets = [worksheet for worksheet in worksheets if worksheet.title in names]
+        for worksheet in worksheets:
+            sheet_name = worksheet.title
+            try:
+                if options is not None and options.projects_columns:
+                    for row in iter_projected_rows(worksheet, options):
+                        yield sheet_name, row
+                else:
+                    for row in worksheet.iter_rows(values_only=True):
+                        yield sheet_name, [clean_cell(cell) for cell in row]
+            except Exception as e:
+                raise ExcelParseError(e)
+    finally:
+        workbook.close()
+
+def iter_projected_rows(worksheet, options: ReadOptions) -> Iterator[List[Any]]:
+    """
+    Строки листа openpyxl из трех ячеек (название, единица, цена): ячейки
+    правее нужных столбцов не создаются, строки до заголовка пропускаются
+    """
+    columns = options.columns or DEFAULT_COLUMNS
+    min_row = 1
+    if options.detect_header:
+        head = list(worksheet.iter_rows(max_row=HEADER_SCAN_ROWS, values_only=True))
+        found = find_header(head)
+        if found is not None:
+            header_index, columns = found
+            min_row = header_index + 2
+    for row in worksheet.iter_rows(min_row=min_row, max_col=max(columns) + 1, values_only=True):
+        yield project_row(row, columns)
+
+def read_excel_frames(file_content: ExcelSource, sheets: Optional[Sequence[str]] = None,
+                      options: Optional[ReadOptions] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Читает все листы (или только sheets) в DataFrame без построчного обхода
+    (вход для колоночного движка columnar_parser); с options - только выбранные
+    листы и столбцы название, единица, цена
+    """
+    try:
+        if options is None:
+            sheet_name = None if sheets is None else list(sheets)
+            return pd.read_excel(excel_source(file_content), sheet_name=sheet_name, header=None)
+        xls = pd.ExcelFile(excel_source(file_content))
+        frames = {}
+        for sheet_name in selected_sheet_names(xls.sheet_names, sheets, options):
+            if options.projects_columns:
+                frames[sheet_name] = read_projected_frame(xls, sheet_name, options)
+            else:
+                frames[sheet_name] = pd.read_excel(xls, sheet_name=sheet_name, header=None)
+        return frames
+    except ReadOptionsError:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка при парсинге Excel: {str(e)}")
\ No newline at end of file
+        raise ExcelParseError(e)
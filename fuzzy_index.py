@@ -0,0 +1,85 @@
+"""
+Нечеткий поиск категорий по триграммам.
+Используется для товаров, которым find_product_mapping не нашел категорию:
+лучший кандидат из category_mapping предлагается оператору как подсказка
+"""
+
+import re
+from collections import Counter
+import numpy as np
+from typing import Any, Dict, List, NamedTuple, Optional, Set
+
+# Во сколько раз справочник должен быть больше суммы списков триграмм названия,
+# чтобы общие триграммы считались только по этим спискам (Counter), а не
+# массивом по всем категориям (np.bincount быстрее на длинных списках)
+SPARSE_POSTINGS_RATIO = 64
+
+
+class FuzzyMatch(NamedTuple):
+    name: str                 # название категории из category_mapping
+    mapping: Dict[str, Any]   # {"unit": ..., "category_id": ...}
+    score: float              # коэффициент Дайса по триграммам, 0..1
+
+
+def normalize_name(name: str) -> str:
+    """
+    Приводит название к виду для сравнения: без размеров в скобках,
+    в нижнем регистре, с одиночными пробелами
+    """
+    name = re.sub(r'\([^)]*\)', ' ', name).lower().replace("ё", "е")
+    return re.sub(r'\s+', ' ', name).strip()
+
+
+def trigrams(name: str) -> Set[str]:
+    """Множество триграмм названия (с отступами для начала и конца слов)"""
+    padded = f"  {normalize_name(name)} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """
+    Инвертированный индекс триграмм по названиям категорий.
+    Общие триграммы считаются по спискам триграмм названия: короткие списки
+    складываются через Counter (только категории-кандидаты), длинные -
+    через np.bincount сразу для всех категорий
+    """
+
+    def __init__(self, product_mapping: Dict[str, Dict[str, Any]]):
+        self.mapping = product_mapping
+        self.names: List[str] = list(product_mapping)
+        self.values: List[Dict[str, Any]] = list(product_mapping.values())
+
+        postings: Dict[str, List[int]] = {}
+        sizes = []
+        for doc_id, name in enumerate(self.names):
+            grams = trigrams(name)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(doc_id)
+
+        self._postings = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self._sizes = np.asarray(sizes, dtype=np.float64)
+
+    def best_match(self, name: str) -> Optional[FuzzyMatch]:
+        """
+        Лучший кандидат по коэффициенту Дайса 2|A∩B| / (|A| + |B|).
+        При равенстве выбирается категория, стоящая раньше в справочнике
+        """
+        grams = trigrams(name)
+        lists = [self._postings[gram] for gram in grams if gram in self._postings]
+        if not lists:
+            return None
+
+        total = len(grams)
+        if sum(len(ids) for ids in lists) * SPARSE_POSTINGS_RATIO <= len(self.names):
+            shared = Counter()
+            for ids in lists:
+                shared.update(ids.tolist())
+            sizes = self._sizes
+            score, best = max((2.0 * count / (total + sizes[doc_id]), -doc_id) for doc_id, count in shared.items())
+            return FuzzyMatch(self.names[-best], self.values[-best], float(score))
+
+        shared = np.bincount(np.concatenate(lists), minlength=len(self.names))
+        scores = 2.0 * shared / (total + self._sizes)
+        best = int(scores.argmax())
+        return FuzzyMatch(self.names[best], self.values[best], float(scores[best]))
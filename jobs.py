@@ -0,0 +1,443 @@
+"""
+Асинхронные задания разбора больших прайсов.
+POST /jobs сохраняет загрузку в JOBS_DIR и сразу возвращает id задания,
+разбор идет в ограниченном пуле (JOBS_WORKERS процессов или поток основного процесса).
+Состояние, прогресс (листы, строки) и варианты товаров (JSON, по одному на строку
+таблицы) хранятся в SQLite: результат переживает перезапуск сервиса, а задания,
+не завершенные к остановке, при старте ставятся в очередь заново.
+
+Задания разбираются потоковым движком: он позволяет отмечать прогресс по строкам
+и не держит результат целиком в памяти
+"""
+
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from excel_parser import PRICE_COLUMNS, iter_excel_rows, list_sheet_names
+from price_parser import iter_product_records
+from business_logic import iter_variant_records, get_reference_snapshot
+from pipeline import init_worker
+from serialization import encode_product_items, encode_with_raw_fields, render_json
+
+# Файл состояния заданий и каталог загруженных файлов
+JOBS_DB = os.getenv("JOBS_DB", "parse_jobs.sqlite3")
+JOBS_DIR = os.getenv("JOBS_DIR", "jobs")
+
+# Процессов разбора заданий (0 - один поток основного процесса)
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", 2))
+
+# Сколько заданий может ждать или выполняться одновременно; сверх этого - отказ
+JOBS_MAX_PENDING = int(os.getenv("JOBS_MAX_PENDING", 100))
+
+# Сколько часов хранятся завершенные задания и их результаты
+JOBS_TTL_HOURS = float(os.getenv("JOBS_TTL_HOURS", 24))
+
+# Сколько вариантов записывается одной транзакцией (вместе с прогрессом)
+JOBS_BATCH_SIZE = int(os.getenv("JOBS_BATCH_SIZE", 1000))
+
+# Раз в сколько секунд прогресс записывается, даже если пачка вариантов еще не набралась
+JOBS_PROGRESS_INTERVAL = float(os.getenv("JOBS_PROGRESS_INTERVAL", 2))
+
+# Размер страницы результата по умолчанию и максимальный
+JOBS_PAGE_SIZE = int(os.getenv("JOBS_PAGE_SIZE", 1000))
+JOBS_MAX_PAGE_SIZE = int(os.getenv("JOBS_MAX_PAGE_SIZE", 10000))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+JOB_FIELDS = ("id", "filename", "status", "upload_path", "upload_size", "created_at", "started_at",
+              "finished_at", "sheets_total", "sheets_done", "current_sheet", "rows_processed",
+              "products_count", "reference_version", "error")
+
+
+class JobQueueFullError(Exception):
+    """В очереди уже JOBS_MAX_PENDING заданий"""
+
+
+class JobStore:
+    """
+    Состояние заданий и их результаты в SQLite.
+    Файл открывают и процесс API, и рабочие процессы (журнал WAL)
+    """
+
+    def __init__(self, path: str = JOBS_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS parse_jobs (
+                id TEXT PRIMARY KEY,
+                filename TEXT,
+                status TEXT NOT NULL,
+                upload_path TEXT,
+                upload_size INTEGER,
+                created_at REAL,
+                started_at REAL,
+                finished_at REAL,
+                sheets_total INTEGER,
+                sheets_done INTEGER NOT NULL DEFAULT 0,
+                current_sheet TEXT,
+                rows_processed INTEGER NOT NULL DEFAULT 0,
+                products_count INTEGER NOT NULL DEFAULT 0,
+                reference_version TEXT,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS parse_jobs_status ON parse_jobs (status, created_at);
+            CREATE TABLE IF NOT EXISTS parse_job_products (
+                job_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (job_id, position)
+            ) WITHOUT ROWID;
+        """)
+
+    def create_job(self, filename: str, upload_path: str, upload_size: int) -> str:
+        """Новое задание в очереди; возвращает id"""
+        job_id = uuid.uuid4().hex
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO parse_jobs (id, filename, status, upload_path, upload_size, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, filename, QUEUED, upload_path, upload_size, time.time())
+            )
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Все поля задания или None"""
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT {', '.join(JOB_FIELDS)} FROM parse_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return dict(zip(JOB_FIELDS, row)) if row is not None else None
+
+    def count_pending(self) -> int:
+        """Заданий в очереди и в работе"""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM parse_jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+            ).fetchone()[0]
+
+    def pending_jobs(self) -> List[str]:
+        """Незавершенные задания в порядке создания"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id FROM parse_jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def start_job(self, job_id: str, sheets_total: int, reference_version: str):
+        """Задание взято в работу; результаты прерванного запуска удаляются"""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM parse_job_products WHERE job_id = ?", (job_id,))
+            self._connection.execute(
+                "UPDATE parse_jobs SET status = ?, started_at = ?, sheets_total = ?, sheets_done = 0, "
+                "current_sheet = NULL, rows_processed = 0, products_count = 0, reference_version = ?, "
+                "error = NULL WHERE id = ?",
+                (RUNNING, time.time(), sheets_total, reference_version, job_id)
+            )
+
+    def save_progress(self, job_id: str, progress: "JobProgress", items: List[bytes]):
+        """Пачка вариантов и прогресс - одной транзакцией"""
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT INTO parse_job_products (job_id, position, data) VALUES (?, ?, ?)",
+                ((job_id, progress.products_count + index, item) for index, item in enumerate(items))
+            )
+            progress.products_count += len(items)
+            self._connection.execute(
+                "UPDATE parse_jobs SET sheets_done = ?, current_sheet = ?, rows_processed = ?, "
+                "products_count = ? WHERE id = ?",
+                (progress.sheets_done, progress.sheet, progress.rows, progress.products_count, job_id)
+            )
+
+    def finish_job(self, job_id: str, progress: "JobProgress"):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE parse_jobs SET status = ?, finished_at = ?, sheets_done = sheets_total, "
+                "current_sheet = NULL, rows_processed = ?, products_count = ? WHERE id = ?",
+                (DONE, time.time(), progress.rows, progress.products_count, job_id)
+            )
+
+    def fail_job(self, job_id: str, error: str):
+        """Ошибка задания; частичные результаты удаляются"""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM parse_job_products WHERE job_id = ?", (job_id,))
+            self._connection.execute(
+                "UPDATE parse_jobs SET status = ?, finished_at = ?, products_count = 0, error = ? WHERE id = ?",
+                (FAILED, time.time(), error, job_id)
+            )
+
+    def read_products(self, job_id: str, offset: int, limit: int) -> List[bytes]:
+        """JSON вариантов с позиции offset (не больше limit)"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT data FROM parse_job_products WHERE job_id = ? AND position >= ? "
+                "ORDER BY position LIMIT ?",
+                (job_id, offset, limit)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def iter_products(self, job_id: str, batch_size: int = JOBS_BATCH_SIZE) -> Iterator[List[bytes]]:
+        """JSON всех вариантов задания пачками (каждая пачка - отдельный запрос)"""
+        offset = 0
+        while True:
+            items = self.read_products(job_id, offset, batch_size)
+            if not items:
+                return
+            offset += len(items)
+            yield items
+
+    def remove_expired(self, max_age: float) -> List[str]:
+        """Удаляет завершенные задания старше max_age сек.; возвращает их файлы загрузок"""
+        threshold = time.time() - max_age
+        with self._lock, self._connection:
+            rows = self._connection.execute(
+                "SELECT id, upload_path FROM parse_jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (DONE, FAILED, threshold)
+            ).fetchall()
+            for job_id, _ in rows:
+                self._connection.execute("DELETE FROM parse_job_products WHERE job_id = ?", (job_id,))
+                self._connection.execute("DELETE FROM parse_jobs WHERE id = ?", (job_id,))
+        return [upload_path for _, upload_path in rows if upload_path]
+
+    def close(self):
+        self._connection.close()
+
+
+class JobProgress:
+    """Прогресс разбора: текущий лист, завершенные листы, строки и варианты"""
+
+    __slots__ = ("sheet", "sheets_done", "rows", "products_count")
+
+    def __init__(self):
+        self.sheet: Optional[str] = None
+        self.sheets_done = 0
+        self.rows = 0
+        self.products_count = 0
+
+    def count_rows(self, rows: Iterable[Tuple[str, List[Any]]], flush: Optional[Callable[[], None]] = None,
+                   interval: float = JOBS_PROGRESS_INTERVAL) -> Iterator[Tuple[str, List[Any]]]:
+        """
+        Пропускает строки (лист, строка) дальше по конвейеру, считая листы и строки.
+        flush вызывается не реже раза в interval сек.: строки без вариантов
+        тоже видны в прогрессе задания
+        """
+        flushed = time.monotonic()
+        for sheet_name, row in rows:
+            if sheet_name != self.sheet:
+                if self.sheet is not None:
+                    self.sheets_done += 1
+                self.sheet = sheet_name
+            self.rows += 1
+            if flush is not None and time.monotonic() - flushed >= interval:
+                flush()
+                flushed = time.monotonic()
+            yield sheet_name, row
+
+
+def remove_file(path: Optional[str]):
+    if not path:
+        return
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"Ошибка удаления файла задания {path}: {e}")
+
+
+# Соединения рабочего процесса с файлами заданий (открываются при первом задании)
+_worker_stores: Dict[str, JobStore] = {}
+
+
+def run_job(job_id: str, db_path: str, batch_size: int = JOBS_BATCH_SIZE,
+            progress_interval: float = JOBS_PROGRESS_INTERVAL):
+    """
+    Выполнение задания в рабочем процессе: потоковый разбор с записью
+    вариантов и прогресса пачками. Ошибки разбора записываются в задание
+    """
+    store = _worker_stores.get(db_path)
+    if store is None:
+        store = _worker_stores[db_path] = JobStore(db_path)
+
+    job = store.get_job(job_id)
+    if job is None or job["status"] not in (QUEUED, RUNNING):
+        return
+    path = job["upload_path"]
+    progress = JobProgress()
+    try:
+        if not path or not os.path.isfile(path):
+            raise FileNotFoundError("файл загрузки не найден")
+        store.start_job(job_id, len(list_sheet_names(path)), get_reference_snapshot().version)
+        rows = progress.count_rows(iter_excel_rows(path, options=PRICE_COLUMNS),
+                                   lambda: store.save_progress(job_id, progress, []), progress_interval)
+        variants = iter_variant_records(iter_product_records(rows))
+        for items in encode_product_items(variants, batch_size):
+            store.save_progress(job_id, progress, items)
+    except Exception as e:
+        store.fail_job(job_id, f"Ошибка обработки файла: {getattr(e, 'detail', None) or str(e)}")
+    else:
+        store.finish_job(job_id, progress)
+    remove_file(path)
+
+
+def describe_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Состояние задания для ответа API (без служебных полей)"""
+    return {
+        "job_id": job["id"],
+        "filename": job["filename"],
+        "status": job["status"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "progress": {
+            "sheets_total": job["sheets_total"],
+            "sheets_done": job["sheets_done"],
+            "current_sheet": job["current_sheet"],
+            "rows_processed": job["rows_processed"],
+            "products_count": job["products_count"],
+        },
+        "error": job["error"],
+    }
+
+
+def encode_result_page(job: Dict[str, Any], offset: int, limit: int, items: List[bytes]) -> bytes:
+    """Страница результата: сохраненный JSON вариантов вставляется в ответ как есть"""
+    return encode_with_raw_fields({
+        "job_id": job["id"],
+        "filename": job["filename"],
+        "products_count": job["products_count"],
+        "offset": offset,
+        "limit": limit,
+    }, {"products": b"[" + b",".join(items) + b"]"})
+
+
+def iter_result_ndjson(store: JobStore, job: Dict[str, Any]) -> Iterator[bytes]:
+    """Результат задания в формате NDJSON /parse-excel/?stream=1: варианты и итоговая строка"""
+    for items in store.iter_products(job["id"]):
+        yield b"\n".join(items) + b"\n"
+    yield render_json({"filename": job["filename"], "products_count": job["products_count"]}) + b"\n"
+
+
+class JobRunner:
+    """
+    Пул выполнения заданий. Очередь - задания в статусе queued: при старте
+    незавершенные задания (в т.ч. прерванные остановкой) отправляются в пул заново
+    """
+
+    def __init__(self, store: JobStore, workers: int = JOBS_WORKERS, max_pending: int = JOBS_MAX_PENDING,
+                 ttl_hours: float = JOBS_TTL_HOURS):
+        self.store = store
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl = ttl_hours * 3600
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Запускает пул и возобновляет незавершенные задания (повторный вызов ничего не делает)"""
+        with self._lock:
+            if self._executor is not None:
+                return
+            self._executor = self._create_executor()
+        for path in self.store.remove_expired(self.ttl):
+            remove_file(path)
+        for job_id in self.store.pending_jobs():
+            self._submit(job_id)
+
+    def _create_executor(self) -> Executor:
+        if self.workers > 0:
+            return ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker,
+            )
+        return ThreadPoolExecutor(max_workers=1, thread_name_prefix="job")
+
+    def shutdown(self, wait: bool = True):
+        """Останавливает пул; задания из очереди выполнятся после следующего старта"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def submit(self, filename: str, upload_path: str, upload_size: int) -> str:
+        """Ставит файл в очередь; JobQueueFullError, если очередь заполнена"""
+        if self.store.count_pending() >= self.max_pending:
+            raise JobQueueFullError(f"В очереди {self.max_pending} заданий")
+        for path in self.store.remove_expired(self.ttl):
+            remove_file(path)
+        job_id = self.store.create_job(filename, upload_path, upload_size)
+        self.start()
+        self._submit(job_id)
+        return job_id
+
+    def _submit(self, job_id: str):
+        with self._lock:
+            if self._executor is None:
+                return  # пул остановлен: задание останется в очереди до следующего старта
+            try:
+                future = self._executor.submit(run_job, job_id, self.store.path)
+            except BrokenProcessPool:
+                # Процесс пула аварийно завершился - пул пересоздается
+                self._executor = self._create_executor()
+                future = self._executor.submit(run_job, job_id, self.store.path)
+        future.add_done_callback(lambda done: self._on_done(job_id, done))
+
+    def _on_done(self, job_id: str, future: Future):
+        """
+        Ошибки разбора записывает сам run_job; здесь - падение процесса пула.
+        Задание, которое выполнялось, завершается ошибкой, а еще не начатые
+        задания отправляются в новый пул
+        """
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is None:
+            return
+        job = self.store.get_job(job_id)
+        if job is None:
+            return
+        if job["status"] == QUEUED and isinstance(error, BrokenProcessPool):
+            self._submit(job_id)
+        elif job["status"] in (QUEUED, RUNNING):
+            if isinstance(error, BrokenProcessPool):
+                message = "Процесс разбора аварийно завершился"
+            else:
+                message = f"Ошибка выполнения задания: {error}"
+            self.store.fail_job(job_id, message)
+            remove_file(job["upload_path"])
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Состояние пула для административных эндпоинтов"""
+        return {
+            "workers": self.workers,
+            "mode": "process" if self.workers > 0 else "thread",
+            "started": self._executor is not None,
+            "pending": self.store.count_pending(),
+            "max_pending": self.max_pending,
+        }
+
+
+_runner: Optional[JobRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner() -> JobRunner:
+    """Пул заданий с хранилищем JOBS_DB (создается при первом обращении)"""
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                _runner = JobRunner(JobStore())
+    return _runner
@@ -1,35 +1,455 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
-from fastapi.encoders import jsonable_encoder
+import os
+import secrets
+import time
+from typing import AsyncIterator, List, Optional
+from fastapi import FastAPI, UploadFile, File, HTTPException, Header, Depends, Query, Request
+from fastapi.responses import FileResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool, iterate_in_threadpool
 
-from excel_parser import parse_excel_file
-from price_parser import parse_excel_rows
-from business_logic import apply_business_rules
+from business_logic import get_reference_cache, get_reference_snapshot, reference_source, refresh_reference_data
+from excel_parser import ReadOptions, ReadOptionsError, list_sheet_names, parse_read_options, select_sheets
+from pipeline import get_pipeline_executor, iter_pipeline_records, PipelineBusyError
+from serialization import (JSON_MEDIA_TYPE, NDJSON_MEDIA_TYPE, ProductsJSONResponse, build_result_body,
+                           encode_ndjson_line, encode_result_tail, iter_ndjson)
+from price_delta import PriceVersionNotFound, build_delta, get_version_store, load_previous_rows
+from result_cache import RESULT_CACHE_ENABLED, get_result_cache, make_cache_key
+from parse_memo import get_memo_stats
+from metrics import (PROMETHEUS_MEDIA_TYPE, PipelineStats, ServerTimingMiddleware, registry, render_metrics,
+                     stage_timer, stats_samples)
+from batch import BATCH_MAX_UPLOAD_SIZE, collect_batch_files, process_batch, remove_batch_files
+from jobs import (DONE, JOBS_DIR, JOBS_MAX_PAGE_SIZE, JOBS_PAGE_SIZE, JobQueueFullError, describe_job,
+                  encode_result_page, get_job_runner, iter_result_ndjson)
+from profiling import ProfilerBusyError, format_report, get_profile_store, profile_pipeline
+from uploads import SpooledUpload, UploadSizeLimitMiddleware, spool_upload
+from database import get_db_manager
+
+# Движок разбора строк: streaming (построчно) или columnar (pandas по столбцам)
+PARSER_ENGINE = os.getenv("PARSER_ENGINE", "streaming")
+
+# Разбор листов книги параллельно (можно включить для запроса: ?sheet_parallel=1)
+PARSER_SHEET_PARALLEL = os.getenv("PARSER_SHEET_PARALLEL", "false").lower() == "true"
+
+# Токен для административных эндпоинтов (заголовок X-Admin-Token)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
 
 app = FastAPI(title="Excel Parser API", description="API для парсинга прайс-листов Excel")
 
+# Слишком большие загрузки отклоняются до разбора тела запроса (MAX_UPLOAD_SIZE_MB)
+app.add_middleware(UploadSizeLimitMiddleware)
+app.add_middleware(UploadSizeLimitMiddleware, max_size=BATCH_MAX_UPLOAD_SIZE, paths=("/parse-batch",))
+# Время запросов и заголовок Server-Timing (добавлен последним - внешний слой)
+app.add_middleware(ServerTimingMiddleware)
+
+def collect_service_metrics():
+    """
+    Статистика кэшей и пула БД для /metrics (снимается в момент запроса)
+    """
+    families = []
+    families += stats_samples("reference_cache", get_reference_cache().get_stats(),
+                              counters=("hits", "misses", "loads", "background_refreshes", "load_seconds"))
+    families += stats_samples("result_cache", get_result_cache().get_stats(),
+                              counters=("memory_hits", "disk_hits", "misses", "stores", "evictions"))
+    memo = get_memo_stats()
+    families += stats_samples("parse_memo", {"hits": memo["hits"], "misses": memo["misses"]},
+                              counters=("hits", "misses"))
+    families += stats_samples("db_pool", get_db_manager().get_pool_stats(),
+                              counters=("created", "closed", "checkouts", "waits", "timeouts",
+                                        "health_check_failures", "wait_seconds_total"))
+    return families
+
+registry.add_collector(collect_service_metrics)
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Проверка доступа к административным эндпоинтам
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Административный доступ не настроен (ADMIN_TOKEN)")
+    if not secrets.compare_digest(x_admin_token or "", ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Неверный токен администратора")
+
+@app.on_event("startup")
+async def load_reference_data():
+    """
+    Загружаем справочники при старте, чтобы первый запрос не ждал БД
+    """
+    await run_in_threadpool(get_reference_snapshot)
+    get_pipeline_executor().start()
+    # Задания, не завершенные до остановки, возобновляются
+    await run_in_threadpool(get_job_runner().start)
+
+@app.on_event("shutdown")
+def stop_pipeline():
+    """
+    Останавливаем процессы разбора (задания из очереди выполнятся после перезапуска)
+    """
+    get_pipeline_executor().shutdown()
+    get_job_runner().shutdown()
+
+async def ndjson_body(filename: str, upload: SpooledUpload,
+                      options: Optional[ReadOptions] = None) -> AsyncIterator[bytes]:
+    """
+    Тело потокового ответа: цепочка генераторов разбора выполняется в пуле потоков
+    по фрагменту за раз. Ошибка после начала ответа передается последней записью.
+    Временный файл загрузки удаляется по окончании ответа
+    """
+    stats = PipelineStats()
+    try:
+        async with get_pipeline_executor().slot():
+            records = iter_pipeline_records(upload.path, PARSER_ENGINE, stats=stats, options=options)
+            chunks = iterate_in_threadpool(iter_ndjson(records, filename))
+            # Первый фрагмент (чтение файла и первые товары) - до отправки заголовков,
+            # чтобы ошибки открытия файла вернулись обычным кодом ошибки
+            yield await chunks.__anext__()
+            try:
+                async for chunk in chunks:
+                    yield chunk
+            except Exception as e:
+                yield encode_ndjson_line({"error": f"Ошибка обработки файла: {str(e)}"})
+    finally:
+        stats.record()
+        upload.remove()
+
+async def stream_products(filename: str, upload: SpooledUpload,
+                          options: Optional[ReadOptions] = None) -> StreamingResponse:
+    """
+    Потоковый ответ NDJSON: товар на строку, последней строкой итог с products_count
+    """
+    body = ndjson_body(filename, upload, options)
+    first_chunk = await body.__anext__()
+
+    async def chunks():
+        yield first_chunk
+        async for chunk in body:
+            yield chunk
+
+    return StreamingResponse(chunks(), media_type=NDJSON_MEDIA_TYPE)
+
+async def profiled_products(filename: str, upload: SpooledUpload,
+                            options: Optional[ReadOptions] = None) -> Response:
+    """
+    Разбор под профилировщиком в потоке процесса API (cProfile видит только свой поток).
+    Отчет сохраняется (GET /admin/profiles/{id}) и возвращается в поле profile
+    """
+    async with get_pipeline_executor().slot():
+        enriched, report, stats = await run_in_threadpool(profile_pipeline, upload.path, PARSER_ENGINE,
+                                                         options=options)
+    report["filename"] = filename
+    profile_id = await run_in_threadpool(get_profile_store().save, report, stats)
+    return ProductsJSONResponse(content={
+        "filename": filename,
+        "products_count": len(enriched),
+        "products": enriched,
+        "profile": report
+    }, headers={"X-Profile-Id": profile_id})
+
+def result_cache_key(file_hash: str, reference_version: str, options: Optional[ReadOptions]) -> str:
+    """Ключ кэша результатов для файла, версии справочников и параметров чтения"""
+    read_options = {"read_options": repr(tuple(options))} if options is not None else {}
+    return make_cache_key(file_hash, reference_version, engine=PARSER_ENGINE, **read_options)
+
 @app.post("/parse-excel/")
-async def parse_excel(file: UploadFile = File(...)):
+async def parse_excel(request: Request, file: UploadFile = File(...), stream: bool = False,
+                      sheet_parallel: Optional[bool] = None, profile: bool = False,
+                      sheet: Optional[List[str]] = Query(None), columns: Optional[str] = None,
+                      header: bool = False, x_admin_token: Optional[str] = Header(None)):
     """
-    Эндпоинт для загрузки и парсинга Excel файла
+    Эндпоинт для загрузки и парсинга Excel файла.
+    ?stream=1 или Accept: application/x-ndjson - потоковый ответ NDJSON,
+    ?sheet_parallel=1 - листы разбираются параллельно, в ответе время по листам,
+    ?profile=1 (только с X-Admin-Token) - разбор под профилировщиком, отчет в поле profile,
+    ?sheet=Прайс&sheet=Склад* - только выбранные листы (имя, маска или индекс с 0),
+    ?columns=B,D,F - столбцы название, единица, цена (буквы или номера с 1),
+    ?header=1 - столбцы по строке заголовка, строки до нее пропускаются
     """
     if not file.filename or not file.filename.endswith(('.xlsx', '.xls')):
         raise HTTPException(status_code=400, detail="Формат файла должен быть .xlsx или .xls")
+    if profile:
+        require_admin(x_admin_token)
+    try:
+        options = parse_read_options(sheet, columns, header)
+    except ReadOptionsError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
+    # Файл порциями переносится на диск, парсер читает его по пути
+    with stage_timer("upload"):
+        upload = await spool_upload(file)
+    streaming = False
     try:
-        content = await file.read()
-        raw_data = parse_excel_file(content)  # просто листы → строки
-        normalized = parse_excel_rows(raw_data)  # разбор цен/названий
-        enriched = apply_business_rules(normalized)  # категории, наценки
+        # Неизвестный лист - ошибка запроса, а не пустой результат
+        if options is not None and options.sheets:
+            select_sheets(await run_in_threadpool(list_sheet_names, upload.path), options.sheets)
+        
+        # Профилируемый запрос не использует кэш результатов и пул процессов
+        if profile:
+            return await profiled_products(file.filename, upload, options)
+        
+        if stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+            response = await stream_products(file.filename, upload, options)
+            streaming = True  # временный файл удалит поток ответа
+            return response
         
-        return JSONResponse(content=jsonable_encoder({
-            "filename": file.filename,
-            "products_count": len(enriched),
-            "products": enriched
-        }))
+        # Разбор и бизнес-правила выполняются в пуле процессов (pipeline.run_pipeline_records)
+        if PARSER_SHEET_PARALLEL if sheet_parallel is None else sheet_parallel:
+            # Время по листам относится к конкретному запуску, такой ответ не кэшируется;
+            # сами товары сохраняются под версией справочников, на которой разобраны листы
+            enriched, sheet_timings, reference_version = await get_pipeline_executor().run_by_sheet(
+                upload.path, PARSER_ENGINE, options
+            )
+            if RESULT_CACHE_ENABLED and reference_version == get_reference_snapshot().version:
+                tail = await run_in_threadpool(encode_result_tail, {
+                    "products_count": len(enriched),
+                    "products": enriched
+                })
+                await run_in_threadpool(get_result_cache().put,
+                                        result_cache_key(upload.sha256, reference_version, options), tail)
+            return ProductsJSONResponse(content={
+                "filename": file.filename,
+                "products_count": len(enriched),
+                "products": enriched,
+                "sheet_timings": sheet_timings
+            })
+        
+        # Тот же файл при той же версии справочников отдается из кэша результатов
+        reference_version = get_reference_snapshot().version
+        cache_key = result_cache_key(upload.sha256, reference_version, options)
+        tail = None
+        if RESULT_CACHE_ENABLED:
+            with stage_timer("result_cache"):
+                tail = await run_in_threadpool(get_result_cache().get, cache_key)
+        cache_status = "hit"
+        if tail is None:
+            cache_status = "miss"
+            enriched, worker_version = await get_pipeline_executor().run_versioned(
+                upload.path, PARSER_ENGINE, options
+            )
+            with stage_timer("serialize"):
+                tail = await run_in_threadpool(encode_result_tail, {
+                    "products_count": len(enriched),
+                    "products": enriched
+                })
+            # Рабочий процесс старого пула мог разобрать файл на прежних справочниках -
+            # такой результат под ключом новой версии не сохраняется
+            if RESULT_CACHE_ENABLED and worker_version == reference_version:
+                await run_in_threadpool(get_result_cache().put, cache_key, tail)
+        
+        return Response(content=build_result_body(file.filename, tail), media_type=JSON_MEDIA_TYPE,
+                        headers={"X-Result-Cache": cache_status})
+        
+    except ReadOptionsError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (PipelineBusyError, ProfilerBusyError) as e:
+        raise HTTPException(status_code=503, detail=f"Сервер перегружен: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка обработки файла: {str(e)}")
+    finally:
+        if not streaming:
+            upload.remove()
+
+@app.post("/parse-excel/delta")
+async def parse_excel_delta(file: UploadFile = File(...), previous_version: Optional[str] = None):
+    """
+    Разбор новой версии прайса относительно сохраненной previous_version:
+    обрабатываются только новые и измененные строки, в ответе - добавленные,
+    удаленные и измененные варианты и version_id для следующего сравнения
+    """
+    if not file.filename or not file.filename.endswith(('.xlsx', '.xls')):
+        raise HTTPException(status_code=400, detail="Формат файла должен быть .xlsx или .xls")
+    
+    with stage_timer("upload"):
+        upload = await spool_upload(file)
+    try:
+        # Сохраненная версия читается здесь, строки разбираются в пуле на снимке справочников запроса
+        store = get_version_store()
+        snapshot = get_reference_snapshot()
+        previous_rows, reusable = await run_in_threadpool(load_previous_rows, store, previous_version, snapshot.version)
+        rows, reference_version = await get_pipeline_executor().run_delta_rows(
+            upload.path, reusable, reference_source(snapshot)
+        )
+        result = await run_in_threadpool(
+            build_delta, file.filename, previous_version, previous_rows, rows, reference_version, store
+        )
+        return ProductsJSONResponse(content=result)
         
+    except PriceVersionNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except PipelineBusyError as e:
+        raise HTTPException(status_code=503, detail=f"Сервер перегружен: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка обработки файла: {str(e)}")
+    finally:
+        upload.remove()
+
+@app.post("/parse-batch/")
+async def parse_batch(files: List[UploadFile] = File(...)):
+    """
+    Пакетный разбор: несколько файлов .xlsx/.xls и/или zip-архивов с ними.
+    Файлы разбираются параллельно на одном снимке справочников; ошибка
+    отдельного файла возвращается в его записи и не прерывает пакет
+    """
+    started = time.perf_counter()
+    batch = await collect_batch_files(files)
+    try:
+        body = await process_batch(batch, PARSER_ENGINE, started)
+        return Response(content=body, media_type=JSON_MEDIA_TYPE)
+        
+    except PipelineBusyError as e:
+        raise HTTPException(status_code=503, detail=f"Сервер перегружен: {str(e)}")
+    finally:
+        remove_batch_files(batch)
+
+@app.post("/jobs", status_code=202)
+async def create_job(response: Response, file: UploadFile = File(...)):
+    """
+    Задание на разбор большого прайса: файл сохраняется, id задания возвращается сразу,
+    разбор идет в пуле заданий. Состояние - GET /jobs/{id}, результат - GET /jobs/{id}/result
+    """
+    if not file.filename or not file.filename.endswith(('.xlsx', '.xls')):
+        raise HTTPException(status_code=400, detail="Формат файла должен быть .xlsx или .xls")
+    
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    upload = await spool_upload(file, directory=JOBS_DIR)
+    runner = get_job_runner()
+    try:
+        job_id = await run_in_threadpool(runner.submit, file.filename, upload.path, upload.size)
+    except JobQueueFullError as e:
+        upload.remove()
+        raise HTTPException(status_code=503, detail=f"Сервер перегружен: {str(e)}")
+    
+    response.headers["Location"] = f"/jobs/{job_id}"
+    return describe_job(runner.store.get_job(job_id))
+
+def get_job_or_404(job_id: str):
+    job = get_job_runner().store.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Задание не найдено: {job_id}")
+    return job
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    """
+    Состояние задания и прогресс (листы, строки, варианты)
+    """
+    return describe_job(get_job_or_404(job_id))
+
+@app.get("/jobs/{job_id}/result")
+def job_result(request: Request, job_id: str, offset: int = Query(0, ge=0),
+               limit: int = Query(JOBS_PAGE_SIZE, ge=1, le=JOBS_MAX_PAGE_SIZE), stream: bool = False):
+    """
+    Результат завершенного задания постранично (offset, limit) или целиком
+    потоком NDJSON (?stream=1 или Accept: application/x-ndjson)
+    """
+    job = get_job_or_404(job_id)
+    if job["status"] != DONE:
+        detail = f"Задание не завершено: {job['status']}"
+        if job["error"]:
+            detail += f" ({job['error']})"
+        raise HTTPException(status_code=409, detail=detail)
+    
+    store = get_job_runner().store
+    if stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        return StreamingResponse(iterate_in_threadpool(iter_result_ndjson(store, job)), media_type=NDJSON_MEDIA_TYPE)
+    
+    items = store.read_products(job_id, offset, limit)
+    return Response(content=encode_result_page(job, offset, limit, items), media_type=JSON_MEDIA_TYPE)
+
+@app.get("/admin/reference-data", dependencies=[Depends(require_admin)])
+def reference_data_status():
+    """
+    Версия и размер текущего снимка справочников
+    """
+    return get_reference_snapshot().describe()
+
+@app.post("/admin/reference-data/refresh", dependencies=[Depends(require_admin)])
+def reference_data_refresh():
+    """
+    Принудительная перезагрузка справочников из БД.
+    Новый снимок строится полностью, до этого запросы обслуживаются старым.
+    Процессы разбора перезапускаются и загружают свежий снимок
+    """
+    snapshot = refresh_reference_data()
+    get_pipeline_executor().restart()
+    return snapshot.describe()
+
+@app.get("/admin/db-pool", dependencies=[Depends(require_admin)])
+def db_pool_status():
+    """
+    Использование пула соединений с БД (занятые, ожидания, таймауты)
+    """
+    return get_db_manager().get_pool_stats()
+
+@app.get("/admin/pipeline", dependencies=[Depends(require_admin)])
+def pipeline_status():
+    """
+    Состояние пула разбора (процессы, занятые слоты)
+    """
+    return get_pipeline_executor().get_stats()
+
+@app.get("/admin/jobs", dependencies=[Depends(require_admin)])
+def jobs_status():
+    """
+    Состояние пула заданий (процессы, задания в очереди и в работе)
+    """
+    return get_job_runner().get_stats()
+
+@app.get("/admin/result-cache", dependencies=[Depends(require_admin)])
+def result_cache_status():
+    """
+    Статистика кэша результатов (попадания в памяти и на диске, промахи, объем)
+    """
+    return get_result_cache().get_stats()
+
+@app.post("/admin/result-cache/clear", dependencies=[Depends(require_admin)])
+def result_cache_clear():
+    """
+    Очистка кэша результатов
+    """
+    get_result_cache().invalidate()
+    return get_result_cache().get_stats()
+
+@app.get("/admin/parse-memo", dependencies=[Depends(require_admin)])
+def parse_memo_status():
+    """
+    Статистика мемоизации разбора ячеек (процесс API; у процессов пула разбора своя)
+    """
+    return get_memo_stats()
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+def profiles_list():
+    """
+    Сохраненные отчеты профилирования (новые первыми)
+    """
+    return get_profile_store().list()
+
+@app.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+def profile_report(profile_id: str, format: str = "json"):
+    """
+    Отчет профилирования: JSON или ?format=text - таблица для консоли
+    """
+    report = get_profile_store().load(profile_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail=f"Отчет профилирования не найден: {profile_id}")
+    if format == "text":
+        return PlainTextResponse(format_report(report))
+    return report
+
+@app.get("/admin/profiles/{profile_id}/pstats", dependencies=[Depends(require_admin)])
+def profile_pstats(profile_id: str):
+    """
+    Полный дамп cProfile (pstats) для просмотра в snakeviz, pstats и т.п.
+    """
+    path = get_profile_store().pstats_path(profile_id)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail=f"Отчет профилирования не найден: {profile_id}")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+
+@app.get("/metrics")
+def metrics():
+    """
+    Метрики в текстовом формате Prometheus: время этапов разбора, счетчики строк
+    и вариантов, время запросов к API и БД, статистика кэшей (процесс API)
+    """
+    return Response(content=render_metrics(), media_type=PROMETHEUS_MEDIA_TYPE)
 
 @app.get("/")
 async def root():
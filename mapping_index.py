@@ -0,0 +1,165 @@
+"""
+Индекс для поиска соответствия товара в таблице категорий.
+Заменяет перебор всех ключей (key in name or name in key) в find_product_mapping:
+ - автомат Ахо-Корасик находит ключи, входящие в название;
+ - обобщенный суффиксный автомат находит ключи, содержащие название.
+Из всех подходящих ключей выбирается первый по порядку словаря категорий,
+как и при прежнем переборе
+"""
+
+from typing import Any, Dict, List, Optional
+
+# Ранг "нет совпадения" (больше любого номера ключа)
+NO_MATCH = float("inf")
+
+
+class ProductMappingIndex:
+    """
+    Индекс над ключами get_product_mapping(); строится один раз на загрузку кэша.
+    Стоимость поиска зависит от длины названия, а не от числа категорий
+    """
+
+    def __init__(self, product_mapping: Dict[str, Dict[str, Any]]):
+        self.mapping = product_mapping
+        self.keys: List[str] = list(product_mapping)
+        self.values: List[Dict[str, Any]] = list(product_mapping.values())
+        self._build_aho_corasick()
+        self._build_suffix_automaton()
+
+    def find(self, base_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Точное совпадение, иначе первый по порядку ключ,
+        который входит в название или содержит его
+        """
+        if base_name in self.mapping:
+            return self.mapping[base_name]
+
+        rank = min(self.first_key_in_name(base_name), self.first_key_containing(base_name))
+        if rank == NO_MATCH:
+            return None
+        return self.values[rank]
+
+    # --- key in name: автомат Ахо-Корасик ---
+
+    def _build_aho_corasick(self):
+        goto: List[Dict[str, int]] = [{}]
+        best = [NO_MATCH]
+
+        for rank, key in enumerate(self.keys):
+            node = 0
+            for char in key:
+                next_node = goto[node].get(char)
+                if next_node is None:
+                    next_node = len(goto)
+                    goto[node][char] = next_node
+                    goto.append({})
+                    best.append(NO_MATCH)
+                node = next_node
+            best[node] = min(best[node], rank)
+
+        # Обход в ширину: суффиксные ссылки и минимальный ранг по цепочке ссылок
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for child in queue:
+            best[child] = min(best[child], best[0])
+        for node in queue:
+            for char, child in goto[node].items():
+                link = fail[node]
+                while link and char not in goto[link]:
+                    link = fail[link]
+                fail[child] = goto[link].get(char, 0)
+                best[child] = min(best[child], best[fail[child]])
+                queue.append(child)
+
+        self._ac_goto = goto
+        self._ac_fail = fail
+        self._ac_best = best
+
+    def first_key_in_name(self, name: str) -> float:
+        """Наименьший ранг ключа, который является подстрокой name"""
+        goto, fail, best = self._ac_goto, self._ac_fail, self._ac_best
+        rank = best[0]
+        node = 0
+        for char in name:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if best[node] < rank:
+                rank = best[node]
+        return rank
+
+    # --- name in key: обобщенный суффиксный автомат ---
+
+    def _build_suffix_automaton(self):
+        self._sa_next: List[Dict[str, int]] = [{}]
+        self._sa_link: List[int] = [-1]
+        self._sa_length: List[int] = [0]
+
+        for key in self.keys:
+            last = 0
+            for char in key:
+                last = self._sa_extend(last, char)
+
+        # Минимальный ранг ключа, содержащего строки состояния.
+        # Ключи обходятся по возрастанию ранга, поэтому уже помеченные
+        # состояния (и их суффиксные ссылки) трогать не нужно
+        best = [NO_MATCH] * len(self._sa_next)
+        for rank, key in enumerate(self.keys):
+            state = 0
+            for char in key:
+                state = self._sa_next[state][char]
+                node = state
+                while node != -1 and best[node] == NO_MATCH:
+                    best[node] = rank
+                    node = self._sa_link[node]
+            if best[0] == NO_MATCH:
+                best[0] = rank  # пустой ключ
+        self._sa_best = best
+
+    def _sa_new_state(self, length: int, link: int, transitions: Dict[str, int]) -> int:
+        self._sa_next.append(transitions)
+        self._sa_link.append(link)
+        self._sa_length.append(length)
+        return len(self._sa_next) - 1
+
+    def _sa_clone(self, p: int, q: int, char: str) -> int:
+        next_, link, length = self._sa_next, self._sa_link, self._sa_length
+        clone = self._sa_new_state(length[p] + 1, link[q], dict(next_[q]))
+        while p != -1 and next_[p].get(char) == q:
+            next_[p][char] = clone
+            p = link[p]
+        link[q] = clone
+        return clone
+
+    def _sa_extend(self, last: int, char: str) -> int:
+        next_, link, length = self._sa_next, self._sa_link, self._sa_length
+
+        # Переход уже есть (строка встречалась в другом ключе)
+        if char in next_[last]:
+            q = next_[last][char]
+            if length[last] + 1 == length[q]:
+                return q
+            return self._sa_clone(last, q, char)
+
+        cur = self._sa_new_state(length[last] + 1, 0, {})
+        p = last
+        while p != -1 and char not in next_[p]:
+            next_[p][char] = cur
+            p = link[p]
+        if p != -1:
+            q = next_[p][char]
+            if length[p] + 1 == length[q]:
+                link[cur] = q
+            else:
+                link[cur] = self._sa_clone(p, q, char)
+        return cur
+
+    def first_key_containing(self, name: str) -> float:
+        """Наименьший ранг ключа, который содержит name как подстроку"""
+        next_ = self._sa_next
+        state = 0
+        for char in name:
+            state = next_[state].get(char)
+            if state is None:
+                return NO_MATCH
+        return self._sa_best[state]
@@ -0,0 +1,359 @@
+"""
+Метрики сервиса в текстовом формате Prometheus (/metrics) и заголовок Server-Timing.
+Гистограммы времени этапов разбора, счетчики строк/товаров/вариантов,
+время запросов к БД; статистика кэшей снимается в момент запроса /metrics.
+
+Этапы разбора в рабочих процессах пула измеряются там же (PipelineStats)
+и передаются в основной процесс вместе с результатом.
+Время этапов текущего запроса дополнительно попадает в Server-Timing
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Сбор метрик и заголовок Server-Timing
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Границы корзин гистограмм времени, сек.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, Labels, float]
+
+
+def escape_label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in labels) + "}"
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Монотонный счетчик с метками"""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [(self.name, labels, value) for labels, value in self._values.items()]
+
+
+class Histogram:
+    """Гистограмма с накопительными корзинами (формат Prometheus)"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        # метки -> [счетчики корзин..., сумма, количество]
+        self._values: Dict[Labels, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self) -> List[Sample]:
+        samples = []
+        with self._lock:
+            for labels, state in self._values.items():
+                for bound, count in zip(self.buckets + (float("inf"),), state[:-2] + [state[-1]]):
+                    samples.append((self.name + "_bucket", labels + (("le", format_value(bound)),), count))
+                samples.append((self.name + "_sum", labels, state[-2]))
+                samples.append((self.name + "_count", labels, state[-1]))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    Набор метрик процесса. Коллекторы - функции, которые при каждом
+    запросе /metrics возвращают текущие значения (например, статистику кэшей)
+    """
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]] = []
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        metric = Counter(name, documentation)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]):
+        """collector() -> [(имя, тип, описание, [(имя, метки, значение)])]"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        families = [(metric.name, metric.type, metric.documentation, metric.samples()) for metric in self._metrics]
+        for collector in self._collectors:
+            try:
+                families.extend(collector())
+            except Exception as e:
+                print(f"Ошибка сбора метрик: {e}")
+
+        lines = []
+        for name, kind, documentation, samples in families:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{format_labels(labels)} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram("parser_stage_seconds", "Время этапа обработки прайса, сек.")
+ROWS_TOTAL = registry.counter("parser_rows_total", "Прочитано строк Excel")
+PRODUCTS_TOTAL = registry.counter("parser_products_total", "Товаров после разбора строк")
+VARIANTS_TOTAL = registry.counter("parser_variants_total", "Вариантов товаров после бизнес-правил")
+UNMATCHED_TOTAL = registry.counter("parser_unmatched_products_total", "Товаров без категории (без вариантов)")
+SUGGESTED_TOTAL = registry.counter("parser_suggested_products_total",
+                                   "Товаров без категории с подсказкой нечеткого поиска (без цены продажи)")
+DB_QUERY_SECONDS = registry.histogram("db_query_seconds", "Время запроса к БД, сек.")
+DB_QUERY_ERRORS = registry.counter("db_query_errors_total", "Ошибки запросов к БД")
+HTTP_REQUEST_SECONDS = registry.histogram("http_request_duration_seconds", "Время обработки HTTP-запроса, сек.")
+
+
+# --- Server-Timing текущего запроса ---
+
+class ServerTiming:
+    """Время этапов одного запроса (этапы с одинаковым именем суммируются)"""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def header(self, total: Optional[float] = None) -> str:
+        entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.stages.items()]
+        if total is not None:
+            entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_server_timing: ContextVar[Optional[ServerTiming]] = ContextVar("server_timing", default=None)
+
+
+def record_stage(stage: str, seconds: float):
+    """Время этапа: в гистограмму и в Server-Timing текущего запроса"""
+    if not METRICS_ENABLED:
+        return
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timing = _server_timing.get()
+    if timing is not None:
+        timing.add(stage, seconds)
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """Измерение блока with как этапа stage"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+@contextmanager
+def db_query_timer(operation: str) -> Iterator[None]:
+    """Время запроса к БД (execute_query, execute_update, bulk_insert); ошибки считаются отдельно"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        DB_QUERY_ERRORS.inc(operation=operation)
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        if METRICS_ENABLED:
+            DB_QUERY_SECONDS.observe(seconds, operation=operation)
+            timing = _server_timing.get()
+            if timing is not None:
+                timing.add("db", seconds)
+
+
+# --- этапы конвейера разбора ---
+
+class PipelineStats:
+    """
+    Собственное время этапов цепочки генераторов разбора и счетчики.
+    Генераторы вложены (чтение → разбор → бизнес-правила), поэтому время
+    этапа - время его next() за вычетом времени этапа, из которого он читает.
+    Объект передается из рабочего процесса в основной (pickle)
+    """
+
+    def __init__(self):
+        # Суммарное время next() оберток в порядке вложенности (внутренний этап первым)
+        self.cumulative: Dict[str, float] = {}
+        # Этапы, выполненные целиком (колоночный движок, результаты других прогонов)
+        self.completed: Dict[str, float] = {}
+        self.rows = 0
+        self.products = 0
+        self.variants = 0
+        self.unmatched = 0
+        self.suggested = 0
+
+    def timed(self, iterable: Iterable[Any], stage: str, counter: Optional[str] = None) -> Iterator[Any]:
+        """Обертка этапа: суммирует время next() (вместе с вложенными этапами) и считает элементы"""
+        # Этап регистрируется сразу: обертки создаются изнутри наружу, а выполняться начинают снаружи
+        self.cumulative.setdefault(stage, 0.0)
+        return self._timed(iter(iterable), stage, counter)
+
+    def _timed(self, iterator: Iterator[Any], stage: str, counter: Optional[str]) -> Iterator[Any]:
+        perf_counter = time.perf_counter
+        cumulative = self.cumulative
+        count = 0
+        try:
+            while True:
+                started = perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    cumulative[stage] += perf_counter() - started
+                count += 1
+                yield item
+        finally:
+            if counter is not None:
+                setattr(self, counter, getattr(self, counter) + count)
+
+    def add_stage(self, stage: str, seconds: float):
+        """Этап, выполненный целиком до следующих"""
+        self.completed[stage] = self.completed.get(stage, 0.0) + seconds
+
+    def stage_seconds(self) -> Dict[str, float]:
+        """Собственное время этапов"""
+        result = dict(self.completed)
+        previous = 0.0
+        for stage, seconds in self.cumulative.items():
+            result[stage] = result.get(stage, 0.0) + max(seconds - previous, 0.0)
+            previous = seconds
+        return result
+
+    def merge(self, other: "PipelineStats"):
+        """Добавляет результаты другого прогона (например, другого листа)"""
+        for stage, seconds in other.stage_seconds().items():
+            self.add_stage(stage, seconds)
+        self.rows += other.rows
+        self.products += other.products
+        self.variants += other.variants
+        self.unmatched += other.unmatched
+        self.suggested += other.suggested
+
+    def record(self):
+        """Переносит результаты прогона в метрики процесса и Server-Timing запроса"""
+        if not METRICS_ENABLED:
+            return
+        for stage, seconds in self.stage_seconds().items():
+            record_stage(stage, seconds)
+        ROWS_TOTAL.inc(self.rows)
+        PRODUCTS_TOTAL.inc(self.products)
+        VARIANTS_TOTAL.inc(self.variants)
+        UNMATCHED_TOTAL.inc(self.unmatched)
+        SUGGESTED_TOTAL.inc(self.suggested)
+
+
+def stats_samples(prefix: str, stats: Dict[str, Any], counters: Sequence[str],
+                  labels: Labels = ()) -> List[Tuple[str, str, str, List[Sample]]]:
+    """
+    Числовые поля get_stats() как метрики: counters - монотонные (с суффиксом _total,
+    если у поля его еще нет), остальные - gauge
+    """
+    families = []
+    for field, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        kind = "counter" if field in counters else "gauge"
+        name = f"{prefix}_{field}"
+        if kind == "counter" and not name.endswith("_total"):
+            name += "_total"
+        families.append((name, kind, f"{prefix}: {field}", [(name, labels, value)]))
+    return families
+
+
+# --- HTTP ---
+
+class ServerTimingMiddleware:
+    """
+    ASGI-middleware: время запроса в гистограмму (по шаблону пути маршрута)
+    и заголовок Server-Timing с этапами, завершенными до начала ответа
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        timing = ServerTiming()
+        token = _server_timing.set(timing)
+        started = time.perf_counter()
+        status = 500
+
+        async def timed_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                header = timing.header(time.perf_counter() - started).encode("latin-1")
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            _server_timing.reset(token)
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                method=scope["method"], path=getattr(route, "path", "other"), status=str(status),
+            )
+
+
+def render_metrics() -> str:
+    return registry.render()
@@ -1,4 +1,7 @@
 import re
+from typing import List, Tuple
+
+from parse_memo import memoize
 
 def parse_names(name_str: str):
     """
@@ -26,6 +29,17 @@ def extract_individual_products(name_str: str):
     - "Квинта+GL(1210,1150)/ Трамонтана S МП(1195,1155)" → ["Квинта+GL(1210,1150)", "Трамонтана S МП(1195,1155)"]
     - "Профнастил GL-10 (1180,1150),C10(1154,1100)sf" → ["Профнастил GL-10 (1180,1150)", "C10(1154,1100)sf"]
     """
+    return list(_individual_products(name_str))
+
+@memoize("extract_individual_products")
+def _individual_products(name_str: str) -> Tuple[str, ...]:
+    """Запоминаемый результат разбора (кортеж, чтобы вызывающий код не изменил кэш)"""
+    return tuple(split_individual_products(name_str))
+
+def split_individual_products(name_str: str) -> List[str]:
+    """
+    Разбор составного названия без мемоизации
+    """
     # Убираем лишние пробелы
     name_str = re.sub(r'\s+', ' ', name_str.strip())
     
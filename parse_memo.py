@@ -0,0 +1,62 @@
+"""
+Мемоизация разбора ячеек прайса.
+Одни и те же пары (название, цена) повторяются на всех листах книги
+(например, "Профнастил С-8" / "362sf" на каждом региональном листе),
+поэтому результаты чистых функций разбора запоминаются по исходным строкам.
+
+Кэши ограничены PARSE_MEMO_SIZE записями (вытесняются давно не использованные)
+и сбрасываются вместе с clear_cache() и при смене снимка справочников.
+Статистика ведется отдельно в каждом процессе (в процессах пула разбора - своя)
+"""
+
+import functools
+import os
+from typing import Any, Callable, Dict
+
+# Число запоминаемых результатов для каждой функции (0 - мемоизация выключена)
+PARSE_MEMO_SIZE = int(os.getenv("PARSE_MEMO_SIZE", 8192))
+
+_memos: Dict[str, Any] = {}
+
+
+def memoize(name: str) -> Callable[[Callable], Callable]:
+    """
+    Декоратор: ограниченный LRU-кэш (functools.lru_cache) с учетом в общей статистике.
+    Аргументы функции должны быть хэшируемыми, а результат - неизменяемым
+    или копироваться вызывающим кодом
+    """
+    def decorator(func: Callable) -> Callable:
+        cached = functools.lru_cache(maxsize=max(PARSE_MEMO_SIZE, 0))(func)
+        _memos[name] = cached
+        return cached
+    return decorator
+
+
+def reset_memos():
+    """Сбрасывает все кэши разбора вместе со счетчиками"""
+    for cached in _memos.values():
+        cached.cache_clear()
+
+
+def on_reference_change(snapshot):
+    """Обработчик смены снимка справочников (ReferenceDataCache.add_listener)"""
+    reset_memos()
+
+
+def get_memo_stats() -> Dict[str, Any]:
+    """Статистика кэшей разбора текущего процесса для административных эндпоинтов"""
+    functions = {}
+    for name, cached in _memos.items():
+        info = cached.cache_info()
+        functions[name] = {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "capacity": info.maxsize,
+        }
+    return {
+        "capacity": PARSE_MEMO_SIZE,
+        "hits": sum(stats["hits"] for stats in functions.values()),
+        "misses": sum(stats["misses"] for stats in functions.values()),
+        "functions": functions,
+    }
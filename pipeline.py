@@ -0,0 +1,406 @@
+"""
+Выполнение конвейера разбора прайса (чтение Excel → разбор строк → бизнес-правила)
+вне цикла событий: в пуле процессов, чтобы тяжелый разбор использовал
+все ядра и не блокировал остальные запросы API
+"""
+
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from excel_parser import (PRICE_COLUMNS, ExcelParseError, ExcelSource, ReadOptions, iter_excel_rows,
+                          list_sheet_names, read_excel_frames, selected_sheet_names)
+from price_parser import iter_product_records
+from columnar_parser import product_records_columnar
+from business_logic import (ReferenceSource, iter_variant_records, get_reference_snapshot,
+                            pinned_reference_snapshot, reference_source, snapshot_from_source)
+from price_delta import RowKey, parse_changed_rows
+from records import ProductVariant
+from metrics import METRICS_ENABLED, PipelineStats, stage_timer
+from serialization import encode_products
+
+# Число процессов разбора (0 - разбор в потоках основного процесса)
+PARSER_WORKERS = int(os.getenv("PARSER_WORKERS", os.cpu_count() or 1))
+
+# Сколько файлов разбирается одновременно; остальные ждут своей очереди
+PARSER_MAX_CONCURRENCY = int(os.getenv("PARSER_MAX_CONCURRENCY", max(PARSER_WORKERS, 1)))
+
+# Сколько секунд запрос может ждать очереди, прежде чем получит отказ
+PARSER_QUEUE_TIMEOUT = float(os.getenv("PARSER_QUEUE_TIMEOUT", 60))
+
+
+class PipelineError(Exception):
+    """
+    Ошибка разбора в рабочем процессе.
+    Исключения парсера (в т.ч. HTTPException) не всегда сериализуются между
+    процессами, поэтому наружу передается только текст ошибки
+    """
+
+
+class PipelineBusyError(Exception):
+    """Очередь на разбор не освободилась за PARSER_QUEUE_TIMEOUT"""
+
+
+def iter_pipeline_records(file_content: ExcelSource, engine: str = "streaming",
+                          sheets: Optional[Sequence[str]] = None,
+                          stats: Optional[PipelineStats] = None,
+                          options: Optional[ReadOptions] = None) -> Iterator[ProductVariant]:
+    """
+    Разбор файла цепочкой генераторов: streaming (построчно) или columnar
+    (pandas по столбцам); варианты товаров (записи records) отдаются по мере готовности.
+    sheets - разобрать только перечисленные листы, stats - время этапов и счетчики,
+    options - выбор листов и столбцов при чтении
+    """
+    timed = stats.timed if stats is not None else _untimed
+    if engine == "columnar":
+        started = time.perf_counter()
+        frames = read_excel_frames(file_content, sheets, options)  # листы → DataFrame
+        read = time.perf_counter()
+        normalized = product_records_columnar(frames)  # разбор цен/названий по столбцам
+        if stats is not None:
+            stats.add_stage("read_excel", read - started)
+            stats.add_stage("parse_rows", time.perf_counter() - read)
+            stats.rows += sum(len(frame) for frame in frames.values())
+            stats.products += len(normalized)
+    else:
+        # Потоково: (лист, строка); без выбора столбцов читаются только название, единица, цена
+        raw_rows = timed(iter_excel_rows(file_content, sheets, options or PRICE_COLUMNS), "read_excel", "rows")
+        normalized = timed(iter_product_records(raw_rows), "parse_rows", "products")  # разбор цен/названий
+    return timed(iter_variant_records(normalized, stats), "business_rules", "variants")  # категории, наценки
+
+
+def _untimed(iterable: Iterable[Any], stage: str, counter: Optional[str] = None) -> Iterable[Any]:
+    return iterable
+
+
+def iter_pipeline(file_content: ExcelSource, engine: str = "streaming",
+                  sheets: Optional[Sequence[str]] = None) -> Iterator[Dict[str, Any]]:
+    """Варианты товаров словарями (формат ответа API)"""
+    return (variant.to_dict() for variant in iter_pipeline_records(file_content, engine, sheets))
+
+
+def run_pipeline(file_content: ExcelSource, engine: str = "streaming",
+                 sheets: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+    """Полный разбор файла в список вариантов товаров"""
+    return list(iter_pipeline(file_content, engine, sheets))
+
+
+def run_pipeline_records(file_content: ExcelSource, engine: str = "streaming",
+                         sheets: Optional[Sequence[str]] = None,
+                         options: Optional[ReadOptions] = None) -> List[ProductVariant]:
+    """
+    Полный разбор файла в список записей: вариантов в памяти (и при передаче
+    из рабочего процесса) меньше, чем словарей; в словари их переводит сериализация ответа
+    """
+    return list(iter_pipeline_records(file_content, engine, sheets, options=options))
+
+
+def _new_stats() -> Optional[PipelineStats]:
+    return PipelineStats() if METRICS_ENABLED else None
+
+
+def _run_pipeline_in_worker(file_content: ExcelSource, engine: str, options: Optional[ReadOptions] = None
+                            ) -> Tuple[List[ProductVariant], Optional[PipelineStats], str]:
+    """Разбор файла; кроме товаров и метрик - версия снимка справочников, на котором он выполнен"""
+    stats = _new_stats()
+    try:
+        snapshot = get_reference_snapshot()
+        with pinned_reference_snapshot(snapshot):
+            products = list(iter_pipeline_records(file_content, engine, stats=stats, options=options))
+    except Exception as e:
+        raise PipelineError(str(e)) from None
+    return products, stats, snapshot.version
+
+
+def _run_sheet_in_worker(file_content: ExcelSource, engine: str, sheet_name: str, reference: ReferenceSource,
+                         options: Optional[ReadOptions] = None) -> Tuple[List[ProductVariant], Dict[str, Any], Optional[PipelineStats]]:
+    """
+    Разбор одного листа на снимке справочников файла: товары, время
+    (чтение, разбор и бизнес-правила вместе) и метрики этапов
+    """
+    started = time.perf_counter()
+    stats = _new_stats()
+    try:
+        with pinned_reference_snapshot(snapshot_from_source(reference)):
+            products = list(iter_pipeline_records(file_content, engine, [sheet_name], stats, options))
+    except Exception as e:
+        raise PipelineError(f"Лист '{sheet_name}': {str(e)}") from None
+    return products, {
+        "sheet": sheet_name,
+        "products_count": len(products),
+        "seconds": round(time.perf_counter() - started, 4),
+    }, stats
+
+
+def _run_batch_file_in_worker(file_content: ExcelSource, engine: str, filename: str, reference: ReferenceSource
+                              ) -> Tuple[Dict[str, Any], Optional[bytes], Optional[PipelineStats]]:
+    """
+    Разбор одного файла пакета на снимке справочников пакета. Ошибка файла
+    не прерывает пакет, а возвращается в описании файла. Варианты товаров
+    сериализуются здесь же (в процесс API передается готовый JSON-массив)
+    """
+    started = time.perf_counter()
+    stats = _new_stats()
+    try:
+        with pinned_reference_snapshot(snapshot_from_source(reference)):
+            products = list(iter_pipeline_records(file_content, engine, stats=stats))
+        body = encode_products(products)
+    except Exception as e:
+        return {
+            "filename": filename,
+            "status": "error",
+            "error_type": "invalid_file" if isinstance(e, ExcelParseError) else "processing_error",
+            "error": f"Ошибка обработки файла: {getattr(e, 'detail', None) or str(e)}",
+            "seconds": round(time.perf_counter() - started, 4),
+        }, None, None
+    return {
+        "filename": filename,
+        "status": "ok",
+        "products_count": len(products),
+        "seconds": round(time.perf_counter() - started, 4),
+    }, body, stats
+
+
+def _run_delta_rows_in_worker(file_content: ExcelSource, reusable: Dict[RowKey, str], reference: ReferenceSource
+                              ) -> Tuple[List[Tuple[RowKey, str, Optional[str]]], str]:
+    """Строки новой версии прайса для сравнения (price_delta.parse_changed_rows) на снимке справочников запроса"""
+    try:
+        snapshot = snapshot_from_source(reference)
+        with pinned_reference_snapshot(snapshot):
+            return parse_changed_rows(file_content, reusable), snapshot.version
+    except Exception as e:
+        raise PipelineError(str(e)) from None
+
+
+def init_worker():
+    """
+    Инициализация рабочего процесса: справочники и индексы загружаются
+    заранее, а не при разборе первого файла
+    """
+    get_reference_snapshot()
+
+
+class PipelineExecutor:
+    """
+    Пул процессов разбора с ограничением числа одновременных задач.
+    Процессы запускаются методом spawn: при fork рабочие процессы унаследовали бы
+    соединения с БД и блокировки потоков основного процесса
+    """
+
+    def __init__(self, workers: int = PARSER_WORKERS, max_concurrency: int = PARSER_MAX_CONCURRENCY,
+                 queue_timeout: float = PARSER_QUEUE_TIMEOUT):
+        self.workers = workers
+        self.max_concurrency = max(max_concurrency, 1)
+        self.queue_timeout = queue_timeout
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop = None
+        self._running = 0
+
+    def start(self):
+        """Запускает пул (повторный вызов ничего не делает)"""
+        if self._executor is not None:
+            return
+        if self.workers > 0:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker,
+            )
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="parser")
+
+    def shutdown(self, wait: bool = True):
+        """Останавливает пул; при wait=False уже начатые задачи дорабатывают в фоне"""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def restart(self):
+        """
+        Новый пул вместо текущего (например, после обновления справочников:
+        новые процессы загрузят свежий снимок). Начатые задачи дорабатывают в старом пуле
+        """
+        old, self._executor = self._executor, None
+        self.start()
+        if old is not None:
+            old.shutdown(wait=False)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Слот на разбор одного файла: ожидание не дольше queue_timeout.
+        Потоковые ответы разбираются в основном процессе, но тоже занимают слот
+        """
+        loop = asyncio.get_running_loop()
+        if self._slots_loop is not loop:
+            # Семафор привязан к циклу событий (актуально для тестов, где циклов несколько)
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._slots_loop = loop
+        slots = self._slots
+        try:
+            with stage_timer("queue_wait"):
+                await asyncio.wait_for(slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise PipelineBusyError(f"Все обработчики заняты (одновременно: {self.max_concurrency})") from None
+
+        self._running += 1
+        try:
+            yield
+        finally:
+            self._running -= 1
+            slots.release()
+
+    async def run(self, file_content: ExcelSource, engine: str = "streaming",
+                  options: Optional[ReadOptions] = None) -> List[ProductVariant]:
+        """
+        Разбор файла в пуле с ожиданием свободного слота не дольше queue_timeout.
+        Лучше передавать путь к файлу: в рабочий процесс уходит только строка
+        """
+        products, _ = await self.run_versioned(file_content, engine, options)
+        return products
+
+    async def run_versioned(self, file_content: ExcelSource, engine: str = "streaming",
+                            options: Optional[ReadOptions] = None) -> Tuple[List[ProductVariant], str]:
+        """
+        То же, что run, плюс версия справочников рабочего процесса: после обновления
+        справочников процессы старого пула еще могут разбирать файлы на прежнем снимке
+        """
+        async with self.slot():
+            self.start()
+            executor = self._executor
+            try:
+                products, stats, reference_version = await asyncio.get_running_loop().run_in_executor(
+                    executor, _run_pipeline_in_worker, file_content, engine, options
+                )
+            except BrokenProcessPool:
+                # Рабочий процесс аварийно завершился (например, нехватка памяти) - пул пересоздается
+                if self._executor is executor:
+                    self.restart()
+                raise PipelineError("Процесс разбора аварийно завершился") from None
+
+        if stats is not None:
+            stats.record()
+        return products, reference_version
+
+    async def run_by_sheet(self, file_content: ExcelSource, engine: str = "streaming",
+                           options: Optional[ReadOptions] = None
+                           ) -> Tuple[List[ProductVariant], List[Dict[str, Any]], str]:
+        """
+        Разбор по листам параллельно: каждый лист (чтение, разбор, бизнес-правила)
+        обрабатывается отдельной задачей пула, результаты склеиваются в порядке листов.
+        Все листы разбираются на одном снимке справочников, даже если он обновится
+        во время разбора. Невыбранные в options листы задачами не становятся.
+        Возвращает товары, время обработки каждого листа и версию справочников
+        """
+        async with self.slot():
+            sheet_names = await asyncio.to_thread(list_sheet_names, file_content)
+            sheet_names = selected_sheet_names(sheet_names, options=options)
+            snapshot = get_reference_snapshot()
+            reference = reference_source(snapshot)
+            self.start()
+            executor = self._executor
+            loop = asyncio.get_running_loop()
+            try:
+                parts = await asyncio.gather(*(
+                    loop.run_in_executor(executor, _run_sheet_in_worker, file_content, engine, sheet_name, reference, options)
+                    for sheet_name in sheet_names
+                ))
+            except BrokenProcessPool:
+                if self._executor is executor:
+                    self.restart()
+                raise PipelineError("Процесс разбора аварийно завершился") from None
+
+        # Время этапов листов суммируется (листы обрабатываются параллельно)
+        stats = _new_stats()
+        for _, _, sheet_stats in parts:
+            if stats is not None and sheet_stats is not None:
+                stats.merge(sheet_stats)
+        if stats is not None:
+            stats.record()
+
+        products = [product for sheet_products, _, _ in parts for product in sheet_products]
+        return products, [timing for _, timing, _ in parts], snapshot.version
+
+    async def run_delta_rows(self, file_content: ExcelSource, reusable: Dict[RowKey, str], reference: ReferenceSource
+                             ) -> Tuple[List[Tuple[RowKey, str, Optional[str]]], str]:
+        """
+        Разбор новых и измененных строк прайса (price_delta) в пуле на снимке reference.
+        Возвращает строки и версию справочников, на которой они разобраны
+        """
+        async with self.slot():
+            self.start()
+            executor = self._executor
+            try:
+                return await asyncio.get_running_loop().run_in_executor(
+                    executor, _run_delta_rows_in_worker, file_content, reusable, reference
+                )
+            except BrokenProcessPool:
+                if self._executor is executor:
+                    self.restart()
+                raise PipelineError("Процесс разбора аварийно завершился") from None
+
+    async def run_batch(self, files: Sequence[Tuple[str, ExcelSource]], reference: ReferenceSource,
+                        engine: str = "streaming") -> List[Tuple[Dict[str, Any], Optional[bytes]]]:
+        """
+        Пакет файлов [(имя, путь)] занимает один слот, файлы разбираются параллельно
+        задачами пула на одном снимке справочников. Результат в порядке files:
+        (описание файла, JSON-массив вариантов или None при ошибке)
+        """
+        async with self.slot():
+            self.start()
+            executor = self._executor
+            loop = asyncio.get_running_loop()
+            parts = await asyncio.gather(*(
+                loop.run_in_executor(executor, _run_batch_file_in_worker, file_content, engine, filename, reference)
+                for filename, file_content in files
+            ), return_exceptions=True)
+
+        results = []
+        stats = _new_stats()
+        broken = False
+        for (filename, _), part in zip(files, parts):
+            if isinstance(part, BaseException):
+                # Аварийное завершение процесса затрагивает только файлы, которые он разбирал
+                broken = broken or isinstance(part, BrokenProcessPool)
+                results.append(({
+                    "filename": filename,
+                    "status": "error",
+                    "error_type": "processing_error",
+                    "error": "Процесс разбора аварийно завершился" if isinstance(part, BrokenProcessPool)
+                             else f"Ошибка обработки файла: {str(part)}",
+                }, None))
+                continue
+            summary, body, file_stats = part
+            if stats is not None and file_stats is not None:
+                stats.merge(file_stats)
+            results.append((summary, body))
+        if broken and self._executor is executor:
+            self.restart()
+        if stats is not None:
+            stats.record()
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Состояние пула для административных эндпоинтов"""
+        return {
+            "workers": self.workers,
+            "mode": "process" if self.workers > 0 else "thread",
+            "max_concurrency": self.max_concurrency,
+            "running": self._running,
+            "started": self._executor is not None,
+        }
+
+
+# Глобальный пул разбора
+pipeline_executor = PipelineExecutor()
+
+
+def get_pipeline_executor() -> PipelineExecutor:
+    """Получение пула разбора"""
+    return pipeline_executor
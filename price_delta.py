@@ -0,0 +1,257 @@
+"""
+Инкрементальная обработка новых версий прайса.
+Строки книги хэшируются по (лист, название, единица, цена) и сохраняются
+в локальной SQLite вместе с полученными вариантами товаров. Для новой версии
+разбираются только новые и измененные строки, остальные берутся из хранилища,
+а в ответ попадают добавленные, удаленные и измененные варианты.
+
+Строка определяется листом, названием и номером повтора этого названия на листе
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from excel_parser import PRICE_COLUMNS, ExcelSource, iter_excel_rows
+from price_parser import iter_parsed_products
+from business_logic import iter_business_rules, get_reference_snapshot, pinned_reference_snapshot
+
+# Файл хранилища версий и сколько последних версий хранить
+PRICE_VERSIONS_DB = os.getenv("PRICE_VERSIONS_DB", "price_versions.sqlite3")
+PRICE_VERSIONS_KEEP = int(os.getenv("PRICE_VERSIONS_KEEP", 50))
+
+RowKey = Tuple[str, str, int]
+
+
+class PriceVersionNotFound(Exception):
+    """В хранилище нет версии прайса с указанным идентификатором"""
+
+
+class PriceRow:
+    """Строка прайса: ключ, хэш содержимого и исходные значения ячеек"""
+
+    __slots__ = ("key", "row_hash", "sheet", "row")
+
+    def __init__(self, key: RowKey, row_hash: str, sheet: str, row: List[Any]):
+        self.key = key
+        self.row_hash = row_hash
+        self.sheet = sheet
+        self.row = row
+
+
+def iter_price_rows(file_content: ExcelSource) -> Iterator[PriceRow]:
+    """
+    Строки, из которых парсер может получить товары (есть название и цена),
+    с ключом и хэшем. Значения нормализуются так же, как в iter_parsed_products
+    """
+    occurrences: Dict[Tuple[str, str], int] = {}
+    for sheet_name, row in iter_excel_rows(file_content, options=PRICE_COLUMNS):
+        if len(row) < 3:
+            continue
+        name = str(row[0]).strip() if row[0] else ""
+        if not name:
+            continue
+        unit = str(row[1]).strip() if row[1] else ""
+        price = str(row[2]).strip() if row[2] else ""
+
+        occurrence = occurrences.get((sheet_name, name), 0)
+        occurrences[(sheet_name, name)] = occurrence + 1
+        row_hash = hashlib.sha1("\x1f".join((sheet_name, name, unit, price)).encode("utf-8")).hexdigest()
+        yield PriceRow((sheet_name, name, occurrence), row_hash, sheet_name, row)
+
+
+def process_row(price_row: PriceRow) -> List[Dict[str, Any]]:
+    """Полная обработка одной строки: разбор и бизнес-правила"""
+    return list(iter_business_rules(iter_parsed_products([(price_row.sheet, price_row.row)])))
+
+
+class PriceVersionStore:
+    """
+    Хранилище версий прайсов в SQLite: для каждой строки версии -
+    хэш и варианты товаров (JSON)
+    """
+
+    def __init__(self, path: str = PRICE_VERSIONS_DB, keep: int = PRICE_VERSIONS_KEEP):
+        self.path = path
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS price_versions (
+                id TEXT PRIMARY KEY,
+                filename TEXT,
+                reference_version TEXT,
+                created_at REAL,
+                rows_count INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS price_rows (
+                version_id TEXT NOT NULL,
+                sheet TEXT NOT NULL,
+                name TEXT NOT NULL,
+                occurrence INTEGER NOT NULL,
+                row_hash TEXT NOT NULL,
+                variants TEXT NOT NULL,
+                PRIMARY KEY (version_id, sheet, name, occurrence)
+            );
+        """)
+
+    def get_version(self, version_id: str) -> Optional[Dict[str, Any]]:
+        """Описание версии или None"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT id, filename, reference_version, created_at, rows_count FROM price_versions WHERE id = ?",
+                (version_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("version_id", "filename", "reference_version", "created_at", "rows_count"), row))
+
+    def load_rows(self, version_id: str) -> Dict[RowKey, Tuple[str, str]]:
+        """Строки версии: ключ → (хэш, варианты в JSON)"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT sheet, name, occurrence, row_hash, variants FROM price_rows WHERE version_id = ?",
+                (version_id,)
+            ).fetchall()
+        return {(sheet, name, occurrence): (row_hash, variants) for sheet, name, occurrence, row_hash, variants in rows}
+
+    def save_version(self, filename: str, reference_version: str,
+                     rows: List[Tuple[RowKey, str, str]]) -> str:
+        """Сохраняет версию одной транзакцией и удаляет версии сверх лимита; возвращает id"""
+        version_id = uuid.uuid4().hex
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO price_versions (id, filename, reference_version, created_at, rows_count) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (version_id, filename, reference_version, time.time(), len(rows))
+            )
+            self._connection.executemany(
+                "INSERT INTO price_rows (version_id, sheet, name, occurrence, row_hash, variants) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                ((version_id, key[0], key[1], key[2], row_hash, variants) for key, row_hash, variants in rows)
+            )
+            stale = [row[0] for row in self._connection.execute(
+                "SELECT id FROM price_versions ORDER BY created_at DESC LIMIT -1 OFFSET ?", (self.keep,)
+            )]
+            for stale_id in stale:
+                self._connection.execute("DELETE FROM price_rows WHERE version_id = ?", (stale_id,))
+                self._connection.execute("DELETE FROM price_versions WHERE id = ?", (stale_id,))
+        return version_id
+
+    def close(self):
+        self._connection.close()
+
+
+def load_previous_rows(store: "PriceVersionStore", previous_version_id: Optional[str], reference_version: str
+                       ) -> Tuple[Dict[RowKey, Tuple[str, str]], Dict[RowKey, str]]:
+    """
+    Строки сохраненной версии (ключ → (хэш, варианты в JSON)) и хэши строк,
+    варианты которых можно взять без разбора: только если версия разобрана
+    на тех же справочниках reference_version
+    """
+    if previous_version_id is None:
+        return {}, {}
+    previous = store.get_version(previous_version_id)
+    if previous is None:
+        raise PriceVersionNotFound(f"Версия прайса не найдена: {previous_version_id}")
+    previous_rows = store.load_rows(previous_version_id)
+    if previous["reference_version"] != reference_version:
+        return previous_rows, {}
+    return previous_rows, {key: row_hash for key, (row_hash, _) in previous_rows.items()}
+
+
+def parse_changed_rows(file_content: ExcelSource, reusable: Dict[RowKey, str]
+                       ) -> List[Tuple[RowKey, str, Optional[str]]]:
+    """
+    Строки новой версии: (ключ, хэш, варианты в JSON). Строки, хэш которых
+    совпал с reusable, не разбираются - вместо вариантов None
+    """
+    rows = []
+    for price_row in iter_price_rows(file_content):
+        if reusable.get(price_row.key) == price_row.row_hash:
+            rows.append((price_row.key, price_row.row_hash, None))
+        else:
+            rows.append((price_row.key, price_row.row_hash, json.dumps(process_row(price_row), ensure_ascii=False)))
+    return rows
+
+
+def build_delta(filename: str, previous_version_id: Optional[str], previous_rows: Dict[RowKey, Tuple[str, str]],
+                rows: List[Tuple[RowKey, str, Optional[str]]], reference_version: str,
+                store: "PriceVersionStore") -> Dict[str, Any]:
+    """
+    Добавленные, удаленные и измененные варианты по строкам parse_changed_rows;
+    новая версия сохраняется с версией справочников, на которой разобраны строки
+    """
+    previous_rows = dict(previous_rows)
+    added: List[Dict[str, Any]] = []
+    changed: List[Dict[str, Any]] = []
+    saved_rows: List[Tuple[RowKey, str, str]] = []
+    reprocessed = 0
+
+    for key, row_hash, encoded in rows:
+        old = previous_rows.pop(key, None)
+        if encoded is None:
+            saved_rows.append((key, row_hash, old[1]))
+            continue
+
+        reprocessed += 1
+        saved_rows.append((key, row_hash, encoded))
+        if old is None:
+            added.extend(json.loads(encoded))
+        elif encoded != old[1]:
+            changed.append({
+                "sheet": key[0],
+                "name": key[1],
+                "before": json.loads(old[1]),
+                "after": json.loads(encoded),
+            })
+
+    # Оставшиеся строки предыдущей версии в новой не встретились
+    removed = [variant for _, variants in previous_rows.values() for variant in json.loads(variants)]
+
+    version_id = store.save_version(filename, reference_version, saved_rows)
+    return {
+        "filename": filename,
+        "version_id": version_id,
+        "previous_version_id": previous_version_id,
+        "rows_count": len(saved_rows),
+        "rows_reprocessed": reprocessed,
+        "added": added,
+        "removed": removed,
+        "changed": changed,
+    }
+
+
+def compute_delta(file_content: ExcelSource, filename: str, previous_version_id: Optional[str],
+                  store: "PriceVersionStore") -> Dict[str, Any]:
+    """
+    Сравнивает новую версию прайса с сохраненной previous_version_id в текущем потоке.
+    Без предыдущей версии все варианты считаются добавленными.
+    Строки с тем же хэшем берутся из хранилища, если с тех пор не менялись справочники
+    (эндпоинт разбирает строки в пуле: PipelineExecutor.run_delta_rows)
+    """
+    snapshot = get_reference_snapshot()
+    previous_rows, reusable = load_previous_rows(store, previous_version_id, snapshot.version)
+    with pinned_reference_snapshot(snapshot):
+        rows = parse_changed_rows(file_content, reusable)
+    return build_delta(filename, previous_version_id, previous_rows, rows, snapshot.version, store)
+
+
+_store: Optional[PriceVersionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_version_store() -> PriceVersionStore:
+    """Хранилище версий (открывается при первом обращении)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PriceVersionStore()
+    return _store
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Генератор синтетических прайсов для бенчмарков.
+Книга похожа на прайсы поставщиков: региональные листы с одним и тем же
+каталогом (названия и цены повторяются от листа к листу), заголовки разделов
+без цен, составные названия вида "Квинта+GL(1210,1150)/ Трамонтана S МП(1195,1155)",
+цены "399оп//439гл/421мп", "362sf", "-" и смесь профнастила с обычными товарами.
+Результат детерминирован: одинаковые параметры дают одинаковое содержимое
+листов (байты файла отличаются только временем сохранения в свойствах книги).
+
+Использование:
+    python price_list_generator.py <файл.xlsx> [листов] [строк на листе] [seed]
+"""
+
+import io
+import random
+import sys
+from typing import Any, Dict, List
+
+from openpyxl import Workbook
+
+REGIONS = ["Нижний Новгород", "Санкт-Петербург", "Киров", "Пенза", "Дружный", "Казань", "Самара", "Владимир"]
+
+# Обычные товары (металлочерепица) и профнастил: название и размеры (полная, полезная ширина)
+STANDARD_PRODUCTS = [
+    ("Кредо GL", (1190, 1125)), ("Классик GL", (1190, 1100)), ("Камея GL", (1190, 1100)),
+    ("Квинта+GL", (1210, 1150)), ("Модерн GL", (1190, 1100)), ("Квадро Профи GL", (1190, 1100)),
+    ("Ламонтерра МП", (1190, 1100)), ("Ламонтерра Х МП", (1190, 1100)), ("Монтекристо S", (1190, 1100)),
+    ("Монтерроса S МП", (1190, 1100)), ("Трамонтана S МП", (1195, 1155)),
+    ("Профиль мет. тип \"Монтеррей\"", (1180, 1100)),
+]
+PROFNASTIL_PRODUCTS = [
+    ("Профнастил С-8", (1200, 1150)), ("Профнастил C10 фигурный", (1180, 1100)), ("Профнастил МП-10", (1180, 1100)),
+    ("Профнастил GL-10", (1180, 1150)), ("C10", (1154, 1100)), ("Профнастил С-20", (1150, 1100)),
+    ("Профнастил С-21", (1051, 1000)), ("С-44", (1047, 1000)), ("Профнастил НС-35", (1060, 1000)),
+    ("Плоский лист", (1250, 1250)),
+]
+# Товары без категории (доборные элементы, крепеж)
+OTHER_PRODUCTS = ["Планка конька", "Саморез кровельный 4,8х35", "Планка карнизная", "Уплотнитель универсальный"]
+
+UNITS = ["м2", "м2", "м2", "шт", "м.п."]
+SECTION_TITLES = ["Металлочерепица", "Профнастил", "Доборные элементы", "Крепеж"]
+HEADER = ["Наименование", "Ед. изм.", "Цена, руб."]
+
+
+def product_name(rng: random.Random, catalog) -> str:
+    """Название с размерами или без; иногда составное из двух товаров"""
+    name, (full, useful) = rng.choice(catalog)
+    single = f"{name}({full},{useful})" if rng.random() < 0.6 else name
+    kind = rng.random()
+    if kind < 0.08:
+        other, (full2, useful2) = rng.choice(catalog)
+        return f"{single}/ {other}({full2},{useful2})"
+    if kind < 0.12:
+        other, (full2, useful2) = rng.choice(catalog)
+        return f"{single},{other}({full2},{useful2})"
+    return single
+
+
+def profnastil_price(rng: random.Random, base: int) -> str:
+    """Цена профнастила: одна или несколько цен с брендами (sf, оп, гл, мп, двс)"""
+    kind = rng.random()
+    if kind < 0.35:
+        return f"{base}sf" if rng.random() < 0.8 else f"{base} sf"
+    if kind < 0.7:
+        return f"{base}оп//{base + 40}гл/{base + 22}мп"
+    if kind < 0.9:
+        return f"{base + 50}гл/{base + 80}мп"
+    return f"{base + 150}двс"
+
+
+def standard_price(rng: random.Random, base: int) -> str:
+    """Цена обычного товара: простая или с брендами покрытия"""
+    kind = rng.random()
+    if kind < 0.6:
+        return str(base)
+    if kind < 0.9:
+        return f"{base}гл/{base + 37}мп"
+    return f"{base} руб."
+
+
+def build_catalog(rng: random.Random, size: int, profnastil_share: float) -> List[List[Any]]:
+    """Строки каталога, общего для всех листов; цена '-' - нет в наличии"""
+    catalog = []
+    for _ in range(size):
+        kind = rng.random()
+        if kind < profnastil_share:
+            name = product_name(rng, PROFNASTIL_PRODUCTS)
+            price = profnastil_price(rng, rng.randrange(340, 560))
+        elif kind < 0.95:
+            name = product_name(rng, STANDARD_PRODUCTS)
+            price = standard_price(rng, rng.randrange(380, 900))
+        else:
+            name = rng.choice(OTHER_PRODUCTS)
+            price = str(rng.randrange(50, 400))
+        if rng.random() < 0.03:
+            price = "-"
+        catalog.append([name, rng.choice(UNITS), price])
+    return catalog
+
+
+def generate_price_list(sheets: int = 5, rows: int = 2000, seed: int = 0,
+                        profnastil_share: float = 0.35) -> Dict[str, List[List[Any]]]:
+    """
+    Прайс {лист: [строки]} из sheets региональных листов по rows строк.
+    Около 70% строк листа берутся из общего каталога (повторяются на других листах)
+    """
+    rng = random.Random(seed)
+    catalog = build_catalog(rng, max(rows // 2, 1), profnastil_share)
+
+    price_list = {}
+    for index in range(sheets):
+        region = REGIONS[index % len(REGIONS)]
+        sheet_name = region if index < len(REGIONS) else f"{region} {index // len(REGIONS) + 1}"
+        data = [HEADER]
+        while len(data) < rows:
+            kind = rng.random()
+            if kind < 0.02:
+                data.append([rng.choice(SECTION_TITLES), "", ""])
+            elif kind < 0.72:
+                data.append(list(rng.choice(catalog)))
+            else:
+                data.extend(build_catalog(rng, 1, profnastil_share))
+        price_list[sheet_name] = data[:rows]
+    return price_list
+
+
+def build_workbook(price_list: Dict[str, List[List[Any]]]) -> bytes:
+    """Книга .xlsx из прайса {лист: [строки]}"""
+    workbook = Workbook(write_only=True)
+    for sheet_name, rows in price_list.items():
+        sheet = workbook.create_sheet(sheet_name)
+        for row in rows:
+            sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def generate_workbook(sheets: int = 5, rows: int = 2000, seed: int = 0, profnastil_share: float = 0.35) -> bytes:
+    """Синтетическая книга .xlsx (см. generate_price_list)"""
+    return build_workbook(generate_price_list(sheets, rows, seed, profnastil_share))
+
+
+def main(argv: List[str]) -> bool:
+    if not 1 <= len(argv) <= 4 or not all(value.isdigit() for value in argv[1:]):
+        print(__doc__)
+        return False
+
+    sheets, rows, seed = ([int(value) for value in argv[1:]] + [5, 2000, 0][len(argv) - 1:])[:3]
+    content = generate_workbook(sheets, rows, seed)
+    with open(argv[0], "wb") as f:
+        f.write(content)
+    print(f"Записан прайс {argv[0]}: листов {sheets}, строк {sheets * rows}, {len(content) / 1024:.0f} КБ")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main(sys.argv[1:]) else 1)
@@ -1,32 +1,35 @@
-import re
-from typing import List, Dict, Any
+from sys import intern
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple, Union
 from name_parser import parse_names, extract_individual_products
 from business_logic import parse_profnastil_price, is_profnastil_product
+from price_tokenizer import PriceCell, tokenize_price_cell
+from records import ParsedProduct
 
 def parse_prices(price_str: str) -> List[Dict[str, Any]]:
     """
     Разбирает строку вида '738гл/775мп' → [{'price': 738, 'brand': 'гл'}, {'price': 775, 'brand': 'мп'}]
     """
-    prices = []
-    for part in re.split(r"[\/]+", price_str):
-        part = part.strip()
-        if not part or part == "-":
-            continue
-        match = re.match(r"(\d+)([а-яa-z]*)", part, re.IGNORECASE)
-        if match:
-            prices.append({
-                "price": int(match.group(1)),
-                "brand": match.group(2).lower() if match.group(2) else None
-            })
-    return prices
+    return prices_from_cell(tokenize_price_cell(price_str))
 
 
-def match_names_and_prices(name_str: str, price_str: str) -> List[Dict[str, Any]]:
+def prices_from_cell(price_cell: PriceCell) -> List[Dict[str, Any]]:
+    """
+    Цены и бренды из токенов ячейки; бренд учитывается, только если он
+    записан слитно с числом ('738гл'), как в прежнем разборе
+    """
+    return [
+        {"price": token.price, "brand": None if token.spaced else token.brand}
+        for token in price_cell.tokens
+    ]
+
+
+def match_names_and_prices(name_str: str, price_str: str,
+                           price_cell: Optional[PriceCell] = None) -> List[Dict[str, Any]]:
     """
     Связывает названия и цены из одной строки Excel
     """
     names = parse_names(name_str)
-    prices = parse_prices(price_str)
+    prices = prices_from_cell(price_cell) if price_cell is not None else parse_prices(price_str)
     
     results = []
     for i, price_data in enumerate(prices):
@@ -38,76 +41,82 @@ def match_names_and_prices(name_str: str, price_str: str) -> List[Dict[str, Any]
         })
     return results
 
-def parse_excel_rows(excel_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+# Строки Excel: словарь {лист: [строки]} из parse_excel_file
+# или поток пар (лист, строка) из iter_excel_rows
+ExcelRows = Union[Dict[str, Any], Iterable[Tuple[str, List[Any]]]]
+
+def iter_sheet_rows(excel_data: ExcelRows) -> Iterator[Tuple[str, List[Any]]]:
+    """
+    Приводит данные Excel к потоку пар (лист, строка)
+    """
+    if isinstance(excel_data, dict):
+        for sheet_name, sheet_data in excel_data.items():
+            if not sheet_data:
+                continue
+            for row in sheet_data:
+                yield sheet_name, row
+    else:
+        yield from excel_data
+
+def parse_excel_rows(excel_data: ExcelRows) -> List[Dict[str, Any]]:
     """
     Обрабатывает все строки из Excel и возвращает нормализованный список товаров
     """
-    products = []
-    
-    for sheet_name, sheet_data in excel_data.items():
-        if not sheet_data:
+    return list(iter_parsed_products(excel_data))
+
+def iter_parsed_products(excel_data: ExcelRows) -> Iterator[Dict[str, Any]]:
+    """
+    Потоковый вариант parse_excel_rows: разбирает строки по одной и отдает
+    товары сразу, не накапливая их в памяти
+    """
+    for product in iter_product_records(excel_data):
+        yield product.to_dict()
+
+def iter_product_records(excel_data: ExcelRows) -> Iterator[ParsedProduct]:
+    """
+    Разбор строк в записи ParsedProduct. Повторяющиеся строки (название,
+    единица) интернируются: все товары ссылаются на один объект строки
+    """
+    for sheet_name, row in iter_sheet_rows(excel_data):
+        if len(row) < 3:
             continue
             
-        for row in sheet_data:
-            if len(row) < 3:
-                continue
-                
-            name = str(row[0]).strip() if row[0] else ""
-            unit = str(row[1]).strip() if row[1] else ""
-            price = str(row[2]).strip() if row[2] else ""
+        name = intern(str(row[0]).strip()) if row[0] else ""
+        unit = intern(str(row[1]).strip()) if row[1] else ""
+        price = str(row[2]).strip() if row[2] else ""
+        
+        if not name or not price or price == "-":
+            continue
+
+        # Один проход токенизатора дает и признаки строки, и сами цены
+        price_cell = tokenize_price_cell(price)
+        if not price_cell.has_digit:
+            continue
             
-            if not name or not price or price == "-" or not re.search(r'\d', price):
-                continue
+        # Проверяем, есть ли в цене суффиксы брендов (гл, мп, sf, оп)
+        if price_cell.has_brand_suffix:
+            # Проверяем, является ли товар профнастилом
+            if is_profnastil_product(name):
+                # Специальная обработка профнастила с толщиной и покрытием
+                profnastil_prices = parse_profnastil_price(price)
+                names = extract_individual_products(name)
                 
-            # Проверяем, есть ли в цене суффиксы брендов (гл, мп, sf, оп)
-            if re.search(r'\d+(гл|мп|sf|оп|двс)', price):
-                # Проверяем, является ли товар профнастилом
-                if is_profnastil_product(name):
-                    # Специальная обработка профнастила с толщиной и покрытием
-                    profnastil_prices = parse_profnastil_price(price)
-                    names = extract_individual_products(name)
-                    
-                    for i, price_data in enumerate(profnastil_prices):
-                        parsed_name = names[i] if i < len(names) else names[0] if names else name
-                        products.append({
-                            "original_name": name,
-                            "parsed_name": parsed_name,
-                            "unit": unit,
-                            "price": price_data["price"],
-                            "brand": price_data["brand"],
-                            "thickness": price_data["thickness"],
-                            "coating": price_data["coating"],
-                            "sheet": sheet_name
-                        })
-                else:
-                    # Обычная обработка с брендами
-                    parsed_products = match_names_and_prices(name, price)
-                    
-                    for product in parsed_products:
-                        products.append({
-                            "original_name": name,
-                            "parsed_name": product["name"],
-                            "unit": unit,
-                            "price": product["price"],
-                            "brand": product["brand"],
-                            "sheet": sheet_name
-                        })
+                for i, price_data in enumerate(profnastil_prices):
+                    parsed_name = names[i] if i < len(names) else names[0] if names else name
+                    yield ParsedProduct(name, parsed_name, unit, price_data["price"], price_data["brand"],
+                                        sheet_name, price_data["thickness"], price_data["coating"])
             else:
-                # Простая цена - берем первое число
-                price_match = re.search(r'(\d+)', price)
-                if price_match:
-                    price_value = int(price_match.group(1))
-                    
-                    # Разделяем составные названия
-                    names = extract_individual_products(name)
-                    for parsed_name in names:
-                        products.append({
-                            "original_name": name,
-                            "parsed_name": parsed_name,
-                            "unit": unit,
-                            "price": price_value,
-                            "brand": None,
-                            "sheet": sheet_name
-                        })
-    
-    return products
+                # Обычная обработка с брендами
+                parsed_products = match_names_and_prices(name, price, price_cell)
+                
+                for product in parsed_products:
+                    yield ParsedProduct(name, intern(product["name"]), unit, product["price"], product["brand"], sheet_name)
+        else:
+            # Простая цена - берем первое число
+            if price_cell.first_number is not None:
+                price_value = price_cell.first_number
+                
+                # Разделяем составные названия
+                names = extract_individual_products(name)
+                for parsed_name in names:
+                    yield ParsedProduct(name, parsed_name, unit, price_value, None, sheet_name)
@@ -0,0 +1,74 @@
+"""
+Токенизатор ячеек с ценами вида '399оп//439гл/421мп'.
+Один проход скомпилированного выражения по строке дает типизированные
+токены (цена, суффикс бренда, разделитель) и признаки для классификации
+строки в parse_excel_rows
+"""
+
+import re
+from typing import NamedTuple, Optional, Tuple
+
+from parse_memo import memoize
+
+# Виды разделителей перед ценой
+SEP_NONE = ""
+SEP_SINGLE = "/"
+SEP_DOUBLE = "//"
+
+# Суффиксы брендов, по которым строка считается ценой с брендами
+BRAND_SUFFIXES = ("гл", "мп", "sf", "оп", "двс")
+
+# Лексемы: разделитель | число [пробелы] [буквы] | пробелы | прочий текст.
+# Регистр игнорируется только для букв бренда, как в прежних re.match(..., re.IGNORECASE)
+_LEXER = re.compile(r'(/+)|(\d+)(\s*)((?i:[а-яa-z]*))|(\s+)|([^/\d\s]+)')
+
+
+class PriceToken(NamedTuple):
+    price: int
+    brand: Optional[str]  # буквы после числа в нижнем регистре
+    spaced: bool          # между числом и буквами был пробел ('362 sf')
+    separator: str        # разделитель перед частью: SEP_NONE, SEP_SINGLE, SEP_DOUBLE
+
+
+class PriceCell(NamedTuple):
+    tokens: Tuple[PriceToken, ...]  # по одному на каждую часть, начинающуюся с числа
+    first_number: Optional[int]     # первое число в строке (простая цена)
+    has_digit: bool
+    has_brand_suffix: bool          # есть число со слитным суффиксом из BRAND_SUFFIXES
+
+
+# Конструктор NamedTuple заметно дороже самого разбора: создаем кортежи напрямую
+_new_tuple = tuple.__new__
+
+
+@memoize("tokenize_price_cell")
+def tokenize_price_cell(price_str: str) -> PriceCell:
+    """
+    Разбирает ячейку цены за один проход.
+    Части между '/' обрабатываются как в прежнем коде: пробелы по краям
+    отбрасываются, часть дает токен, только если начинается с числа
+    """
+    tokens = []
+    first_number = None
+    has_brand_suffix = False
+    separator = SEP_NONE
+    # Ожидаем начало части: до первой значимой лексемы
+    at_part_start = True
+
+    for sep, number, space, word, blank, other in _LEXER.findall(price_str):
+        if sep:
+            separator = SEP_SINGLE if len(sep) == 1 else SEP_DOUBLE
+            at_part_start = True
+        elif number:
+            value = int(number)
+            if first_number is None:
+                first_number = value
+            if not space and word.startswith(BRAND_SUFFIXES):
+                has_brand_suffix = True
+            if at_part_start:
+                tokens.append(_new_tuple(PriceToken, (value, word.lower() or None, bool(space), separator)))
+                at_part_start = False
+        elif other:
+            at_part_start = False
+
+    return _new_tuple(PriceCell, (tuple(tokens), first_number, first_number is not None, has_brand_suffix))
@@ -0,0 +1,222 @@
+"""
+Профилирование разбора отдельного файла по запросу администратора
+(POST /parse-excel/?profile=1 с заголовком X-Admin-Token).
+Конвейер выполняется в потоке процесса API под cProfile и tracemalloc;
+в отчете - функции модулей разбора с наибольшим накопленным временем,
+пик памяти и места наибольших выделений. Отчет (JSON) и дамп pstats
+сохраняются в PROFILE_DIR для последующей загрузки.
+
+tracemalloc замедляет код в несколько раз, поэтому абсолютное время
+в профиле больше обычного; соотношение между функциями сохраняется
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from excel_parser import ExcelSource, ReadOptions
+from pipeline import run_pipeline_records
+from records import ProductVariant
+
+# Каталог отчетов, число хранимых отчетов и строк в топах
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 50))
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", 30))
+# Модули, функции которых попадают в отчет
+PROFILE_MODULES = tuple(
+    name.strip() for name in
+    os.getenv("PROFILE_MODULES", "excel_parser,price_parser,name_parser,business_logic,columnar_parser").split(",")
+    if name.strip()
+)
+# Профиль памяти (tracemalloc); без него время в профиле ближе к обычному
+PROFILE_MEMORY = os.getenv("PROFILE_MEMORY", "true").lower() == "true"
+
+REPORT_SUFFIX = ".json"
+PSTATS_SUFFIX = ".prof"
+
+MB = 1024 * 1024
+
+
+class ProfilerBusyError(Exception):
+    """Уже выполняется другой профилируемый разбор (tracemalloc общий для процесса)"""
+    pass
+
+
+_profile_lock = threading.Lock()
+
+
+def function_stats(stats: pstats.Stats, modules: Tuple[str, ...] = PROFILE_MODULES,
+                   top: int = PROFILE_TOP) -> List[Dict[str, Any]]:
+    """Функции модулей modules по убыванию накопленного времени"""
+    functions = []
+    for (filename, line, name), (_, calls, total, cumulative, _) in stats.stats.items():
+        module = os.path.splitext(os.path.basename(filename))[0]
+        if module not in modules:
+            continue
+        functions.append({
+            "function": f"{module}.{name}",
+            "line": line,
+            "calls": calls,
+            "total_seconds": round(total, 6),
+            "cumulative_seconds": round(cumulative, 6),
+        })
+    functions.sort(key=lambda item: item["cumulative_seconds"], reverse=True)
+    return functions[:top]
+
+
+def allocation_stats(snapshot: tracemalloc.Snapshot, top: int = PROFILE_TOP) -> List[Dict[str, Any]]:
+    """Места выделения памяти, живые в конце разбора, по убыванию объема"""
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ])
+    return [
+        {
+            "site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            "size_kb": round(stat.size / 1024, 1),
+            "count": stat.count,
+        }
+        for stat in snapshot.statistics("lineno")[:top]
+    ]
+
+
+def profile_pipeline(file_content: ExcelSource, engine: str = "streaming",
+                     memory: bool = PROFILE_MEMORY, options: Optional[ReadOptions] = None
+                     ) -> Tuple[List[ProductVariant], Dict[str, Any], pstats.Stats]:
+    """
+    Разбор файла под профилировщиком в текущем потоке (options - выбор листов и столбцов).
+    Возвращает варианты товаров, отчет и статистику pstats
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusyError("Уже выполняется профилирование другого файла")
+    try:
+        profiler = cProfile.Profile()
+        if memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            profiler.enable()
+            try:
+                products = run_pipeline_records(file_content, engine, options=options)
+            finally:
+                profiler.disable()
+            seconds = time.perf_counter() - started
+            memory_report = None
+            if memory:
+                _, peak = tracemalloc.get_traced_memory()
+                memory_report = {
+                    "peak_mb": round(peak / MB, 2),
+                    "top_allocations": allocation_stats(tracemalloc.take_snapshot()),
+                }
+        finally:
+            if memory:
+                tracemalloc.stop()
+    finally:
+        _profile_lock.release()
+
+    stats = pstats.Stats(profiler)
+    report = {
+        "engine": engine,
+        "seconds": round(seconds, 4),
+        "products_count": len(products),
+        "modules": list(PROFILE_MODULES),
+        "functions": function_stats(stats),
+        "memory": memory_report,
+    }
+    return products, report, stats
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Отчет в текстовом виде (для логов и консоли)"""
+    out = io.StringIO()
+    out.write(f"Профиль {report.get('profile_id', '')} {report.get('filename', '')}: "
+              f"{report['seconds']} с, вариантов {report['products_count']}\n")
+    out.write(f"{'накоп., с':>10} {'собств., с':>10} {'вызовов':>9}  функция\n")
+    for item in report["functions"]:
+        out.write(f"{item['cumulative_seconds']:10.4f} {item['total_seconds']:10.4f} {item['calls']:9}  "
+                  f"{item['function']}:{item['line']}\n")
+    if report.get("memory"):
+        out.write(f"\nПик памяти: {report['memory']['peak_mb']} МБ\n")
+        for item in report["memory"]["top_allocations"]:
+            out.write(f"{item['size_kb']:10.1f} КБ {item['count']:8}  {item['site']}\n")
+    return out.getvalue()
+
+
+class ProfileStore:
+    """
+    Отчеты профилирования в каталоге: <id>.json и <id>.prof (pstats, для snakeviz и т.п.);
+    хранятся последние keep отчетов
+    """
+
+    def __init__(self, directory: str = PROFILE_DIR, keep: int = PROFILE_KEEP):
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def save(self, report: Dict[str, Any], stats: pstats.Stats) -> str:
+        """Сохраняет отчет, возвращает его идентификатор"""
+        profile_id = datetime.now().strftime("%Y%m%d-%H%M%S%f-") + uuid.uuid4().hex[:6]
+        report["profile_id"] = profile_id
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            stats.dump_stats(self.pstats_path(profile_id))
+            with open(self.report_path(profile_id), "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self._prune()
+        return profile_id
+
+    def load(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        path = self.report_path(profile_id)
+        if not os.path.isfile(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Краткие сведения об отчетах, новые первыми"""
+        profiles = []
+        for profile_id in reversed(self._ids()):
+            report = self.load(profile_id)
+            if report is not None:
+                profiles.append({field: report.get(field) for field in
+                                 ("profile_id", "filename", "engine", "seconds", "products_count")})
+        return profiles
+
+    def report_path(self, profile_id: str) -> str:
+        return os.path.join(self.directory, os.path.basename(profile_id) + REPORT_SUFFIX)
+
+    def pstats_path(self, profile_id: str) -> str:
+        return os.path.join(self.directory, os.path.basename(profile_id) + PSTATS_SUFFIX)
+
+    def _ids(self) -> List[str]:
+        """Идентификаторы по возрастанию времени (идентификатор начинается с даты)"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-len(REPORT_SUFFIX)] for name in os.listdir(self.directory)
+                      if name.endswith(REPORT_SUFFIX))
+
+    def _prune(self):
+        ids = self._ids()
+        for profile_id in ids[:max(len(ids) - self.keep, 0)]:
+            for path in (self.report_path(profile_id), self.pstats_path(profile_id)):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    print(f"Ошибка удаления отчета профилирования {path}: {e}")
+
+
+# Глобальное хранилище отчетов
+profile_store = ProfileStore()
+
+
+def get_profile_store() -> ProfileStore:
+    """Получение хранилища отчетов профилирования"""
+    return profile_store
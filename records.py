@@ -0,0 +1,165 @@
+"""
+Компактные записи конвейера разбора.
+Товар после разбора строки и варианты товара после бизнес-правил хранятся
+кортежами (NamedTuple, без __dict__), а не словарями: вариант не копирует поля
+товара, категории и наценки, а ссылается на общие объекты (товар строки,
+запись справочника категорий, правило наценки). Словари с прежним набором
+и порядком ключей строятся только на границе API (to_dict, record_to_dict)
+"""
+
+from typing import Any, Dict, NamedTuple, Optional, Union
+
+# Поля подсказки нечеткого поиска, которые добавляются к вариантам товара
+SUGGESTION_FIELDS = ("suggested_category_id", "suggested_category_name", "match_score")
+
+
+class ParsedProduct(NamedTuple):
+    """Товар из строки прайса (формат parse_excel_rows)"""
+    original_name: str
+    parsed_name: str
+    unit: str
+    price: int
+    brand: Optional[str]
+    sheet: Optional[str]
+    # Заполнены только у профнастила с толщиной и покрытием из цены
+    thickness: Optional[str] = None
+    coating: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        if self.thickness is None:
+            return {
+                "original_name": self.original_name,
+                "parsed_name": self.parsed_name,
+                "unit": self.unit,
+                "price": self.price,
+                "brand": self.brand,
+                "sheet": self.sheet
+            }
+        return {
+            "original_name": self.original_name,
+            "parsed_name": self.parsed_name,
+            "unit": self.unit,
+            "price": self.price,
+            "brand": self.brand,
+            "thickness": self.thickness,
+            "coating": self.coating,
+            "sheet": self.sheet
+        }
+
+    @classmethod
+    def from_dict(cls, product: Dict[str, Any]) -> "ParsedProduct":
+        """Запись из словаря товара (совместимость с прежним API)"""
+        has_thickness = "thickness" in product and "coating" in product
+        return cls(
+            product["original_name"], product["parsed_name"], product.get("unit", ""),
+            product["price"], product.get("brand"), product.get("sheet"),
+            product["thickness"] if has_thickness else None,
+            product["coating"] if has_thickness else product.get("coating"),
+        )
+
+
+class StandardVariant(NamedTuple):
+    """Вариант обычного товара: товар + категория + правило наценки"""
+    product: ParsedProduct
+    mapping: Dict[str, Any]
+    markup: Dict[str, Any]
+    final_price: Union[int, float]
+
+    def to_dict(self) -> Dict[str, Any]:
+        product, mapping, markup = self.product, self.mapping, self.markup
+        variant = {
+            "original_name": product.original_name,
+            "parsed_name": product.parsed_name,
+            "category_id": mapping["category_id"],
+            "unit": mapping["unit"],
+            "base_price": product.price,
+            "final_price": self.final_price,
+            "markup": markup["markup"],
+            "color": markup["color"],
+            "coating": markup["coating"],
+            "region": markup["region"],
+            "brand": product.brand,
+            "sheet": product.sheet,
+            "product_type": "standard"
+        }
+        add_suggestion_fields(variant, mapping)
+        return variant
+
+
+class ProfnastilVariant(NamedTuple):
+    """Вариант профнастила: товар + категория, толщина и покрытие"""
+    product: ParsedProduct
+    mapping: Dict[str, Any]
+    thickness: str
+    coating: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        product, mapping = self.product, self.mapping
+        variant = {
+            "original_name": product.original_name,
+            "parsed_name": product.parsed_name,
+            "category_id": mapping["category_id"],
+            "unit": mapping["unit"],
+            "base_price": product.price,
+            "final_price": product.price,  # Для профнастила пока без наценок
+            "markup": 0,
+            "thickness": self.thickness,
+            "coating": self.coating,
+            "brand": product.brand,
+            "sheet": product.sheet,
+            "product_type": "profnastil"
+        }
+        add_suggestion_fields(variant, mapping)
+        return variant
+
+
+class SuggestedProduct(NamedTuple):
+    """
+    Товар, категория которого только подсказана нечетким поиском: одна запись
+    без цены продажи и наценок, пока оператор не подтвердит категорию
+    """
+    product: ParsedProduct
+    mapping: Dict[str, Any]
+
+    def to_dict(self) -> Dict[str, Any]:
+        product, mapping = self.product, self.mapping
+        variant = {
+            "original_name": product.original_name,
+            "parsed_name": product.parsed_name,
+            "category_id": None,
+            "unit": mapping["unit"],
+            "base_price": product.price,
+            "final_price": None,
+            "markup": None,
+            "brand": product.brand,
+            "sheet": product.sheet,
+            "product_type": "suggestion"
+        }
+        add_suggestion_fields(variant, mapping)
+        return variant
+
+
+ProductVariant = Union[StandardVariant, ProfnastilVariant, SuggestedProduct]
+# Записи и словари принимаются одинаково (совместимость с кодом на словарях)
+ProductLike = Union[ParsedProduct, Dict[str, Any]]
+
+
+def is_suggestion(mapping: Dict[str, Any]) -> bool:
+    """Категория подобрана нечетким поиском и не подтверждена"""
+    return "suggested_category_id" in mapping
+
+
+def add_suggestion_fields(variant: Dict[str, Any], mapping: Dict[str, Any]):
+    """Добавляет к варианту подсказку категории, если она подобрана нечетким поиском"""
+    if is_suggestion(mapping):
+        variant.update({field: mapping[field] for field in SUGGESTION_FIELDS})
+
+
+def as_product(product: ProductLike) -> ParsedProduct:
+    """Запись товара из записи или словаря"""
+    return product if isinstance(product, ParsedProduct) else ParsedProduct.from_dict(product)
+
+
+def record_to_dict(record: Any) -> Dict[str, Any]:
+    """Словарь для ответа API; словари возвращаются как есть"""
+    return record if isinstance(record, dict) else record.to_dict()
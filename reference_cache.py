@@ -0,0 +1,190 @@
+"""
+Кэш справочных данных (категории и наценки) с TTL и фоновым обновлением.
+Запросы всегда получают готовый снимок: по истечении TTL новая версия
+загружается в фоне, а до ее полной готовности отдается прежний снимок
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics import stage_timer
+
+# Время жизни снимка (сек.) и интервал повторной попытки, если данные взяты из резервного набора
+REFERENCE_CACHE_TTL = float(os.getenv('REFERENCE_CACHE_TTL', 300))
+REFERENCE_CACHE_RETRY_TTL = float(os.getenv('REFERENCE_CACHE_RETRY_TTL', 30))
+
+
+class ReferenceSnapshot:
+    """
+    Неизменяемый снимок справочных данных вместе с построенными по нему индексами
+    """
+
+    def __init__(self, product_mapping: Dict[str, Dict[str, str]], markup_rules: List[Dict[str, Any]],
+                 version: str, db_version: Optional[str] = None, is_fallback: bool = False):
+        self.product_mapping = product_mapping
+        self.markup_rules = markup_rules
+        self.version = version          # версия содержимого (хэш данных)
+        self.db_version = db_version    # отметка изменений в БД, по ней решаем, нужна ли перезагрузка
+        self.is_fallback = is_fallback  # БД недоступна, используются статические данные
+        self.loaded_at = time.time()
+        self.checked_at = time.monotonic()
+
+        # Индексы заполняет загрузчик до публикации снимка
+        self.mapping_index = None
+        self.markup_index = None
+        self.fuzzy_index = None
+
+    def describe(self) -> Dict[str, Any]:
+        """Краткое описание снимка для административных эндпоинтов"""
+        return {
+            "version": self.version,
+            "db_version": self.db_version,
+            "is_fallback": self.is_fallback,
+            "loaded_at": self.loaded_at,
+            "categories_count": len(self.product_mapping),
+            "markup_rules_count": len(self.markup_rules),
+        }
+
+
+class ReferenceDataCache:
+    """
+    Версионированный кэш со сроком жизни.
+    load_snapshot строит полный снимок (запросы в БД + индексы),
+    check_version - дешевая проверка изменений в БД (None, если проверить не удалось)
+    """
+
+    def __init__(self, load_snapshot: Callable[[], ReferenceSnapshot],
+                 check_version: Callable[[], Optional[str]],
+                 ttl: float = REFERENCE_CACHE_TTL, retry_ttl: float = REFERENCE_CACHE_RETRY_TTL):
+        self._load_snapshot = load_snapshot
+        self._check_version = check_version
+        self.ttl = ttl
+        self.retry_ttl = retry_ttl
+
+        self._snapshot: Optional[ReferenceSnapshot] = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._listeners: List[Callable[[Optional[ReferenceSnapshot]], None]] = []
+
+        # Статистика: обращения к готовому снимку, синхронные и фоновые загрузки
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.background_refreshes = 0
+        self.load_seconds = 0.0
+
+    def get(self) -> ReferenceSnapshot:
+        """
+        Текущий снимок. Синхронная загрузка только при первом обращении,
+        по истечении TTL запускается фоновое обновление
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                self.misses += 1
+                if self._snapshot is None:
+                    self._publish(self._timed_load())
+                return self._snapshot
+
+        self.hits += 1
+        ttl = self.retry_ttl if snapshot.is_fallback else self.ttl
+        if time.monotonic() - snapshot.checked_at >= ttl:
+            self._start_background_refresh()
+        return snapshot
+
+    def refresh(self) -> ReferenceSnapshot:
+        """
+        Принудительная перезагрузка: новый снимок строится полностью
+        и атомарно подменяет текущий
+        """
+        snapshot = self._timed_load()
+        with self._lock:
+            self._publish(snapshot)
+        return snapshot
+
+    def install(self, snapshot: ReferenceSnapshot):
+        """Устанавливает готовый снимок (например, общий снимок для пакетной обработки)"""
+        with self._lock:
+            self._publish(snapshot)
+
+    def invalidate(self):
+        """Сбрасывает снимок: следующее обращение загрузит данные заново"""
+        with self._lock:
+            self._snapshot = None
+        self._notify(None)
+
+    def peek(self) -> Optional[ReferenceSnapshot]:
+        """Текущий снимок без загрузки и проверки TTL"""
+        return self._snapshot
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика обращений и загрузок для метрик"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "background_refreshes": self.background_refreshes,
+            "load_seconds": round(self.load_seconds, 6),
+        }
+
+    def add_listener(self, callback: Callable[[Optional[ReferenceSnapshot]], None]):
+        """Подписка на смену снимка (callback получает новый снимок или None при сбросе)"""
+        self._listeners.append(callback)
+
+    def _timed_load(self) -> ReferenceSnapshot:
+        with stage_timer("reference_load"):
+            started = time.perf_counter()
+            try:
+                return self._load_snapshot()
+            finally:
+                self.loads += 1
+                self.load_seconds += time.perf_counter() - started
+
+    def _publish(self, snapshot: ReferenceSnapshot):
+        previous = self._snapshot
+        self._snapshot = snapshot
+        if previous is None or previous.version != snapshot.version:
+            self._notify(snapshot)
+
+    def _notify(self, snapshot: Optional[ReferenceSnapshot]):
+        for callback in self._listeners:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                print(f"Ошибка обработчика обновления справочников: {e}")
+
+    def _start_background_refresh(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, name="reference-cache-refresh", daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            current = self._snapshot
+            db_version = self._check_version()
+
+            # Данные в БД не менялись - продлеваем срок жизни текущего снимка
+            if (current is not None and not current.is_fallback
+                    and db_version is not None and db_version == current.db_version):
+                current.checked_at = time.monotonic()
+                return
+
+            self.background_refreshes += 1
+            snapshot = self._timed_load()
+            with self._lock:
+                # Неудачная загрузка не должна вытеснять рабочие данные из БД
+                if snapshot.is_fallback and self._snapshot is not None and not self._snapshot.is_fallback:
+                    self._snapshot.checked_at = time.monotonic()
+                    return
+                self._publish(snapshot)
+        except Exception as e:
+            print(f"Ошибка фонового обновления справочников: {e}")
+            if self._snapshot is not None:
+                self._snapshot.checked_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._refreshing = False
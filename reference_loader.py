@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Загрузка справочников (category_mapping, color_coating_markup) из CSV или XLSX.
+Первая строка файла - заголовок с именами столбцов таблицы.
+Строки записываются пачками с upsert: существующие обновляются, новые добавляются.
+
+Пример:
+    python reference_loader.py categories categories.xlsx
+    python reference_loader.py markups markups.csv
+"""
+
+import csv
+import io
+import os
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from openpyxl import load_workbook
+
+from database import get_db_manager, CATEGORY_COLUMNS, MARKUP_COLUMNS
+
+# Таблица, столбцы, ключевые (по ним уникальный индекс) столбцы для каждого справочника
+REFERENCE_TABLES = {
+    "categories": ("category_mapping", CATEGORY_COLUMNS, ("name_ru",)),
+    "markups": ("color_coating_markup", MARKUP_COLUMNS, ("color", "coating", "thickness")),
+}
+
+# Числовые столбцы (допускается запятая как десятичный разделитель)
+DECIMAL_COLUMNS = ("markup_price", "markup_percent")
+
+
+def read_table_file(path: str) -> List[Dict[str, str]]:
+    """Строки CSV/XLSX файла в виде словарей {столбец: значение}"""
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        header, rows = _read_xlsx(path)
+    else:
+        header, rows = _read_csv(path)
+
+    columns = [str(name).strip().lower() if name is not None else "" for name in header]
+    records = []
+    for row in rows:
+        values = ["" if value is None else str(value).strip() for value in row]
+        if not any(values):
+            continue
+        records.append(dict(zip(columns, values)))
+    return records
+
+
+def _read_csv(path: str) -> Tuple[List[str], Iterator[List[str]]]:
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        text = f.read()
+    # Excel в русской локали сохраняет CSV через точку с запятой
+    header_line = text.split("\n", 1)[0]
+    try:
+        dialect, options = csv.Sniffer().sniff(header_line, delimiters=",;\t"), {}
+    except csv.Error:
+        # Один столбец или необычный заголовок: разделитель по первой строке не определить.
+        # По умолчанию ";" - запятая встречается в значениях ("PE 0,45")
+        dialect, options = csv.excel, {"delimiter": "," if "," in header_line else ";"}
+    reader = csv.reader(io.StringIO(text), dialect, **options)
+    return next(reader, []), reader
+
+
+def _read_xlsx(path: str) -> Tuple[List[Any], List[Tuple[Any, ...]]]:
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = list(workbook.worksheets[0].iter_rows(values_only=True))
+    finally:
+        workbook.close()
+    return (list(rows[0]) if rows else []), rows[1:]
+
+
+def prepare_rows(records: List[Dict[str, str]], columns: Sequence[str],
+                 key_columns: Sequence[str]) -> List[Tuple[Any, ...]]:
+    """
+    Проверка и приведение значений к порядку столбцов таблицы.
+    Повтор ключа в файле - ошибка: при upsert выиграла бы последняя строка незаметно
+    """
+    missing = [column for column in columns if records and column not in records[0]]
+    if missing:
+        raise ValueError(f"В файле нет столбцов: {', '.join(missing)}")
+
+    rows = []
+    seen = {}
+    for line, record in enumerate(records, start=2):
+        key = tuple(record.get(column, "") for column in key_columns)
+        if not key[0]:
+            raise ValueError(f"Строка {line}: не заполнен столбец {key_columns[0]}")
+        if key in seen:
+            raise ValueError(f"Строка {line}: повтор ключа {key} (строка {seen[key]})")
+        seen[key] = line
+        try:
+            rows.append(tuple(_convert(column, record.get(column, "")) for column in columns))
+        except ValueError as e:
+            raise ValueError(f"Строка {line}: {e}")
+    return rows
+
+
+def _convert(column: str, value: str) -> Optional[Any]:
+    if column not in DECIMAL_COLUMNS:
+        return value
+    if not value:
+        return None
+    try:
+        return float(value.replace(",", "."))
+    except ValueError:
+        raise ValueError(f"некорректное число в {column}: {value!r}") from None
+
+
+def load_reference_file(kind: str, path: str, batch_size: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Загружает справочник kind ("categories" или "markups") из файла.
+    Возвращает (записано строк, строк в файле)
+    """
+    table, columns, key_columns = REFERENCE_TABLES[kind]
+    rows = prepare_rows(read_table_file(path), columns, key_columns)
+    update_columns = [column for column in columns if column not in key_columns]
+
+    written = get_db_manager().bulk_insert(
+        table, columns, rows, on_duplicate="update", update_columns=update_columns, batch_size=batch_size
+    )
+    print(f"{table}: записано {written} из {len(rows)} строк")
+    return written, len(rows)
+
+
+def main(argv: List[str]) -> bool:
+    if len(argv) != 2 or argv[0] not in REFERENCE_TABLES or not os.path.exists(argv[1]):
+        print(__doc__)
+        return False
+
+    try:
+        written, total = load_reference_file(argv[0], argv[1])
+        return written == total
+    except (ValueError, OSError, csv.Error) as e:
+        print(f"Ошибка загрузки справочника: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main(sys.argv[1:]) else 1)
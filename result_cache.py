@@ -0,0 +1,228 @@
+"""
+Кэш результатов разбора повторно загружаемых прайсов.
+Ключ - SHA-256 содержимого файла, версия справочников и параметры разбора;
+значение - сериализованный результат без имени файла (см. serialization.encode_result_tail).
+Два уровня: LRU в памяти и необязательный каталог на диске с вытеснением по размеру.
+При смене версии справочников (обновление, clear_cache) старые записи удаляются
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from business_logic import get_reference_cache
+from reference_cache import ReferenceSnapshot
+
+# Включение кэша, лимит памяти (МБ), каталог и лимит дискового уровня (пустой каталог - без диска)
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_MEMORY_MB = float(os.getenv("RESULT_CACHE_MEMORY_MB", 256))
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", "")
+RESULT_CACHE_DISK_MB = float(os.getenv("RESULT_CACHE_DISK_MB", 2048))
+
+CACHE_FILE_SUFFIX = ".json"
+
+MB = 1024 * 1024
+
+
+def make_cache_key(file_hash: str, reference_version: str, **options: Any) -> str:
+    """
+    Ключ записи: версия справочников в начале (по ней удаляются устаревшие записи),
+    затем хэш файла и параметров разбора
+    """
+    parts = [file_hash] + [f"{name}={options[name]}" for name in sorted(options)]
+    digest = hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:40]
+    return f"{reference_version}-{digest}"
+
+
+def key_version(key: str) -> str:
+    return key.split("-", 1)[0]
+
+
+class ResultCache:
+    """
+    Двухуровневый кэш: память (LRU по суммарному размеру) и диск
+    (вытесняются файлы, к которым дольше всего не обращались)
+    """
+
+    def __init__(self, memory_limit: int = int(RESULT_CACHE_MEMORY_MB * MB),
+                 directory: str = RESULT_CACHE_DIR, disk_limit: int = int(RESULT_CACHE_DISK_MB * MB)):
+        self.memory_limit = memory_limit
+        self.directory = directory or None
+        self.disk_limit = disk_limit
+
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_size = 0
+        self._disk_size = 0
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            self._disk_size = sum(entry[1] for entry in self._disk_entries())
+
+    # --- чтение и запись ---
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Сохраненный результат или None; найденное на диске поднимается в память"""
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return value
+
+        value = self._disk_get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._memory_put(key, value)
+        return value
+
+    def put(self, key: str, value: bytes):
+        """Сохраняет результат в памяти и (если задан каталог) на диске"""
+        with self._lock:
+            self.stores += 1
+            self._memory_put(key, value)
+        self._disk_put(key, value)
+
+    def invalidate(self, keep_version: Optional[str] = None):
+        """Удаляет записи всех версий справочников, кроме keep_version (None - все записи)"""
+        with self._lock:
+            for key in [key for key in self._memory if key_version(key) != keep_version]:
+                self._memory_size -= len(self._memory.pop(key))
+
+        for path, size, name, _ in self._disk_entries():
+            if key_version(name) != keep_version:
+                self._remove_file(path, size)
+
+    def on_reference_change(self, snapshot: Optional[ReferenceSnapshot]):
+        """Обработчик смены снимка справочников (ReferenceDataCache.add_listener)"""
+        self.invalidate(snapshot.version if snapshot is not None else None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика кэша для административных эндпоинтов"""
+        with self._lock:
+            return {
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_size,
+                "memory_limit_bytes": self.memory_limit,
+                "disk_dir": self.directory,
+                "disk_bytes": self._disk_size,
+                "disk_limit_bytes": self.disk_limit if self.directory else 0,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+            }
+
+    # --- память ---
+
+    def _memory_put(self, key: str, value: bytes):
+        if len(value) > self.memory_limit:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_size -= len(previous)
+        self._memory[key] = value
+        self._memory_size += len(value)
+        while self._memory_size > self.memory_limit:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+            self.evictions += 1
+
+    # --- диск ---
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + CACHE_FILE_SUFFIX)
+
+    def _disk_get(self, key: str) -> Optional[bytes]:
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = f.read()
+            os.utime(path)  # время изменения служит отметкой последнего обращения
+            return value
+        except OSError:
+            return None
+
+    def _disk_put(self, key: str, value: bytes):
+        if not self.directory or len(value) > self.disk_limit:
+            return
+        path = self._path(key)
+        tmp_path = None
+        try:
+            # Запись через временный файл: другие процессы не увидят недописанную запись
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(value)
+            replaced = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Ошибка записи кэша результатов: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return
+
+        with self._lock:
+            self._disk_size += len(value) - replaced
+            over_limit = self._disk_size > self.disk_limit
+        if over_limit:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        """Удаляет самые давние записи, пока каталог не уложится в лимит"""
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[3])
+        with self._lock:
+            # Пересчет по каталогу: его могут заполнять и другие процессы
+            self._disk_size = sum(entry[1] for entry in entries)
+        for path, size, _, _ in entries:
+            if self._disk_size <= self.disk_limit:
+                break
+            self._remove_file(path, size)
+            with self._lock:
+                self.evictions += 1
+
+    def _disk_entries(self):
+        """(путь, размер, ключ, время последнего обращения) для файлов записей в каталоге кэша"""
+        if not self.directory:
+            return []
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(CACHE_FILE_SUFFIX):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((entry.path, stat.st_size, entry.name[:-len(CACHE_FILE_SUFFIX)], stat.st_mtime))
+        return entries
+
+    def _remove_file(self, path: str, size: int):
+        try:
+            os.unlink(path)
+        except OSError:
+            return
+        with self._lock:
+            self._disk_size -= size
+
+
+# Глобальный кэш результатов; записи сбрасываются при смене снимка справочников
+result_cache = ResultCache()
+get_reference_cache().add_listener(result_cache.on_reference_change)
+
+
+def get_result_cache() -> ResultCache:
+    """Получение кэша результатов"""
+    return result_cache
@@ -0,0 +1,177 @@
+"""
+Сериализация результата разбора для ответов API.
+JSON: тело ответа собирается из имени файла и заранее сериализованной
+части результата (ее хранит кэш результатов).
+NDJSON: одна JSON-запись на строку, товары отдаются по мере разбора,
+последней строкой идет итог {"filename", "products_count"}
+"""
+
+import json
+import os
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List
+
+from starlette.responses import Response
+
+from records import record_to_dict
+
+try:
+    import orjson  # необязательная зависимость: быстрая сериализация списков товаров
+except ImportError:
+    orjson = None
+
+JSON_MEDIA_TYPE = "application/json"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Сколько товаров собирается в один фрагмент потокового ответа
+NDJSON_BATCH_SIZE = int(os.getenv("NDJSON_BATCH_SIZE", 500))
+
+# Сериализация товаров через orjson (если установлен); вывод совпадает с json.dumps
+FAST_JSON_ENABLED = os.getenv("FAST_JSON_ENABLED", "true").lower() == "true"
+
+# Поля результата со списками товаров (записи records или словари)
+PRODUCT_LIST_FIELDS = ("products", "added", "removed")
+
+# Сколько записей переводится в словари за раз при сериализации списка товаров
+JSON_BATCH_SIZE = 1000
+
+
+# Те же параметры, что и у JSONResponse.render
+_encoder = json.JSONEncoder(ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"))
+
+
+def render_json(content: Any) -> bytes:
+    """JSON в том же виде, что и JSONResponse.render"""
+    return _encoder.encode(content).encode("utf-8")
+
+
+def _is_plain(product: Dict[str, Any]) -> bool:
+    """
+    Товар, который orjson сериализует так же, как json.dumps: только строки, целые,
+    bool, None и числа с плавающей точкой без экспоненты в записи
+    (1e16 и 1e-05 orjson записывает иначе, NaN - как null)
+    """
+    for value in product.values():
+        kind = type(value)
+        if kind is float:
+            if not (value == 0.0 or 1e-4 <= abs(value) < 1e16):
+                return False
+        elif kind is not str and kind is not int and value is not None and kind is not bool:
+            return False
+    return True
+
+
+def _fast_json(products: List[Dict[str, Any]]) -> bool:
+    return orjson is not None and FAST_JSON_ENABLED and all(map(_is_plain, products))
+
+
+def _encode_list(products: List[Dict[str, Any]]) -> bytes:
+    """JSON-массив словарей товаров"""
+    if _fast_json(products):
+        try:
+            return orjson.dumps(products)
+        except TypeError:
+            pass  # например, целое вне 64 бит: json.dumps запишет его как есть
+    return _encoder.encode(products).encode("utf-8")
+
+
+def _encode_lines(products: List[Dict[str, Any]]) -> bytes:
+    """Словари товаров по одному на строку, с переводом строки в конце"""
+    if _fast_json(products):
+        try:
+            return b"\n".join(map(orjson.dumps, products)) + b"\n"
+        except TypeError:
+            pass
+    return ("\n".join(map(_encoder.encode, products)) + "\n").encode("utf-8")
+
+
+def _batches(products: Iterable[Any], size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Словари товаров пачками: записи переводятся в словари только для текущей пачки"""
+    iterator = iter(products)
+    while True:
+        batch = [record_to_dict(product) for product in islice(iterator, size)]
+        if not batch:
+            return
+        yield batch
+
+
+def encode_products(products: Iterable[Any]) -> bytes:
+    """
+    JSON-массив вариантов товаров (записи records или словари);
+    результат совпадает с json.dumps списка словарей
+    """
+    parts = [_encode_list(batch)[1:-1] for batch in _batches(products, JSON_BATCH_SIZE)]
+    return b"[" + b",".join(parts) + b"]"
+
+
+def encode_product_items(products: Iterable[Any], batch_size: int = JSON_BATCH_SIZE) -> Iterator[List[bytes]]:
+    """
+    JSON каждого варианта товара отдельно, пачками по batch_size
+    (для построчного хранения результата; перевод строки внутри JSON экранируется)
+    """
+    for batch in _batches(products, batch_size):
+        yield _encode_lines(batch)[:-1].split(b"\n")
+
+
+def encode_result_tail(result: Dict[str, Any]) -> bytes:
+    """
+    Результат разбора без имени файла ({"products_count", "products", ...})
+    в виде продолжения JSON-объекта после поля filename
+    """
+    fields = [
+        render_json(name) + b":" + (encode_products(value) if name in PRODUCT_LIST_FIELDS else render_json(value))
+        for name, value in result.items()
+    ]
+    return b",".join(fields) + b"}"
+
+
+def encode_with_raw_fields(content: Dict[str, Any], raw: Dict[str, bytes]) -> bytes:
+    """
+    JSON-объект из полей content и полей raw с уже готовым JSON
+    (например, вариантами, сериализованными в рабочем процессе); поля raw идут последними
+    """
+    fields = [render_json(name) + b":" + render_json(value) for name, value in content.items()]
+    fields += [render_json(name) + b":" + value for name, value in raw.items()]
+    return b"{" + b",".join(fields) + b"}"
+
+
+def encode_result(result: Dict[str, Any]) -> bytes:
+    """Результат разбора целиком; совпадает с JSONResponse(jsonable_encoder(result)).body"""
+    return b"{" + encode_result_tail(result)
+
+
+class ProductsJSONResponse(Response):
+    """
+    Ответ с результатом разбора: известная схема товаров сериализуется напрямую
+    (без jsonable_encoder), списки товаров - пачками, через orjson, если он установлен
+    """
+    media_type = JSON_MEDIA_TYPE
+
+    def render(self, content: Dict[str, Any]) -> bytes:
+        return encode_result(content)
+
+
+def build_result_body(filename: str, tail: bytes) -> bytes:
+    """
+    Тело ответа {"filename": ..., **результат}; побайтно совпадает
+    с JSONResponse для того же словаря
+    """
+    return b'{"filename":' + render_json(filename) + b"," + tail
+
+
+def encode_ndjson_line(record: Dict[str, Any]) -> bytes:
+    """Одна строка NDJSON (те же параметры json.dumps, что и у JSONResponse)"""
+    return render_json(record) + b"\n"
+
+
+def iter_ndjson(products: Iterable[Any], filename: str,
+                batch_size: int = NDJSON_BATCH_SIZE) -> Iterator[bytes]:
+    """
+    Фрагменты NDJSON по batch_size товаров; итоговая запись отдается всегда,
+    поэтому генератор не бывает пустым
+    """
+    count = 0
+    for batch in _batches(products, batch_size):
+        count += len(batch)
+        yield _encode_lines(batch)
+    yield encode_ndjson_line({"filename": filename, "products_count": count})
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Тест пакетного разбора: несколько файлов и zip-архивы, ошибки отдельных файлов,
+общий снимок справочников
+"""
+
+import io
+import json
+import zipfile
+from fastapi.testclient import TestClient
+import batch
+import business_logic
+from business_logic import build_reference_snapshot, reference_source, snapshot_from_source
+from excel_parser import ExcelParseError, iter_excel_rows
+from pipeline import _run_batch_file_in_worker, run_pipeline_records
+from records import record_to_dict
+from main import app
+from workbook_fixtures import workbook_bytes
+
+FIRST = workbook_bytes({"Прайс": [["Кредо GL(1190,1125)", "м2", "399оп//439гл"]]})
+SECOND = workbook_bytes({"Прайс": [["Профнастил С-8", "м2", "362 sf"], ["Ламонтерра МП", "м2", "520"]]})
+
+def make_zip(members) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+def expected_products(content: bytes):
+    return [record_to_dict(variant) for variant in run_pipeline_records(content)]
+
+def test_parse_error():
+    """Поврежденный файл - ExcelParseError (HTTPException 500) с понятным текстом"""
+    print("=== Тест ошибки чтения файла ===")
+
+    try:
+        list(iter_excel_rows(b"not an excel file"))
+        assert False, "ожидалась ExcelParseError"
+    except ExcelParseError as e:
+        print(f"  {e}")
+        assert e.status_code == 500
+        assert str(e) == e.detail and e.detail.startswith("Ошибка при парсинге Excel")
+
+def test_pinned_snapshot():
+    """Файл пакета разбирается на переданном снимке, а не на текущем снимке процесса"""
+    print("\n=== Тест общего снимка справочников ===")
+
+    current = business_logic.get_reference_snapshot()
+    mapping = dict(current.product_mapping)
+    mapping["Ламонтерра МП"] = {"unit": "м2", "category_id": "9999"}
+    batch_snapshot = build_reference_snapshot(mapping, current.markup_rules)
+    source = reference_source(batch_snapshot)
+
+    assert snapshot_from_source(reference_source(current)) is current
+    assert snapshot_from_source(source).version == batch_snapshot.version
+    assert snapshot_from_source(source) is snapshot_from_source(source)
+
+    summary, body, _ = _run_batch_file_in_worker(SECOND, "streaming", "прайс.xlsx", source)
+    categories = {product["category_id"] for product in json.loads(body)}
+    print(f"  {summary}, категории: {sorted(categories)}")
+    assert summary["status"] == "ok" and "9999" in categories
+    assert business_logic.get_reference_snapshot() is current  # снимок процесса не изменился
+
+    summary, body, _ = _run_batch_file_in_worker(b"broken", "streaming", "битый.xlsx", source)
+    assert body is None and summary["error_type"] == "invalid_file"
+
+def test_batch_endpoint():
+    """Результаты по файлам в порядке загрузки, ошибки файлов не прерывают пакет"""
+    print("\n=== Тест POST /parse-batch/ ===")
+
+    archive = make_zip({"прайсы/второй.xlsx": SECOND, "прайсы/readme.txt": b"-", "__MACOSX/._x.xlsx": b"-"})
+    files = [
+        ("files", ("первый.xlsx", FIRST)),
+        ("files", ("битый.xlsx", b"not an excel file")),
+        ("files", ("архив.zip", archive)),
+        ("files", ("заметки.txt", b"-")),
+        ("files", ("битый.zip", b"not a zip")),
+    ]
+    client = TestClient(app)
+    response = client.post("/parse-batch/", files=files)
+    assert response.status_code == 200
+    result = response.json()
+    for entry in result["files"]:
+        print(f"  {entry['filename']}: {entry['status']} {entry.get('products_count', entry.get('error'))}")
+
+    assert [entry["filename"] for entry in result["files"]] == [
+        "первый.xlsx", "битый.xlsx", "архив.zip/прайсы/второй.xlsx", "заметки.txt", "битый.zip"]
+    assert [entry["status"] for entry in result["files"]] == ["ok", "error", "ok", "error", "error"]
+    assert result["files"][0]["products"] == expected_products(FIRST)
+    assert result["files"][2]["products"] == expected_products(SECOND)
+    assert result["files"][1]["error_type"] == "invalid_file"
+    assert result["files_count"] == 5 and result["succeeded"] == 2 and result["failed"] == 3
+    assert result["products_count"] == len(expected_products(FIRST)) + len(expected_products(SECOND))
+    assert result["reference_version"] == business_logic.get_reference_snapshot().version
+    assert result["seconds"] >= result["processing_seconds"] > 0
+
+    empty = make_zip({"readme.txt": b"-"})
+    result = client.post("/parse-batch/", files=[("files", ("пустой.zip", empty))]).json()
+    assert result["failed"] == 1 and "нет файлов" in result["files"][0]["error"]
+
+    # Слишком большой архив - ошибка этого файла, остальные файлы пакета разбираются
+    saved_limit = batch.BATCH_MAX_UPLOAD_SIZE
+    batch.BATCH_MAX_UPLOAD_SIZE = len(archive) - 1
+    try:
+        result = client.post("/parse-batch/", files=[("files", ("архив.zip", archive)),
+                                                     ("files", ("первый.xlsx", FIRST))]).json()
+    finally:
+        batch.BATCH_MAX_UPLOAD_SIZE = saved_limit
+    print(f"  архив.zip: {result['files'][0]['error']}")
+    assert [entry["status"] for entry in result["files"]] == ["error", "ok"]
+    assert result["files"][1]["products"] == expected_products(FIRST)
+
+if __name__ == "__main__":
+    test_parse_error()
+    test_pinned_snapshot()
+    test_batch_endpoint()
+    print("\n✓ Все тесты завершены")
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Тест пакетной записи и загрузки справочников из CSV/XLSX
+(без реальной БД: соединение подменяется заглушкой)
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+from mysql.connector.errors import IntegrityError
+from database import DatabaseManager
+import reference_loader
+from workbook_fixtures import workbook_bytes
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def executemany(self, query, rows):
+        if self.connection.fail_on_batch == len(self.connection.batches):
+            raise IntegrityError("Duplicate entry")
+        self.connection.batches.append((query, list(rows)))
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    """Заглушка соединения: запоминает пачки и транзакции"""
+
+    def __init__(self, server_info="8.0.35", server_version=(8, 0, 35)):
+        self.server_info = server_info
+        self.server_version = server_version
+        self.batches = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.in_transaction = False
+        self.fail_on_batch = None
+
+    def get_server_info(self):
+        return self.server_info
+
+    def get_server_version(self):
+        return self.server_version
+
+    def start_transaction(self):
+        self.in_transaction = True
+
+    def commit(self):
+        self.commits += 1
+        self.in_transaction = False
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self)
+
+def make_manager(connection):
+    db = DatabaseManager()
+
+    @contextmanager
+    def session():
+        yield connection
+
+    db.session = session
+    return db
+
+def test_batches_and_upsert():
+    """Пачки по batch_size, по транзакции на пачку, upsert с алиасом строки"""
+    print("=== Тест пакетной записи ===")
+
+    connection = FakeConnection()
+    db = make_manager(connection)
+    rows = [(f"Товар {i}", "м2", str(i)) for i in range(2500)]
+    written = db.bulk_insert("category_mapping", ("name_ru", "unit", "category_id"), rows,
+                             on_duplicate="update", update_columns=("unit", "category_id"), batch_size=1000)
+
+    query = connection.batches[0][0]
+    print(f"  запрос: {query}")
+    assert written == 2500
+    assert [len(batch) for _, batch in connection.batches] == [1000, 1000, 500]
+    assert connection.commits == 3
+    assert query.endswith("VALUES (%s, %s, %s) AS new ON DUPLICATE KEY UPDATE "
+                          "`unit` = new.`unit`, `category_id` = new.`category_id`")
+
+def test_upsert_syntax_for_old_servers():
+    """MariaDB и MySQL до 8.0.19 - через VALUES(), режим ignore - без INSERT IGNORE"""
+    print("\n=== Тест синтаксиса upsert ===")
+
+    connection = FakeConnection("10.6.12-MariaDB", (10, 6, 12))
+    db = make_manager(connection)
+    db.bulk_insert("t", ("a", "b"), [(1, 2)], on_duplicate="update", update_columns=("b",))
+    db.bulk_insert("t", ("a", "b"), [(1, 2)], on_duplicate="ignore")
+
+    assert connection.batches[0][0].endswith("ON DUPLICATE KEY UPDATE `b` = VALUES(`b`)")
+    assert connection.batches[1][0].endswith("ON DUPLICATE KEY UPDATE `a` = `a`")
+    assert "IGNORE" not in connection.batches[1][0]
+
+def test_failed_batch_rolled_back():
+    """Ошибка в пачке: откат и остановка, возвращается число записанных строк"""
+    print("\n=== Тест ошибки в пачке ===")
+
+    connection = FakeConnection()
+    connection.fail_on_batch = 1
+    db = make_manager(connection)
+    written = db.bulk_insert("t", ("a",), [(i,) for i in range(25)], batch_size=10)
+
+    assert written == 10
+    assert connection.commits == 1 and connection.rollbacks == 1
+
+def test_load_reference_files():
+    """Загрузка категорий из CSV (через ;) и наценок из XLSX"""
+    print("\n=== Тест загрузки справочников из файлов ===")
+
+    connection = FakeConnection()
+    db = make_manager(connection)
+    original = reference_loader.get_db_manager
+    reference_loader.get_db_manager = lambda: db
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "categories.csv")
+        with open(csv_path, "w", encoding="utf-8-sig") as f:
+            f.write("Name_RU;unit;category_id\nКредо GL;м2;1156\n\nПлоский лист;м2;1393\n")
+
+        xlsx_path = os.path.join(tmp, "markups.xlsx")
+        with open(xlsx_path, "wb") as f:
+            f.write(workbook_bytes({"Наценки": [["color", "coating", "thickness", "markup_price", "markup_percent"],
+                                                 ["1015", "PE 0,45", "0,45", "7,5", 0.7]]}))
+
+        try:
+            assert reference_loader.load_reference_file("categories", csv_path) == (2, 2)
+            assert reference_loader.load_reference_file("markups", xlsx_path) == (1, 1)
+
+            with open(csv_path, "a", encoding="utf-8") as f:
+                f.write("Кредо GL;м2;1157\n")
+            assert not reference_loader.main(["categories", csv_path])
+        finally:
+            reference_loader.get_db_manager = original
+
+    categories, markups = connection.batches
+    assert categories[1] == [("Кредо GL", "м2", "1156"), ("Плоский лист", "м2", "1393")]
+    assert markups[1] == [("1015", "PE 0,45", "0,45", 7.5, 0.7)]
+    assert markups[0].endswith("`markup_price` = new.`markup_price`, `markup_percent` = new.`markup_percent`")
+
+def test_csv_delimiter_fallback():
+    """Разделитель не определяется по заголовку из одного столбца - файл все равно читается"""
+    print("\n=== Тест CSV с одним столбцом в заголовке ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "categories.csv")
+        for text, expected in (("name_ru\nКредо GL\n", [{"name_ru": "Кредо GL"}]),
+                               ("name_ru\nPE 0,45;м2\n", [{"name_ru": "PE 0,45"}]),
+                               ('name_ru,unit\n"Кредо, GL",м2\n', [{"name_ru": "Кредо, GL", "unit": "м2"}])):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            records = reference_loader.read_table_file(path)
+            print(f"  {text.splitlines()[0]!r}: {records}")
+            assert records == expected
+
+        # Нет нужных столбцов - сообщение об ошибке, а не трассировка
+        assert not reference_loader.main(["categories", path])
+
+def test_bad_decimal_reports_column():
+    """Ошибка числа называет строку и столбец, в котором оно записано"""
+    print("\n=== Тест некорректного числа ===")
+
+    table, columns, key_columns = reference_loader.REFERENCE_TABLES["markups"]
+    records = [{"color": "1015", "coating": "PE", "thickness": "0,45", "markup_price": "7,5", "markup_percent": ""},
+               {"color": "1018", "coating": "PE", "thickness": "0,45", "markup_price": "7,5", "markup_percent": "7%"}]
+    assert reference_loader.prepare_rows(records[:1], columns, key_columns) == [("1015", "PE", "0,45", 7.5, None)]
+    try:
+        reference_loader.prepare_rows(records, columns, key_columns)
+        assert False, "ожидалась ошибка"
+    except ValueError as e:
+        print(f"  {e}")
+        assert str(e) == "Строка 3: некорректное число в markup_percent: '7%'"
+
+if __name__ == "__main__":
+    test_batches_and_upsert()
+    test_upsert_syntax_for_old_servers()
+    test_failed_batch_rolled_back()
+    test_load_reference_files()
+    test_csv_delimiter_fallback()
+    test_bad_decimal_reports_column()
+    print("\n✓ Все тесты завершены")
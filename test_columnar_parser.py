@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Тест колоночного движка разбора: результат должен совпадать с parse_excel_rows
+"""
+
+import pandas as pd
+from price_parser import parse_excel_rows
+from columnar_parser import parse_excel_rows_columnar
+
+TEST_DATA = {
+    "Лист1": [
+        ["Профнастил С-8", "м2", "362sf"],
+        ["Кредо GL", "м2", "738гл/775мп"],
+        ["МП-10", "м2", "399оп//439гл/421мп"],
+        ["Квинта+GL(1210,1150)/   Трамонтана S МП(1195,1155)", "м2", 540],
+        ["Профнастил GL-10 (1180,1150),C10(1154,1100)sf", "м2", "450гл/480мп"],
+        ["Кредо GL(1190,1125)//Монтекристо S", "м2", "700гл/720мп/740"],
+        ["Саморез", "шт", "-"],
+        ["", "м2", "100"],
+        ["Плоский лист", "м2"],
+    ],
+    "Лист2": [
+        ["Ламонтерра МП(1190,1100) Ламонтерра Х МП(1190.1100)", "м2", "от 362sf"],
+        ["Профнастил С-21 (1051,1000),    С-44(1047,1000)", "м2", "362 sf"],
+        [0, "м2", "500"],
+    ],
+    "Пустой": [],
+}
+
+def test_columnar_matches_rows():
+    """Колоночный движок повторяет построчный разбор"""
+    print("=== Тест колоночного движка ===")
+
+    expected = parse_excel_rows(TEST_DATA)
+    columnar = parse_excel_rows_columnar(TEST_DATA)
+
+    print(f"Построчно: {len(expected)} товаров, по столбцам: {len(columnar)} товаров")
+    assert columnar == expected
+    # Порядок ключей важен для одинакового JSON в ответе API
+    assert [list(product) for product in columnar] == [list(product) for product in expected]
+
+def test_columnar_dataframes():
+    """Вход из read_excel_frames: NaN считается пустой ячейкой"""
+    print("\n=== Тест колоночного движка на DataFrame ===")
+
+    frames = {
+        "Лист1": pd.DataFrame([
+            ["Профнастил С-8", "м2", "362sf", None],
+            ["Кредо GL", None, "738гл/775мп", "примечание"],
+            [None, "м2", 100, None],
+        ])
+    }
+    rows = {
+        "Лист1": [
+            ["Профнастил С-8", "м2", "362sf", ""],
+            ["Кредо GL", "", "738гл/775мп", "примечание"],
+            ["", "м2", 100, ""],
+        ]
+    }
+
+    columnar = parse_excel_rows_columnar(frames)
+    for product in columnar:
+        print(f"  - {product['parsed_name']}: {product['price']} руб, бренд: {product['brand']}")
+    assert columnar == parse_excel_rows(rows)
+
+if __name__ == "__main__":
+    test_columnar_matches_rows()
+    test_columnar_dataframes()
+    print("\n✓ Все тесты завершены")
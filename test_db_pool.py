@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Тест пула соединений (без реальной БД: соединения подменяются заглушками)
+"""
+
+import threading
+import time
+from mysql.connector.errors import PoolError, OperationalError
+from db_pool import ConnectionPool
+
+class FakeConnection:
+    """Заглушка соединения mysql.connector"""
+
+    def __init__(self, number):
+        self.number = number
+        self.alive = True
+        self.pings = 0
+
+    def is_connected(self):
+        self.pings += 1
+        return self.alive
+
+    def close(self):
+        self.alive = False
+
+def make_pool(**kwargs):
+    created = []
+
+    def connect():
+        created.append(FakeConnection(len(created)))
+        return created[-1]
+
+    return ConnectionPool(connect, **kwargs), created
+
+def test_reuse_without_ping():
+    """Соединение переиспользуется, свежие соединения не пингуются"""
+    print("=== Тест переиспользования соединений ===")
+
+    pool, created = make_pool(size=2, health_check_interval=60)
+    for _ in range(5):
+        with pool.connection() as connection:
+            assert connection is created[0]
+
+    stats = pool.get_stats()
+    print(f"  статистика: {stats}")
+    assert len(created) == 1 and created[0].pings == 0
+    assert stats["checkouts"] == 5 and stats["in_use"] == 0 and stats["idle"] == 1
+
+def test_checkout_timeout():
+    """Все соединения заняты - ожидание ограничено timeout"""
+    print("\n=== Тест таймаута получения соединения ===")
+
+    pool, _ = make_pool(size=1, timeout=0.05)
+    connection = pool.acquire()
+    try:
+        pool.acquire()
+        assert False, "ожидалась PoolError"
+    except PoolError as e:
+        print(f"  ✓ {e}")
+
+    # Освобожденное соединение получает ожидающий поток
+    threading.Timer(0.02, pool.release, args=(connection,)).start()
+    pool.timeout = 1.0
+    assert pool.acquire() is connection
+
+    stats = pool.get_stats()
+    assert stats["timeouts"] == 1 and stats["waits"] == 2
+
+def test_health_check():
+    """После простоя оборванное соединение заменяется новым"""
+    print("\n=== Тест проверки соединений после простоя ===")
+
+    pool, created = make_pool(size=2, health_check_interval=0.01)
+    with pool.connection():
+        pass
+    created[0].alive = False
+    time.sleep(0.02)
+
+    with pool.connection() as connection:
+        assert connection is created[1]
+    assert pool.get_stats()["health_check_failures"] == 1
+
+def test_discard_after_error():
+    """Соединение, оборвавшееся во время запроса, не возвращается в пул"""
+    print("\n=== Тест ошибки во время запроса ===")
+
+    pool, created = make_pool(size=2)
+    try:
+        with pool.connection() as connection:
+            connection.alive = False
+            raise OperationalError("Lost connection to MySQL server")
+    except OperationalError:
+        pass
+
+    stats = pool.get_stats()
+    assert stats["idle"] == 0 and stats["closed"] == 1 and stats["in_use"] == 0
+    with pool.connection() as connection:
+        assert connection is created[1]
+
+def test_concurrent_sessions():
+    """Параллельные потоки не получают одно соединение одновременно"""
+    print("\n=== Тест параллельного доступа ===")
+
+    pool, created = make_pool(size=3, timeout=5)
+    holders = {}
+    errors = []
+
+    def worker():
+        for _ in range(50):
+            with pool.connection() as connection:
+                if holders.setdefault(connection.number, threading.get_ident()) != threading.get_ident():
+                    errors.append(connection.number)
+                del holders[connection.number]
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(f"  создано соединений: {len(created)}")
+    assert not errors and len(created) <= 3
+
+if __name__ == "__main__":
+    test_reuse_without_ping()
+    test_checkout_timeout()
+    test_health_check()
+    test_discard_after_error()
+    test_concurrent_sessions()
+    print("\n✓ Все тесты завершены")
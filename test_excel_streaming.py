@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Тест потокового чтения Excel (iter_excel_rows) в сравнении с parse_excel_file
+"""
+
+import datetime
+from excel_parser import parse_excel_file, iter_excel_rows
+from price_parser import parse_excel_rows, iter_parsed_products
+from workbook_fixtures import workbook_bytes
+
+SHEETS = {
+    # Небольшой .xlsx с типичными строками прайса
+    "Лист1": [
+        ["Наименование", "Ед.", "Цена"],
+        ["Профнастил С-8", "м2", "362sf"],
+        ["Кредо GL", "м2", "738гл/775мп"],
+        ["МП-10", "м2", "399оп//439гл/421мп"],
+        ["Квинта+GL(1210,1150)/   Трамонтана S МП(1195,1155)", "м2", 540],
+        ["Дата прайса", datetime.datetime(2024, 1, 2), None],
+    ],
+    "Лист2": [
+        ["Профнастил С-21 (1051,1000),    С-44(1047,1000)", "м2", "450гл/480мп"],
+        ["Монтекристо S", None, "-"],
+    ],
+}
+
+def test_streaming_matches_pandas():
+    """Потоковый режим дает тот же результат разбора, что и pandas"""
+    print("=== Тест потокового чтения Excel ===")
+
+    content = workbook_bytes(SHEETS)
+    expected = parse_excel_rows(parse_excel_file(content))
+    streamed = parse_excel_rows(iter_excel_rows(content))
+
+    print(f"pandas: {len(expected)} товаров, потоково: {len(streamed)} товаров")
+    assert streamed == expected
+
+def test_generator_is_lazy():
+    """iter_parsed_products отдает товары по мере чтения строк"""
+    print("\n=== Тест ленивого разбора ===")
+
+    products = iter_parsed_products(iter_excel_rows(workbook_bytes(SHEETS)))
+    first = next(products)
+    print(f"Первый товар: {first['parsed_name']} - {first['price']} руб")
+    assert first["parsed_name"] == "Профнастил С-8"
+
+if __name__ == "__main__":
+    test_streaming_matches_pandas()
+    test_generator_is_lazy()
+    print("\n✓ Все тесты завершены")
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Тест быстрой сериализации результата: тело ответа совпадает с JSONResponse(jsonable_encoder(...))
+"""
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+import serialization
+from serialization import ProductsJSONResponse, encode_products, iter_ndjson, render_json
+
+PRODUCTS = [
+    {"original_name": "Кредо GL(1190,1125)", "parsed_name": "Кредо GL", "category_id": "1156",
+     "unit": "м2", "base_price": 399, "final_price": 406.0, "markup": 7.0, "color": "1015",
+     "brand": "оп", "sheet": "Лист \"1\"\\", "product_type": "standard"},
+    {"parsed_name": "Управляющие \t\n\x01 символы", "category_id": None, "match_score": 0.667,
+     "final_price": 1e16, "markup": 1e-05, "thickness": "0,4двс"},
+    {"parsed_name": "Большое целое", "base_price": 2 ** 70, "final_price": -0.0, "markup": 0.0001},
+    {"parsed_name": "Эмодзи 😀 и  ", "flag": True, "nested": [1.5, {"a": None}]},
+]
+
+def expected_body(content) -> bytes:
+    return JSONResponse(content=jsonable_encoder(content)).body
+
+def test_matches_json_response():
+    """Совпадение побайтно: с orjson и без него, для любых пачек"""
+    print("=== Тест совпадения с JSONResponse ===")
+
+    content = {"filename": "прайс.xlsx", "products_count": len(PRODUCTS), "products": PRODUCTS,
+               "sheet_timings": [{"sheet": "Лист1", "seconds": 0.25}]}
+    saved = serialization.FAST_JSON_ENABLED, serialization.JSON_BATCH_SIZE
+    try:
+        for fast in (True, False):
+            for batch_size in (1, 2, 1000):
+                serialization.FAST_JSON_ENABLED = fast
+                serialization.JSON_BATCH_SIZE = batch_size
+                assert ProductsJSONResponse(content=content).body == expected_body(content)
+                for product in PRODUCTS:
+                    assert encode_products([product]) == render_json([product])
+        assert encode_products([]) == b"[]"
+        print(f"  ✓ совпадает (orjson: {serialization.orjson is not None})")
+    finally:
+        serialization.FAST_JSON_ENABLED, serialization.JSON_BATCH_SIZE = saved
+
+def test_ndjson_lines():
+    """Строки NDJSON совпадают с json.dumps каждого товара"""
+    print("\n=== Тест строк NDJSON ===")
+
+    body = b"".join(iter_ndjson(PRODUCTS, "прайс.xlsx", batch_size=3))
+    lines = body.split(b"\n")
+    assert lines[:len(PRODUCTS)] == [render_json(product) for product in PRODUCTS]
+    assert lines[len(PRODUCTS)] == render_json({"filename": "прайс.xlsx", "products_count": len(PRODUCTS)})
+    print(f"  строк: {len(lines) - 1}")
+
+if __name__ == "__main__":
+    test_matches_json_response()
+    test_ndjson_lines()
+    print("\n✓ Все тесты завершены")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Тест нечеткого поиска категорий по триграммам
+"""
+
+import random
+import business_logic
+import fuzzy_index
+from business_logic import iter_variant_records
+from fuzzy_index import TrigramIndex, trigrams
+from metrics import PipelineStats
+from records import ParsedProduct
+
+CATEGORIES = {
+    "Кредо GL": {"unit": "м2", "category_id": "1156"},
+    "Ламонтерра МП": {"unit": "м2", "category_id": "2262"},
+    "Монтерроса S МП": {"unit": "м2", "category_id": "2265"},
+    "Профнастил С-8": {"unit": "м2", "category_id": "2291"},
+    "Плоский лист": {"unit": "м2", "category_id": "1393"},
+}
+
+def test_best_match():
+    """Опечатки и лишние слова не мешают найти категорию"""
+    print("=== Тест триграммного индекса ===")
+
+    index = TrigramIndex(CATEGORIES)
+    cases = {
+        "Кредо ГЛ": "Кредо GL",
+        "Ламонтера МП (1190,1100)": "Ламонтерра МП",
+        "Монтероса S": "Монтерроса S МП",
+        "Плоский лист оцинкованный": "Плоский лист",
+    }
+    for name, expected in cases.items():
+        match = index.best_match(name)
+        print(f"  '{name}' -> {match.name} (оценка {match.score:.2f})")
+        assert match.name == expected
+
+    assert index.best_match("") is None
+
+def best_by_scan(categories, name):
+    """Коэффициент Дайса перебором всех категорий; при равенстве - первая"""
+    grams = trigrams(name)
+    best = None
+    for category, mapping in categories.items():
+        score = 2.0 * len(grams & trigrams(category)) / (len(grams) + len(trigrams(category)))
+        if score > 0 and (best is None or score > best[2]):
+            best = (category, mapping, score)
+    return best
+
+def test_matches_scan():
+    """Подсчет через Counter и через np.bincount совпадает с перебором всех категорий"""
+    print("\n=== Тест совпадения с перебором ===")
+
+    categories = dict(CATEGORIES, **{"Кредо МП": {"unit": "м2", "category_id": "1157"},
+                                     "Кредо": {"unit": "м2", "category_id": "1158"}})
+    index = TrigramIndex(categories)
+    generator = random.Random(3)
+    names = ["Кредо", "Кредо М", "GL", "Плоский", "xyz", "Лист"]
+    for _ in range(200):
+        base = generator.choice(list(categories))
+        names.append("".join(ch for ch in base if generator.random() > 0.2))
+    saved = fuzzy_index.SPARSE_POSTINGS_RATIO
+    try:
+        for ratio in (0, 10 ** 9):  # только Counter, только np.bincount
+            fuzzy_index.SPARSE_POSTINGS_RATIO = ratio
+            for name in names:
+                match = index.best_match(name)
+                expected = best_by_scan(categories, name)
+                assert (tuple(match) if match else None) == expected, (ratio, name)
+    finally:
+        fuzzy_index.SPARSE_POSTINGS_RATIO = saved
+    print(f"  названий: {len(names)}")
+
+def test_suggestion_variant():
+    """Товар без соответствия получает подсказку категории"""
+    print("\n=== Тест подсказки категории ===")
+
+    product = {
+        "original_name": "Ламонтера МП", "parsed_name": "Ламонтера МП",
+        "unit": "м2", "price": 540, "brand": None, "sheet": "Лист1",
+    }
+    business_logic.set_reference_data(CATEGORIES, [
+        {"color": "standard", "coating": "PE 0,7", "region": "all", "markup": 50.0, "unit_markup": 5.0},
+    ])
+    saved = business_logic.FUZZY_MATCH_ENABLED
+    try:
+        business_logic.FUZZY_MATCH_ENABLED = False
+        assert business_logic.process_standard_product(product) == []
+
+        business_logic.FUZZY_MATCH_ENABLED = True
+        variants = business_logic.process_standard_product(product)
+        for variant in variants:
+            print(f"  - {variant['parsed_name']}: подсказка {variant['suggested_category_id']} "
+                  f"({variant['suggested_category_name']}, {variant['match_score']})")
+        # Одна запись без цены продажи: наценки не применяются к неподтвержденной категории
+        assert len(variants) == 1 and variants[0]["product_type"] == "suggestion"
+        assert variants[0]["category_id"] is None and variants[0]["final_price"] is None
+        assert variants[0]["suggested_category_id"] == "2262" and variants[0]["base_price"] == 540
+
+        profnastil = dict(product, original_name="Профнастил С-9", parsed_name="Профнастил С-9")
+        assert [v["product_type"] for v in business_logic.process_profnastil_product(profnastil)] == ["suggestion"]
+
+        stats = PipelineStats()
+        products = [ParsedProduct.from_dict(product), ParsedProduct.from_dict(dict(product, parsed_name="Кредо GL")),
+                    ParsedProduct.from_dict(dict(product, parsed_name="Саморез"))]
+        records = list(iter_variant_records(products, stats))
+        print(f"  вариантов {len(records)}, с подсказкой {stats.suggested}, без категории {stats.unmatched}")
+        assert len(records) == 2 and stats.suggested == 1 and stats.unmatched == 1
+    finally:
+        business_logic.FUZZY_MATCH_ENABLED = saved
+        business_logic.clear_cache()
+
+if __name__ == "__main__":
+    test_best_match()
+    test_matches_scan()
+    test_suggestion_variant()
+    print("\n✓ Все тесты завершены")
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Тест асинхронных заданий разбора: хранилище, выполнение, возобновление и API
+"""
+
+import json
+import os
+import tempfile
+import time
+from fastapi.testclient import TestClient
+import jobs
+import main
+from jobs import DONE, FAILED, QUEUED, JobRunner, JobStore, run_job
+from pipeline import run_pipeline_records
+from records import record_to_dict
+from workbook_fixtures import workbook_bytes
+
+SHEETS = {
+    "Киров": [["Кредо GL(1190,1125)", "м2", f"{400 + i}оп//{440 + i}гл"] for i in range(30)],
+    "Пенза": [["Профнастил С-8", "м2", "362 sf"], ["Саморез", "шт", "-"]],
+}
+
+def write_upload(directory: str, content: bytes) -> str:
+    path = os.path.join(directory, f"upload-{time.monotonic_ns()}.xlsx")
+    with open(path, "wb") as f:
+        f.write(content)
+    return path
+
+def expected_products(content: bytes):
+    return [record_to_dict(variant) for variant in run_pipeline_records(content)]
+
+def wait_for(store: JobStore, job_id: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = store.get_job(job_id)
+        if job["status"] in (DONE, FAILED):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"задание {job_id} не завершилось")
+
+def test_run_job():
+    """Задание сохраняет варианты пачками и прогресс; ошибка разбора записывается в задание"""
+    print("=== Тест выполнения задания ===")
+
+    content = workbook_bytes(SHEETS)
+    with tempfile.TemporaryDirectory() as directory:
+        store = JobStore(os.path.join(directory, "jobs.sqlite3"))
+        path = write_upload(directory, content)
+        job_id = store.create_job("прайс.xlsx", path, len(content))
+        run_job(job_id, store.path, batch_size=7)
+
+        job = store.get_job(job_id)
+        print(f"  {job['status']}: листов {job['sheets_done']}/{job['sheets_total']}, "
+              f"строк {job['rows_processed']}, вариантов {job['products_count']}")
+        expected = expected_products(content)
+        assert job["status"] == DONE and job["error"] is None
+        assert job["sheets_total"] == job["sheets_done"] == 2
+        assert job["rows_processed"] == 32
+        assert job["products_count"] == len(expected)
+        assert [json.loads(item) for item in store.read_products(job_id, 0, 10000)] == expected
+        assert [json.loads(item) for item in store.read_products(job_id, 5, 3)] == expected[5:8]
+        assert sum(len(items) for items in store.iter_products(job_id, batch_size=7)) == len(expected)
+        assert not os.path.exists(path)  # файл загрузки удален
+
+        broken = store.create_job("битый.xlsx", write_upload(directory, b"not an excel file"), 17)
+        run_job(broken, store.path)
+        job = store.get_job(broken)
+        print(f"  {job['status']}: {job['error']}")
+        assert job["status"] == FAILED and job["error"].startswith("Ошибка обработки файла")
+        assert store.read_products(broken, 0, 10) == []
+        store.close()
+        jobs._worker_stores.pop(store.path).close()
+
+def test_progress_without_variants():
+    """Прогресс по строкам записывается по интервалу, даже если вариантов еще нет"""
+    print("\n=== Тест прогресса строк без вариантов ===")
+
+    content = workbook_bytes({"Прочее": [[f"Неизвестный товар {i}", "шт", "100"] for i in range(20)]})
+    with tempfile.TemporaryDirectory() as directory:
+        store = JobStore(os.path.join(directory, "jobs.sqlite3"))
+        job_id = store.create_job("прайс.xlsx", write_upload(directory, content), len(content))
+        saved = []
+        save_progress = store.save_progress
+        store.save_progress = lambda job, progress, items: (save_progress(job, progress, items),
+                                                             saved.append(store.get_job(job)["rows_processed"]))
+        jobs._worker_stores[store.path] = store
+        try:
+            run_job(job_id, store.path, progress_interval=0)
+        finally:
+            jobs._worker_stores.pop(store.path)
+
+        job = store.get_job(job_id)
+        print(f"  записей прогресса: {len(saved)}, строк {job['rows_processed']}, вариантов {job['products_count']}")
+        assert job["status"] == DONE and job["products_count"] == 0 and job["rows_processed"] == 20
+        assert saved and saved == sorted(saved) and 0 < saved[0] < 20
+        store.close()
+
+def test_resume_after_restart():
+    """Незавершенные задания выполняются после старта пула; старые результаты удаляются"""
+    print("\n=== Тест возобновления заданий ===")
+
+    content = workbook_bytes(SHEETS)
+    with tempfile.TemporaryDirectory() as directory:
+        store = JobStore(os.path.join(directory, "jobs.sqlite3"))
+        queued = store.create_job("прайс.xlsx", write_upload(directory, content), len(content))
+        interrupted = store.create_job("прайс2.xlsx", write_upload(directory, content), len(content))
+        store.start_job(interrupted, 2, "старая версия")  # процесс остановился посреди разбора
+        assert store.count_pending() == 2
+
+        runner = JobRunner(store, workers=0, ttl_hours=0)
+        try:
+            runner.start()
+            for job_id in (queued, interrupted):
+                job = wait_for(store, job_id)
+                assert job["status"] == DONE
+                assert job["products_count"] == len(expected_products(content))
+            assert store.count_pending() == 0
+
+            # Истекший срок хранения: задание удаляется при следующей постановке в очередь
+            try:
+                JobRunner(store, workers=0, max_pending=0).submit("прайс.xlsx", "", 0)
+                assert False, "ожидалась JobQueueFullError"
+            except jobs.JobQueueFullError:
+                pass
+            runner.submit("прайс3.xlsx", write_upload(directory, content), len(content))
+            assert store.get_job(queued) is None
+        finally:
+            runner.shutdown()
+            store.close()
+            jobs._worker_stores.pop(store.path).close()
+
+def test_jobs_api():
+    """POST /jobs, состояние, результат постранично и потоком NDJSON"""
+    print("\n=== Тест API заданий ===")
+
+    client = TestClient(main.app)
+    content = workbook_bytes(SHEETS)
+    expected = expected_products(content)
+    saved_runner, saved_dir = jobs._runner, main.JOBS_DIR
+    with tempfile.TemporaryDirectory() as directory:
+        store = JobStore(os.path.join(directory, "jobs.sqlite3"))
+        jobs._runner = JobRunner(store, workers=0)
+        main.JOBS_DIR = os.path.join(directory, "uploads")
+        try:
+            response = client.post("/jobs", files={"file": ("прайс.xlsx", content)})
+            assert response.status_code == 202
+            job_id = response.json()["job_id"]
+            assert response.headers["location"] == f"/jobs/{job_id}"
+
+            wait_for(store, job_id)
+            status = client.get(f"/jobs/{job_id}").json()
+            print(f"  {status['status']}: {status['progress']}")
+            assert status["status"] == DONE
+            assert status["progress"]["products_count"] == len(expected)
+
+            page = client.get(f"/jobs/{job_id}/result", params={"offset": 10, "limit": 5}).json()
+            assert page["products"] == expected[10:15]
+            assert page["products_count"] == len(expected) and page["filename"] == "прайс.xlsx"
+            assert client.get(f"/jobs/{job_id}/result").json()["products"] == expected
+
+            response = client.get(f"/jobs/{job_id}/result", params={"stream": 1})
+            assert response.headers["content-type"] == "application/x-ndjson"
+            records = [json.loads(line) for line in response.text.splitlines()]
+            assert records[:-1] == expected
+            assert records[-1] == {"filename": "прайс.xlsx", "products_count": len(expected)}
+
+            waiting = store.create_job("ждет.xlsx", "", 0)
+            assert store.get_job(waiting)["status"] == QUEUED
+            assert client.get(f"/jobs/{waiting}/result").status_code == 409
+            assert client.get("/jobs/нет").status_code == 404
+            assert client.get(f"/jobs/{job_id}/result", params={"limit": 0}).status_code == 422
+            assert client.post("/jobs", files={"file": ("прайс.csv", b"1")}).status_code == 400
+        finally:
+            jobs._runner.shutdown()
+            jobs._runner, main.JOBS_DIR = saved_runner, saved_dir
+            store.close()
+            jobs._worker_stores.pop(store.path).close()
+
+if __name__ == "__main__":
+    test_run_job()
+    test_progress_without_variants()
+    test_resume_after_restart()
+    test_jobs_api()
+    print("\n✓ Все тесты завершены")
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Тест индекса поиска категорий: результат должен совпадать с прежним перебором
+"""
+
+import random
+from mapping_index import ProductMappingIndex
+from business_logic import extract_base_name
+
+CATEGORIES = {
+    "Кредо GL": {"unit": "м2", "category_id": "1156"},
+    "Квинта+GL": {"unit": "м2", "category_id": "1157"},
+    "Ламонтерра МП": {"unit": "м2", "category_id": "2262"},
+    "Ламонтерра Х МП": {"unit": "м2", "category_id": "2266"},
+    "Монтекристо S": {"unit": "м2", "category_id": "2263"},
+    "Профнастил С-8": {"unit": "м2", "category_id": "2291"},
+    "Профнастил C10 фигурный": {"unit": "м2", "category_id": "2393"},
+    "Профнастил C10": {"unit": "м2", "category_id": "1142"},
+    "Плоский лист": {"unit": "м2", "category_id": "1393"},
+}
+
+def find_by_scan(mapping, base_name):
+    """Прежняя логика find_product_mapping"""
+    if base_name in mapping:
+        return mapping[base_name]
+    for key, value in mapping.items():
+        if key in base_name or base_name in key:
+            return value
+    return None
+
+def test_known_names():
+    """Типичные названия из прайсов"""
+    print("=== Тест индекса категорий ===")
+
+    index = ProductMappingIndex(CATEGORIES)
+    names = [
+        "Кредо GL(1190,1125)", "Ламонтерра Х МП(1190.1100)", "C10(1154,1100)sf",
+        "Профнастил C10 фигурный", "Профнастил", "Плоский", "Саморез", "",
+    ]
+    for name in names:
+        base_name = extract_base_name(name)
+        found = index.find(base_name)
+        print(f"  '{name}' -> {found['category_id'] if found else 'не найдено'}")
+        assert found is find_by_scan(CATEGORIES, base_name), name
+
+def test_random_names():
+    """Случайные ключи и названия: тот же первый найденный ключ, что и при переборе"""
+    print("\n=== Тест индекса на случайных данных ===")
+
+    rng = random.Random(42)
+    alphabet = "абв "
+    for _ in range(300):
+        keys = ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 5))) for _ in range(rng.randint(0, 8))]
+        mapping = {key: {"category_id": str(i)} for i, key in enumerate(keys)}
+        index = ProductMappingIndex(mapping)
+        for _ in range(20):
+            name = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 7)))
+            assert index.find(name) is find_by_scan(mapping, name), (keys, name)
+    print("✓ Совпадает с перебором")
+
+if __name__ == "__main__":
+    test_known_names()
+    test_random_names()
+    print("\n✓ Все тесты завершены")
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Тест индекса наценок: результат должен совпадать с прежним перебором правил
+"""
+
+import business_logic
+from business_logic import MarkupIndex, get_applicable_markups, get_markup_index, set_reference_data
+
+MARKUP_RULES = [
+    {"color": "1015", "coating": "PE 0,45", "region": "spb_nn_kirov_penza", "markup": 7.0, "unit_markup": 0.7},
+    {"color": "1018", "coating": "Satin", "region": "all", "markup": 50.0, "unit_markup": 5.0},
+    {"color": "standard", "coating": "PE 0,45 двс", "region": "all", "markup": 50.0, "unit_markup": 5.0},
+    {"color": "standard", "coating": "PE", "region": "all", "markup": 10.0, "unit_markup": 1.0},
+    {"color": "standard", "coating": "", "region": "all", "markup": 1.0, "unit_markup": 0.1},
+    {"color": "standard", "coating": "PE 0,45", "region": "msk", "markup": 30.0, "unit_markup": 3.0},
+    {"color": "standard", "coating": "Satin", "region": "spb", "markup": 20.0, "unit_markup": 2.0},
+    {"color": "standard", "coating": "PE 0,8", "region": "all", "markup": 55.0, "unit_markup": 5.5},
+]
+
+COATINGS = [None, "", "PE 0,45", "PE 0,45 двс", "PE 0,45 двс матовый", "PE", "P", "PE 0,8", "Satin",
+            "Satin матовый", "Velur", "Цинк", "pe 0,45", " PE 0,45 "]
+
+def applicable_by_scan(markup_rules, coating):
+    """Прежняя логика get_applicable_markups: перебор всех правил"""
+    applicable = []
+    for markup in markup_rules:
+        if markup["region"] not in ["all", "spb_nn_kirov_penza"]:
+            continue
+        if coating and markup["coating"] not in coating:
+            continue
+        applicable.append(markup)
+    return applicable
+
+def test_matches_scan():
+    """Те же правила в том же порядке для любых покрытий, в том числе повторно"""
+    print("=== Тест индекса наценок ===")
+
+    index = MarkupIndex(MARKUP_RULES)
+    for _ in range(2):  # второй проход - из словаря by_coating
+        for coating in COATINGS:
+            expected = applicable_by_scan(MARKUP_RULES, coating)
+            assert list(index.for_coating(coating)) == expected, coating
+    print(f"  покрытий: {len(COATINGS)}, в словаре: {len(index.by_coating)}")
+
+    assert all(markup["region"] in ("all", "spb_nn_kirov_penza") for markup in index.for_coating(None))
+    assert [m["coating"] for m in index.for_coating("PE 0,45 двс")] == ["PE 0,45", "PE 0,45 двс", "PE", ""]
+    assert list(index.for_coating("Velur")) == [MARKUP_RULES[4]]
+    assert MarkupIndex([]).for_coating("PE") == () and MarkupIndex([]).for_coating(None) == ()
+
+def test_current_snapshot():
+    """get_markup_index и get_applicable_markups работают по правилам текущего снимка"""
+    print("\n=== Тест индекса наценок текущего снимка ===")
+
+    original = business_logic.get_reference_snapshot()
+    try:
+        for rules in (MARKUP_RULES, business_logic.FALLBACK_MARKUP_RULES):
+            set_reference_data(business_logic.FALLBACK_PRODUCT_MAPPING, rules)
+            for coating in COATINGS:
+                expected = applicable_by_scan(rules, coating)
+                assert list(get_markup_index().for_coating(coating)) == expected, coating
+                assert get_applicable_markups("Профнастил С-8", coating) == expected, coating
+        print("  ✓ совпадает с перебором")
+    finally:
+        business_logic.get_reference_cache().install(original)
+
+if __name__ == "__main__":
+    test_matches_scan()
+    test_current_snapshot()
+    print("\n✓ Все тесты завершены")
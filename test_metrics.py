@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Тест метрик: формат Prometheus, время этапов разбора, /metrics и Server-Timing
+"""
+
+from fastapi.testclient import TestClient
+from metrics import MetricsRegistry, PipelineStats, ServerTiming, stats_samples
+from pipeline import iter_pipeline_records
+from main import app
+from workbook_fixtures import workbook_bytes
+
+ROWS = [
+    ["Кредо GL(1190,1125)", "м2", "399оп//439гл"],
+    ["C10(1154,1100)sf", "м2", "362sf"],
+    ["Планка конька", "шт", "150"],
+]
+
+def test_prometheus_format():
+    """Счетчики с метками и накопительные корзины гистограммы"""
+    print("=== Тест формата Prometheus ===")
+
+    registry = MetricsRegistry()
+    counter = registry.counter("rows_total", "Строки")
+    histogram = registry.histogram("stage_seconds", "Время", buckets=(0.1, 1.0))
+    counter.inc(3, sheet='Лист "1"')
+    counter.inc(2, sheet='Лист "1"')
+    histogram.observe(0.05, stage="parse")
+    histogram.observe(0.5, stage="parse")
+    registry.add_collector(lambda: [("cache_size", "gauge", "Размер", [("cache_size", (), 7)])])
+
+    text = registry.render()
+    print(text)
+    lines = text.splitlines()
+    assert "# TYPE rows_total counter" in lines
+    assert 'rows_total{sheet="Лист \\"1\\""} 5' in lines
+    assert 'stage_seconds_bucket{stage="parse",le="0.1"} 1' in lines
+    assert 'stage_seconds_bucket{stage="parse",le="1.0"} 2' in lines
+    assert 'stage_seconds_bucket{stage="parse",le="+Inf"} 2' in lines
+    assert 'stage_seconds_count{stage="parse"} 2' in lines
+    assert "cache_size 7" in lines
+
+    families = stats_samples("db_pool", {"waits": 2, "wait_seconds_total": 0.5, "size": 4, "enabled": True},
+                             counters=("waits", "wait_seconds_total"))
+    assert [(name, kind) for name, kind, _, _ in families] == [
+        ("db_pool_waits_total", "counter"), ("db_pool_wait_seconds_total", "counter"), ("db_pool_size", "gauge")]
+
+    timing = ServerTiming()
+    timing.add("parse_rows", 0.0125)
+    timing.add("parse_rows", 0.0125)
+    assert timing.header(0.05) == "parse_rows;dur=25.0, total;dur=50.0"
+
+def test_pipeline_stats():
+    """Этапы конвейера: собственное время и счетчики для обоих движков"""
+    print("\n=== Тест времени этапов конвейера ===")
+
+    content = workbook_bytes({"Прайс": ROWS})
+    for engine in ("streaming", "columnar"):
+        stats = PipelineStats()
+        variants = list(iter_pipeline_records(content, engine, stats=stats))
+        seconds = stats.stage_seconds()
+        print(f"  {engine}: {seconds}, строк {stats.rows}, товаров {stats.products}, "
+              f"вариантов {stats.variants}, без категории {stats.unmatched}")
+
+        assert set(seconds) == {"read_excel", "parse_rows", "business_rules"}
+        assert all(value > 0 for value in seconds.values())
+        assert stats.rows == 3
+        assert stats.products == 4
+        assert stats.unmatched == 2  # "C10" и "Планка конька" без категории
+        assert stats.variants == len(variants)
+
+    merged = PipelineStats()
+    merged.merge(stats)
+    merged.merge(stats)
+    assert merged.products == 2 * stats.products
+    assert abs(merged.stage_seconds()["parse_rows"] - 2 * seconds["parse_rows"]) < 1e-9
+
+def test_metrics_endpoint():
+    """После разбора файла /metrics содержит этапы и счетчики, ответ - заголовок Server-Timing"""
+    print("\n=== Тест /metrics и Server-Timing ===")
+
+    client = TestClient(app)
+    response = client.post("/parse-excel/", files={"file": ("прайс.xlsx", workbook_bytes({"Прайс": ROWS}))})
+    assert response.status_code == 200
+    server_timing = response.headers["server-timing"]
+    print(f"  Server-Timing: {server_timing}")
+    assert "upload;dur=" in server_timing and "total;dur=" in server_timing
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    for expected in ('parser_stage_seconds_count{stage="upload"}',
+                     "# TYPE parser_variants_total counter",
+                     'http_request_duration_seconds_count{method="POST",path="/parse-excel/",status="200"}',
+                     "# TYPE reference_cache_hits_total counter",
+                     "# TYPE result_cache_misses_total counter"):
+        assert expected in text, expected
+    assert "_total_total" not in text
+    print(f"  строк метрик: {len(text.splitlines())}")
+
+if __name__ == "__main__":
+    test_prometheus_format()
+    test_pipeline_stats()
+    test_metrics_endpoint()
+    print("\n✓ Все тесты завершены")
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Тест потокового ответа NDJSON для /parse-excel/
+"""
+
+import json
+from fastapi.testclient import TestClient
+from serialization import iter_ndjson
+from main import app
+from workbook_fixtures import workbook_bytes
+
+ROWS = [
+    ["Кредо GL(1190,1125)", "м2", "399оп//439гл"],
+    ["C10(1154,1100)sf", "м2", "362sf"],
+    ["Саморез", "шт", "-"],
+]
+
+def test_ndjson_chunks():
+    """Фрагменты по batch_size товаров и итоговая запись в конце"""
+    print("=== Тест фрагментов NDJSON ===")
+
+    products = [{"parsed_name": f"Товар {i}", "price": i} for i in range(5)]
+    chunks = list(iter_ndjson(products, "прайс.xlsx", batch_size=2))
+    for chunk in chunks:
+        print(f"  {chunk.decode('utf-8')!r}")
+
+    assert len(chunks) == 4
+    lines = b"".join(chunks).decode("utf-8").splitlines()
+    assert [json.loads(line) for line in lines[:-1]] == products
+    assert json.loads(lines[-1]) == {"filename": "прайс.xlsx", "products_count": 5}
+    assert list(iter_ndjson([], "пустой.xlsx")) == ['{"filename":"пустой.xlsx","products_count":0}\n'.encode("utf-8")]
+
+def test_stream_matches_json():
+    """Потоковый ответ содержит те же товары, что и обычный JSON"""
+    print("\n=== Тест потокового ответа API ===")
+
+    client = TestClient(app)
+    content = workbook_bytes({"Прайс": ROWS})
+    full = client.post("/parse-excel/", files={"file": ("прайс.xlsx", content)}).json()
+
+    for kwargs in ({"params": {"stream": 1}}, {"headers": {"Accept": "application/x-ndjson"}}):
+        response = client.post("/parse-excel/", files={"file": ("прайс.xlsx", content)}, **kwargs)
+        assert response.headers["content-type"] == "application/x-ndjson"
+        records = [json.loads(line) for line in response.text.splitlines()]
+        assert records[:-1] == full["products"]
+        assert records[-1] == {"filename": "прайс.xlsx", "products_count": full["products_count"]}
+    print(f"  товаров: {full['products_count']}")
+
+    # Ошибка чтения файла - до начала ответа, обычным кодом
+    response = client.post("/parse-excel/?stream=1", files={"file": ("битый.xlsx", b"not an excel file")})
+    assert response.status_code == 500
+
+if __name__ == "__main__":
+    test_ndjson_chunks()
+    test_stream_matches_json()
+    print("\n✓ Все тесты завершены")
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Тест мемоизации разбора повторяющихся ячеек
+"""
+
+import business_logic
+from business_logic import find_product_mapping, is_profnastil_product, parse_profnastil_price
+from name_parser import extract_individual_products, split_individual_products
+from parse_memo import get_memo_stats, reset_memos
+
+def test_hits_and_copies():
+    """Повторные вызовы берутся из кэша, изменение результата не портит кэш"""
+    print("=== Тест попаданий в кэш ===")
+
+    reset_memos()
+    for _ in range(3):
+        assert is_profnastil_product("Профнастил С-8")
+        prices = parse_profnastil_price("399оп//439гл")
+        names = extract_individual_products("Квинта+GL(1210,1150)/ Трамонтана S МП(1195,1155)")
+        prices[0]["price"] = 0
+        names.append("лишнее")
+
+    assert parse_profnastil_price("399оп//439гл")[0]["price"] == 399
+    assert extract_individual_products("Квинта+GL(1210,1150)/ Трамонтана S МП(1195,1155)") == \
+        split_individual_products("Квинта+GL(1210,1150)/ Трамонтана S МП(1195,1155)")
+
+    stats = get_memo_stats()
+    print(f"  попаданий: {stats['hits']}, промахов: {stats['misses']}")
+    assert stats["functions"]["is_profnastil_product"] == {"hits": 2, "misses": 1, "size": 1,
+                                                          "capacity": stats["capacity"]}
+    assert stats["functions"]["parse_profnastil_price"]["hits"] == 3
+    assert stats["functions"]["extract_individual_products"]["hits"] == 3
+
+def test_reset_with_reference_data():
+    """Смена справочников и clear_cache() сбрасывают кэш, устаревшие категории не возвращаются"""
+    print("\n=== Тест сброса вместе со справочниками ===")
+
+    original = business_logic.get_reference_snapshot()
+    try:
+        business_logic.set_reference_data({"Кредо GL": {"unit": "м2", "category_id": "1"}}, [])
+        assert find_product_mapping("Кредо GL(1190,1125)")["category_id"] == "1"
+        assert find_product_mapping("Кредо GL(1190,1125)")["category_id"] == "1"
+        assert get_memo_stats()["functions"]["find_product_mapping"]["hits"] == 1
+
+        business_logic.set_reference_data({"Кредо GL": {"unit": "м2", "category_id": "2"}}, [])
+        assert get_memo_stats()["hits"] == 0
+        assert find_product_mapping("Кредо GL(1190,1125)")["category_id"] == "2"
+
+        business_logic.clear_cache()
+        assert get_memo_stats()["functions"]["find_product_mapping"]["size"] == 0
+        print("  ✓ кэш сброшен")
+    finally:
+        business_logic.get_reference_cache().install(original)
+
+if __name__ == "__main__":
+    test_hits_and_copies()
+    test_reset_with_reference_data()
+    print("\n✓ Все тесты завершены")
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Тест выполнения конвейера разбора в пуле процессов
+"""
+
+import asyncio
+from pipeline import PipelineExecutor, PipelineError, PipelineBusyError, run_pipeline_records
+from workbook_fixtures import workbook_bytes
+
+ROWS = [["Кредо GL(1190,1125)", "м2", "399оп//439гл"], ["C10(1154,1100)sf", "м2", "362sf"]]
+
+def test_process_pool():
+    """Результат из рабочего процесса совпадает с разбором в текущем процессе"""
+    print("=== Тест разбора в пуле процессов ===")
+
+    content = workbook_bytes({"Металлочерепица": ROWS})
+    executor = PipelineExecutor(workers=1, max_concurrency=2)
+
+    async def scenario():
+        results = await asyncio.gather(*(executor.run(content) for _ in range(3)))
+        try:
+            await executor.run(b"not an excel file")
+            assert False, "ожидалась PipelineError"
+        except PipelineError as e:
+            print(f"  ✓ ошибка передана из процесса: {str(e)[:60]}")
+        return results
+
+    try:
+        results = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+
+    expected = run_pipeline_records(content)
+    print(f"  вариантов товаров: {len(expected)}")
+    assert expected and all(result == expected for result in results)
+
+def test_bounded_concurrency():
+    """Слоты заняты дольше queue_timeout - PipelineBusyError"""
+    print("\n=== Тест ограничения одновременных задач ===")
+
+    content = workbook_bytes({"Металлочерепица": ROWS * 5000})
+    executor = PipelineExecutor(workers=0, max_concurrency=1, queue_timeout=0.01)
+
+    async def busy():
+        running = asyncio.ensure_future(executor.run(content))
+        await asyncio.sleep(0)
+        try:
+            await executor.run(content)
+            raise AssertionError("ожидалась PipelineBusyError")
+        except PipelineBusyError as e:
+            print(f"  ✓ {e}")
+        return await running
+
+    try:
+        assert asyncio.run(busy()) == run_pipeline_records(content)
+    finally:
+        executor.shutdown()
+
+if __name__ == "__main__":
+    test_process_pool()
+    test_bounded_concurrency()
+    print("\n✓ Все тесты завершены")
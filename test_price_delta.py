@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Тест инкрементальной обработки новой версии прайса
+"""
+
+import os
+import tempfile
+from fastapi.testclient import TestClient
+import business_logic
+import main
+import price_delta
+from pipeline import get_pipeline_executor, run_pipeline
+from price_delta import PriceVersionNotFound, PriceVersionStore, compute_delta
+from workbook_fixtures import workbook_bytes
+
+ROWS_V1 = [
+    ["Кредо GL(1190,1125)", "м2", "399оп//439гл"],
+    ["Ламонтерра МП", "м2", "520"],
+    ["C10(1154,1100)sf", "м2", "362sf"],
+    ["Монтерроса S МП", "м2", "450"],
+    ["Монтерроса S МП", "м2", "470"],
+]
+
+
+def test_delta():
+    """Добавленные, удаленные и измененные строки; неизмененные не разбираются заново"""
+    print("=== Тест сравнения версий прайса ===")
+
+    rows_v2 = [list(row) for row in ROWS_V1]
+    rows_v2[1][2] = "540"                                  # изменена цена
+    del rows_v2[3]                                         # удален первый повтор названия
+    rows_v2.append(["Монтекристо S", "м2", "610"])         # добавлена строка
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = PriceVersionStore(os.path.join(directory, "versions.sqlite3"))
+        content_v1, content_v2 = workbook_bytes({"Прайс": ROWS_V1}), workbook_bytes({"Прайс": rows_v2})
+
+        first = compute_delta(content_v1, "прайс.xlsx", None, store)
+        print(f"  v1: строк {first['rows_count']}, добавлено вариантов {len(first['added'])}")
+        assert first["added"] == run_pipeline(content_v1)
+        assert first["rows_reprocessed"] == len(ROWS_V1)
+
+        second = compute_delta(content_v2, "прайс.xlsx", first["version_id"], store)
+        print(f"  v2: разобрано строк {second['rows_reprocessed']} из {second['rows_count']}")
+        assert second["previous_version_id"] == first["version_id"]
+        assert [change["name"] for change in second["changed"]] == ["Ламонтерра МП", "Монтерроса S МП"]
+        assert second["changed"][0]["after"][0]["base_price"] == 540
+        assert {variant["parsed_name"] for variant in second["added"]} == {"Монтекристо S"}
+        # Повторы названия сопоставляются по порядку: второй повтор исчез
+        assert {variant["base_price"] for variant in second["removed"]} == {470}
+        assert second["rows_reprocessed"] == 3
+
+        # Та же версия - изменений нет, ничего не разбирается
+        same = compute_delta(content_v2, "прайс.xlsx", second["version_id"], store)
+        assert same["rows_reprocessed"] == 0
+        assert not same["added"] and not same["removed"] and not same["changed"]
+        store.close()
+
+def test_reference_change_reprocesses():
+    """После смены справочников строки разбираются заново и сравниваются по результату"""
+    print("\n=== Тест смены справочников ===")
+
+    original = business_logic.get_reference_snapshot()
+    with tempfile.TemporaryDirectory() as directory:
+        store = PriceVersionStore(os.path.join(directory, "versions.sqlite3"))
+        content = workbook_bytes({"Прайс": ROWS_V1})
+        try:
+            first = compute_delta(content, "прайс.xlsx", None, store)
+            mapping = dict(original.product_mapping)
+            mapping["Ламонтерра МП"] = {"unit": "м2", "category_id": "9999"}
+            business_logic.set_reference_data(mapping, original.markup_rules)
+
+            second = compute_delta(content, "прайс.xlsx", first["version_id"], store)
+            assert second["rows_reprocessed"] == len(ROWS_V1)
+            assert [change["name"] for change in second["changed"]] == ["Ламонтерра МП"]
+            print(f"  изменено строк: {len(second['changed'])}")
+        finally:
+            business_logic.get_reference_cache().install(original)
+            store.close()
+
+        try:
+            compute_delta(content, "прайс.xlsx", "нет такой версии", PriceVersionStore(os.path.join(directory, "v.sqlite3")))
+            assert False, "ожидалась PriceVersionNotFound"
+        except PriceVersionNotFound as e:
+            print(f"  {e}")
+
+def test_endpoint_errors():
+    """Неизвестная версия - 404, прочие ошибки разбора (в том числе KeyError) - 500"""
+    print("\n=== Тест ошибок /parse-excel/delta ===")
+
+    client = TestClient(main.app)
+    upload = {"file": ("прайс.xlsx", workbook_bytes({"Прайс": ROWS_V1}))}
+    with tempfile.TemporaryDirectory() as directory:
+        saved_store, saved_build = price_delta._store, main.build_delta
+        price_delta._store = PriceVersionStore(os.path.join(directory, "versions.sqlite3"))
+        try:
+            response = client.post("/parse-excel/delta", files=upload, params={"previous_version": "нет такой версии"})
+            print(f"  {response.status_code}: {response.json()['detail']}")
+            assert response.status_code == 404
+
+            executor = get_pipeline_executor()
+            run_delta_rows, calls = executor.run_delta_rows, []
+
+            async def counted(*args):
+                calls.append(args)
+                return await run_delta_rows(*args)
+
+            executor.run_delta_rows = counted
+            try:
+                first = client.post("/parse-excel/delta", files=upload).json()
+            finally:
+                del executor.run_delta_rows
+            assert len(calls) == 1  # строки разобраны в пуле
+            expected = compute_delta(workbook_bytes({"Прайс": ROWS_V1}), "прайс.xlsx", None,
+                                     PriceVersionStore(os.path.join(directory, "expected.sqlite3")))
+            assert first["added"] == expected["added"] and first["rows_count"] == expected["rows_count"]
+            response = client.post("/parse-excel/delta", files=upload, params={"previous_version": first["version_id"]})
+            assert response.status_code == 200 and response.json()["rows_reprocessed"] == 0
+
+            def broken(*args):
+                raise KeyError("category_id")
+
+            main.build_delta = broken
+            response = client.post("/parse-excel/delta", files=upload, params={"previous_version": first["version_id"]})
+            assert response.status_code == 500
+        finally:
+            main.build_delta = saved_build
+            price_delta._store.close()
+            price_delta._store = saved_store
+
+if __name__ == "__main__":
+    test_delta()
+    test_reference_change_reprocesses()
+    test_endpoint_errors()
+    print("\n✓ Все тесты завершены")
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Тест генератора синтетических прайсов
+"""
+
+from excel_parser import parse_excel_file
+from price_list_generator import build_workbook, generate_price_list
+from price_parser import parse_excel_rows
+
+def test_deterministic_content():
+    """Одинаковые параметры - одинаковое содержимое; листы и строки заданного размера"""
+    print("=== Тест генератора прайсов ===")
+
+    price_list = generate_price_list(sheets=3, rows=500, seed=1)
+    assert price_list == generate_price_list(sheets=3, rows=500, seed=1)
+    assert price_list != generate_price_list(sheets=3, rows=500, seed=2)
+    assert len(price_list) == 3 and all(len(rows) == 500 for rows in price_list.values())
+
+    cells = [row[2] for rows in price_list.values() for row in rows]
+    names = [row[0] for rows in price_list.values() for row in rows]
+    assert "-" in cells and any("оп//" in cell for cell in cells) and any(cell.endswith("sf") for cell in cells)
+    assert any("/ " in name for name in names)
+    print(f"  листы: {list(price_list)}")
+
+def test_workbook_parses():
+    """Книга читается парсером, в ней есть и профнастил, и обычные товары"""
+    print("\n=== Тест разбора сгенерированной книги ===")
+
+    price_list = generate_price_list(sheets=2, rows=300, seed=3)
+    excel_data = parse_excel_file(build_workbook(price_list))
+    assert list(excel_data) == list(price_list)
+
+    products = parse_excel_rows(excel_data)
+    print(f"  товаров: {len(products)}")
+    assert any("thickness" in product for product in products)
+    assert any("thickness" not in product for product in products)
+
+if __name__ == "__main__":
+    test_deterministic_content()
+    test_workbook_parses()
+    print("\n✓ Все тесты завершены")
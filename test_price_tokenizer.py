@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Тест токенизатора ячеек цен
+"""
+
+from price_tokenizer import tokenize_price_cell, SEP_NONE, SEP_SINGLE, SEP_DOUBLE
+from price_parser import parse_prices
+from business_logic import parse_profnastil_price
+
+def test_tokens():
+    """Токены: цена, бренд и вид разделителя"""
+    print("=== Тест токенизатора цен ===")
+
+    cell = tokenize_price_cell("399оп//439гл/421мп")
+    for token in cell.tokens:
+        print(f"  - {token.price} руб, бренд: {token.brand}, разделитель: '{token.separator}'")
+
+    assert [(t.price, t.brand, t.separator) for t in cell.tokens] == [
+        (399, "оп", SEP_NONE), (439, "гл", SEP_DOUBLE), (421, "мп", SEP_SINGLE)
+    ]
+    assert cell.has_brand_suffix and cell.first_number == 399
+
+def test_classification():
+    """Признаки строки, которые раньше проверялись отдельными регулярками"""
+    print("\n=== Тест классификации ячеек ===")
+
+    cases = {
+        "362sf": (True, True, 362),
+        "1 234": (True, False, 1),
+        "362 sf": (True, False, 362),
+        "362SF": (True, False, 362),
+        "от 362sf": (True, True, 362),
+        "-": (False, False, None),
+    }
+    for price, expected in cases.items():
+        cell = tokenize_price_cell(price)
+        actual = (cell.has_digit, cell.has_brand_suffix, cell.first_number)
+        print(f"  '{price}': цифры={actual[0]}, бренд={actual[1]}, первое число={actual[2]}")
+        assert actual == expected, price
+
+def test_spaced_brand():
+    """Бренд через пробел учитывается только для профнастила"""
+    print("\n=== Тест бренда через пробел ===")
+
+    assert parse_prices("362 sf") == [{"price": 362, "brand": None}]
+    assert parse_profnastil_price("362 sf")[0]["brand"] == "sf"
+    assert parse_prices("///400гл") == [{"price": 400, "brand": "гл"}]
+    assert parse_prices("от 362sf") == []
+
+if __name__ == "__main__":
+    test_tokens()
+    test_classification()
+    test_spaced_brand()
+    print("\n✓ Все тесты завершены")
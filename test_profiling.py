@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Тест профилирования разбора по запросу администратора
+"""
+
+import pstats
+import tempfile
+from fastapi.testclient import TestClient
+import main
+import profiling
+from pipeline import run_pipeline_records
+from profiling import ProfileStore, format_report, profile_pipeline
+from records import record_to_dict
+from workbook_fixtures import workbook_bytes
+
+ROWS = [["Кредо GL(1190,1125)", "м2", "399оп//439гл"], ["Профнастил С-8", "м2", "362 sf"]] * 20
+
+def test_profile_report():
+    """Отчет содержит функции модулей разбора и профиль памяти, результат не меняется"""
+    print("=== Тест отчета профилирования ===")
+
+    content = workbook_bytes({"Прайс": ROWS})
+    products, report, stats = profile_pipeline(content)
+    print(format_report(report))
+
+    assert products == run_pipeline_records(content)
+    assert report["products_count"] == len(products)
+    functions = [item["function"] for item in report["functions"]]
+    assert "business_logic.iter_variant_records" in functions
+    assert "excel_parser.iter_excel_rows" in functions
+    assert all(name.split(".")[0] in profiling.PROFILE_MODULES for name in functions)
+    cumulative = [item["cumulative_seconds"] for item in report["functions"]]
+    assert cumulative == sorted(cumulative, reverse=True)
+    assert report["memory"]["peak_mb"] > 0 and report["memory"]["top_allocations"]
+    assert isinstance(stats, pstats.Stats)
+
+    _, report, _ = profile_pipeline(content, memory=False)
+    assert report["memory"] is None
+
+def test_profile_store():
+    """Хранятся последние keep отчетов вместе с дампами pstats"""
+    print("\n=== Тест хранилища отчетов ===")
+
+    _, report, stats = profile_pipeline(workbook_bytes({"Прайс": ROWS}), memory=False)
+    with tempfile.TemporaryDirectory() as directory:
+        store = ProfileStore(directory, keep=2)
+        ids = [store.save(dict(report, filename=f"прайс{i}.xlsx"), stats) for i in range(3)]
+        listed = store.list()
+        print(f"  отчеты: {[item['profile_id'] for item in listed]}")
+        assert [item["profile_id"] for item in listed] == sorted(ids[1:], reverse=True)
+        assert store.load(ids[0]) is None
+        assert store.load(ids[2])["filename"] == "прайс2.xlsx"
+        pstats.Stats(store.pstats_path(ids[2]))  # дамп читается стандартным pstats
+
+def test_profile_endpoint():
+    """?profile=1 доступен только администратору; отчет возвращается и сохраняется"""
+    print("\n=== Тест ?profile=1 ===")
+
+    client = TestClient(main.app)
+    content = workbook_bytes({"Прайс": ROWS})
+    files = {"file": ("прайс.xlsx", content)}
+    saved_token, saved_store = main.ADMIN_TOKEN, profiling.profile_store
+    with tempfile.TemporaryDirectory() as directory:
+        main.ADMIN_TOKEN = "test-token"
+        profiling.profile_store = ProfileStore(directory)
+        headers = {"X-Admin-Token": main.ADMIN_TOKEN}
+        try:
+            assert client.post("/parse-excel/?profile=1", files=files).status_code == 403
+
+            response = client.post("/parse-excel/?profile=1", files=files, headers=headers)
+            assert response.status_code == 200
+            body = response.json()
+            profile_id = response.headers["x-profile-id"]
+            print(f"  профиль {profile_id}: {body['profile']['seconds']} с")
+            assert body["products"] == [record_to_dict(variant) for variant in run_pipeline_records(content)]
+            assert body["profile"]["profile_id"] == profile_id
+
+            assert client.get(f"/admin/profiles/{profile_id}", headers=headers).json() == body["profile"]
+            text = client.get(f"/admin/profiles/{profile_id}?format=text", headers=headers).text
+            assert "business_logic.iter_variant_records" in text
+            dump = client.get(f"/admin/profiles/{profile_id}/pstats", headers=headers)
+            assert dump.status_code == 200 and dump.content
+            assert client.get("/admin/profiles", headers=headers).json()[0]["profile_id"] == profile_id
+            assert client.get("/admin/profiles/нет", headers=headers).status_code == 404
+        finally:
+            main.ADMIN_TOKEN, profiling.profile_store = saved_token, saved_store
+
+if __name__ == "__main__":
+    test_profile_report()
+    test_profile_store()
+    test_profile_endpoint()
+    print("\n✓ Все тесты завершены")
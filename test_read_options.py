@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Тест выбора листов и столбцов при чтении: параметры запроса, поиск строки
+заголовка, одинаковый результат движков и эндпоинт /parse-excel/
+"""
+
+from fastapi.testclient import TestClient
+from excel_parser import (ReadOptions, ReadOptionsError, column_index, find_header, iter_excel_rows,
+                          parse_read_options, select_sheets)
+from pipeline import run_pipeline_records
+from records import record_to_dict
+from main import app
+from workbook_fixtures import workbook_bytes
+
+SHEETS = {
+    # Лист с шапкой и лишними столбцами и листы в обычном формате
+    "Прайс": [
+        ["ООО Ромашка, прайс на 01.09"],
+        [],
+        ["№", "Наименование", "Артикул", "Ед. изм.", "Цена, руб.", "Примечание"],
+        [1, "Профнастил С-8", "P-8", "м2", "362 sf", "под заказ"],
+        [2, "Кредо GL(1190,1125)", "K-1", "м2", "399оп//439гл", ""],
+    ],
+    "Склад Киров": [["Ламонтерра МП", "м2", "520"]],
+    "Архив": [["Саморез", "шт", "5"]],
+}
+
+def names(content: bytes, engine: str = "streaming", **kwargs):
+    return [record_to_dict(variant)["original_name"] for variant in run_pipeline_records(content, engine, **kwargs)]
+
+def test_parse_options():
+    """Буквы и номера столбцов, листы по имени, маске и индексу"""
+    print("=== Тест параметров чтения ===")
+
+    assert column_index("A") == 0 and column_index("f") == 5 and column_index("AB") == 27
+    assert column_index("3") == 2
+    for bad in ("0", "A1", ""):
+        try:
+            column_index(bad)
+            assert False, f"ожидалась ReadOptionsError для {bad!r}"
+        except ReadOptionsError:
+            pass
+
+    assert parse_read_options() is None
+    assert parse_read_options(["Прайс"], "B,D,E") == ReadOptions(("Прайс",), (1, 3, 4), False)
+    assert parse_read_options(None, "B,,E", True).columns == (1, -1, 4)
+    for bad in ("A,B", ",B,C"):
+        try:
+            parse_read_options(None, bad)
+            assert False, f"ожидалась ReadOptionsError для {bad!r}"
+        except ReadOptionsError as e:
+            print(f"  {bad}: {e}")
+
+    sheet_names = ["Прайс", "Склад Киров", "Склад Пенза", "Архив"]
+    assert select_sheets(sheet_names, ["Склад*"]) == ["Склад Киров", "Склад Пенза"]
+    assert select_sheets(sheet_names, ["-1", "Прайс", "0"]) == ["Прайс", "Архив"]
+    try:
+        select_sheets(sheet_names, ["Итоги"])
+        assert False, "ожидалась ReadOptionsError"
+    except ReadOptionsError as e:
+        print(f"  {e}")
+
+def test_find_header():
+    """Строка заголовка: название и цена обязательны, единица - если есть"""
+    print("\n=== Тест поиска строки заголовка ===")
+
+    rows = [["Прайс"], [None], ["№", "Наименование", "Ед. изм.", "Цена, руб."]]
+    assert find_header(rows) == (2, (1, 2, 3))
+    assert find_header([["Товар", "Стоимость"]]) == (0, (0, -1, 1))
+    assert find_header([["Профнастил С-8", "м2", "362"]]) is None
+
+def test_projected_rows():
+    """Только выбранные листы, строки из трех столбцов после заголовка; движки совпадают"""
+    print("\n=== Тест чтения выбранных листов и столбцов ===")
+
+    content = workbook_bytes(SHEETS)
+    rows = list(iter_excel_rows(content, options=ReadOptions(("Прайс",), None, True)))
+    print(f"  {rows}")
+    assert rows == [("Прайс", ["Профнастил С-8", "м2", "362 sf"]),
+                    ("Прайс", ["Кредо GL(1190,1125)", "м2", "399оп//439гл"])]
+
+    rows = list(iter_excel_rows(content, options=ReadOptions(("Склад*",), None, False)))
+    assert rows == [("Склад Киров", ["Ламонтерра МП", "м2", "520"])]
+
+    for options in (ReadOptions(("0",), (1, 3, 4), False), ReadOptions(None, None, True),
+                    ReadOptions(("1", "Архив"), None, False)):
+        streaming = [record_to_dict(v) for v in run_pipeline_records(content, "streaming", options=options)]
+        columnar = [record_to_dict(v) for v in run_pipeline_records(content, "columnar", options=options)]
+        print(f"  {options}: вариантов {len(streaming)}")
+        assert streaming == columnar and streaming
+
+    assert names(content, options=ReadOptions(None, None, True)) == \
+        names(content, options=ReadOptions(("Прайс",), None, True)) + names(content, sheets=["Склад Киров", "Архив"])
+
+def test_endpoint():
+    """Параметры sheet, columns, header в /parse-excel/; ошибки параметров - 400"""
+    print("\n=== Тест /parse-excel/ с выбором листов и столбцов ===")
+
+    client = TestClient(app)
+    content = workbook_bytes(SHEETS)
+    upload = {"file": ("прайс.xlsx", content)}
+
+    result = client.post("/parse-excel/", files=upload,
+                         params={"sheet": "Прайс", "columns": "B,D,E", "header": 1}).json()
+    assert {p["original_name"] for p in result["products"]} == {"Профнастил С-8", "Кредо GL(1190,1125)"}
+
+    result = client.post("/parse-excel/", files=upload, params=[("sheet", "Склад*"), ("sheet", "-1")]).json()
+    assert {p["sheet"] for p in result["products"]} <= {"Склад Киров", "Архив"}
+    assert result["products"] == [record_to_dict(v) for v in
+                                  run_pipeline_records(content, sheets=["Склад Киров", "Архив"])]
+
+    parallel = client.post("/parse-excel/", files=upload,
+                           params={"sheet": "Прайс", "header": 1, "sheet_parallel": 1}).json()
+    assert [timing["sheet"] for timing in parallel["sheet_timings"]] == ["Прайс"]
+
+    response = client.post("/parse-excel/", files=upload, params={"sheet": "Итоги"})
+    print(f"  {response.status_code}: {response.json()['detail']}")
+    assert response.status_code == 400
+    assert client.post("/parse-excel/", files=upload, params={"columns": "A,B"}).status_code == 400
+
+if __name__ == "__main__":
+    test_parse_options()
+    test_find_header()
+    test_projected_rows()
+    test_endpoint()
+    print("\n✓ Все тесты завершены")
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Тест компактных записей конвейера: словари на границе API совпадают с прежними
+"""
+
+import json
+import pickle
+from records import ParsedProduct, record_to_dict
+from pipeline import run_pipeline, run_pipeline_records
+from price_parser import iter_product_records, parse_excel_rows
+from serialization import encode_result_tail, render_json
+from workbook_fixtures import workbook_bytes
+
+ROWS = [
+    ["Кредо GL(1190,1125)", "м2", "399оп//439гл"],
+    ["C10(1154,1100)sf", "м2", "362sf"],
+    ["Монтерроса S МП", "м2", "450"],
+    ["Профнастил С-8", "м2", "362 sf"],
+]
+
+def test_products_and_variants():
+    """Записи переводятся в те же словари (ключи и порядок), что и прежний разбор"""
+    print("=== Тест записей товаров и вариантов ===")
+
+    data = {"Прайс": ROWS}
+    products = list(iter_product_records(data))
+    assert [product.to_dict() for product in products] == parse_excel_rows(data)
+    for product in parse_excel_rows(data):
+        assert list(ParsedProduct.from_dict(product).to_dict()) == list(product)
+
+    content = workbook_bytes({"Прайс": ROWS})
+    records = run_pipeline_records(content)
+    expected = run_pipeline(content)
+    converted = [record_to_dict(record) for record in records]
+    assert converted == expected
+    assert [list(variant) for variant in converted] == [list(variant) for variant in expected]
+    print(f"  вариантов: {len(records)}")
+
+    # Варианты одного товара ссылаются на одну запись товара
+    assert records[0].product is records[1].product
+    assert pickle.loads(pickle.dumps(records)) == records
+
+def test_serialization():
+    """Тело ответа из записей совпадает с сериализацией словарей"""
+    print("\n=== Тест сериализации записей ===")
+
+    content = workbook_bytes({"Прайс": ROWS})
+    records = run_pipeline_records(content)
+    expected = render_json({"products_count": len(records), "products": run_pipeline(content)})[1:]
+    assert encode_result_tail({"products_count": len(records), "products": records}) == expected
+    assert json.loads(b"{" + expected)["products_count"] == len(records)
+    print("  ✓ совпадает")
+
+if __name__ == "__main__":
+    test_products_and_variants()
+    test_serialization()
+    print("\n✓ Все тесты завершены")
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Тест кэша справочников: фоновое обновление по TTL, резервные данные,
+подписчики, принудительная перезагрузка и административные эндпоинты
+"""
+
+import threading
+import time
+from fastapi.testclient import TestClient
+import business_logic
+import main
+from business_logic import build_reference_snapshot
+from reference_cache import ReferenceDataCache, ReferenceSnapshot
+
+def make_snapshot(version: str, db_version: str = None, is_fallback: bool = False) -> ReferenceSnapshot:
+    return ReferenceSnapshot({}, [], version, db_version, is_fallback)
+
+class FakeLoader:
+    """
+    Загрузчик снимков по очереди; загрузку с номером из blocked
+    задерживает до release()
+    """
+
+    def __init__(self, *snapshots: ReferenceSnapshot, blocked=()):
+        self.snapshots = list(snapshots)
+        self.blocked = set(blocked)
+        self.calls = 0
+        self.started = threading.Event()
+        self.released = threading.Event()
+
+    def __call__(self) -> ReferenceSnapshot:
+        self.calls += 1
+        if self.calls in self.blocked:
+            self.started.set()
+            assert self.released.wait(5), "загрузка не была отпущена"
+        return self.snapshots.pop(0)
+
+    def release(self):
+        self.released.set()
+
+def wait_until(predicate, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "условие не выполнилось"
+        time.sleep(0.01)
+
+def refresh_done(cache: ReferenceDataCache):
+    wait_until(lambda: not cache._refreshing)
+
+def test_background_refresh():
+    """По истечении TTL снимок обновляется в фоне, до этого отдается прежний"""
+    print("=== Тест фонового обновления по TTL ===")
+
+    loader = FakeLoader(make_snapshot("v1", "db-1"), make_snapshot("v2", "db-2"), blocked={2})
+    cache = ReferenceDataCache(loader, lambda: "db-2", ttl=0.05, retry_ttl=0.05)
+    first = cache.get()
+    assert first.version == "v1" and loader.calls == 1
+
+    time.sleep(0.06)
+    assert cache.get() is first  # TTL истек: фоновая загрузка, ответ - прежний снимок
+    assert loader.started.wait(5)
+    for _ in range(3):
+        assert cache.get() is first  # пока новый снимок не готов
+    assert cache.background_refreshes == 1
+
+    loader.release()
+    wait_until(lambda: cache.peek().version == "v2")
+    refresh_done(cache)
+    print(f"  {cache.get_stats()}")
+    assert cache.get().version == "v2" and loader.calls == 2
+
+def test_unchanged_db_extends_snapshot():
+    """Версия в БД не изменилась - снимок не перезагружается, срок жизни продлевается"""
+    print("\n=== Тест неизменной версии БД ===")
+
+    loader = FakeLoader(make_snapshot("v1", "db-1"))
+    cache = ReferenceDataCache(loader, lambda: "db-1", ttl=0.05)
+    first = cache.get()
+    checked_at = first.checked_at
+    time.sleep(0.06)
+    cache.get()
+    refresh_done(cache)
+    assert loader.calls == 1 and cache.peek() is first and first.checked_at > checked_at
+
+def test_fallback_keeps_db_snapshot():
+    """Резервные данные не вытесняют снимок, загруженный из БД"""
+    print("\n=== Тест резервной загрузки ===")
+
+    loader = FakeLoader(make_snapshot("v1", "db-1"), make_snapshot("fallback", is_fallback=True))
+    cache = ReferenceDataCache(loader, lambda: None, ttl=0.05)
+    first = cache.get()
+    checked_at = first.checked_at
+    time.sleep(0.06)
+    cache.get()
+    wait_until(lambda: loader.calls == 2)
+    refresh_done(cache)
+    assert cache.peek() is first and first.checked_at > checked_at
+
+def test_retry_ttl_for_fallback():
+    """Резервный снимок перепроверяется через retry_ttl, а не через ttl"""
+    print("\n=== Тест повторной попытки после резервной загрузки ===")
+
+    loader = FakeLoader(make_snapshot("fallback", is_fallback=True), make_snapshot("v1", "db-1"),
+                        make_snapshot("v2", "db-2"))
+    cache = ReferenceDataCache(loader, lambda: "db-1", ttl=3600, retry_ttl=0.05)
+    assert cache.get().is_fallback
+    time.sleep(0.06)
+    cache.get()
+    wait_until(lambda: cache.peek().version == "v1")
+    refresh_done(cache)
+
+    # Снимок из БД живет ttl: та же пауза обновления не вызывает
+    time.sleep(0.06)
+    cache.get()
+    assert not cache._refreshing and loader.calls == 2
+
+def test_listeners():
+    """Подписчики получают новый снимок при смене версии и None при сбросе"""
+    print("\n=== Тест подписчиков ===")
+
+    loader = FakeLoader(make_snapshot("v1"), make_snapshot("v1"), make_snapshot("v2"))
+    cache = ReferenceDataCache(loader, lambda: None)
+    events = []
+    cache.add_listener(lambda snapshot: events.append(snapshot.version if snapshot else None))
+    cache.add_listener(lambda snapshot: 1 / 0)  # ошибка подписчика не мешает остальным
+
+    cache.get()
+    cache.refresh()  # та же версия - без уведомления
+    cache.refresh()
+    cache.install(make_snapshot("v3"))
+    cache.invalidate()
+    print(f"  {events}")
+    assert events == ["v1", "v2", "v3", None]
+    assert cache.peek() is None
+
+def test_refresh_is_atomic():
+    """refresh() строит снимок полностью; до подмены запросы получают прежний"""
+    print("\n=== Тест принудительной перезагрузки ===")
+
+    loader = FakeLoader(make_snapshot("v1"), make_snapshot("v2"), blocked={2})
+    cache = ReferenceDataCache(loader, lambda: None)
+    first = cache.get()
+
+    results = []
+    thread = threading.Thread(target=lambda: results.append(cache.refresh()))
+    thread.start()
+    assert loader.started.wait(5)
+    assert cache.get() is first and cache.peek() is first
+
+    loader.release()
+    thread.join(5)
+    assert results[0].version == "v2" and cache.get() is results[0]
+
+def test_admin_endpoints():
+    """Эндпоинты справочников требуют X-Admin-Token"""
+    print("\n=== Тест /admin/reference-data ===")
+
+    client = TestClient(main.app)
+    cache = business_logic.get_reference_cache()
+    refreshed = build_reference_snapshot(business_logic.FALLBACK_PRODUCT_MAPPING,
+                                         business_logic.FALLBACK_MARKUP_RULES[:-1])
+    saved_token, saved_loader, saved_snapshot = main.ADMIN_TOKEN, cache._load_snapshot, cache.get()
+    try:
+        main.ADMIN_TOKEN = "test-token"
+        cache._load_snapshot = lambda: refreshed
+        headers = {"X-Admin-Token": main.ADMIN_TOKEN}
+
+        assert client.get("/admin/reference-data").status_code == 403
+        assert client.post("/admin/reference-data/refresh").status_code == 403
+        assert client.get("/admin/reference-data", headers={"X-Admin-Token": "wrong"}).status_code == 403
+        assert cache.peek() is saved_snapshot
+
+        status = client.get("/admin/reference-data", headers=headers)
+        assert status.status_code == 200 and status.json()["version"] == saved_snapshot.version
+
+        response = client.post("/admin/reference-data/refresh", headers=headers)
+        print(f"  {response.status_code}: {response.json()}")
+        assert response.status_code == 200 and response.json()["version"] == refreshed.version
+        assert business_logic.get_reference_snapshot() is refreshed
+    finally:
+        main.ADMIN_TOKEN, cache._load_snapshot = saved_token, saved_loader
+        cache.install(saved_snapshot)
+
+if __name__ == "__main__":
+    test_background_refresh()
+    test_unchanged_db_extends_snapshot()
+    test_fallback_keeps_db_snapshot()
+    test_retry_ttl_for_fallback()
+    test_listeners()
+    test_refresh_is_atomic()
+    test_admin_endpoints()
+    print("\n✓ Все тесты завершены")
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Тест кэша результатов разбора
+"""
+
+import os
+import tempfile
+import time
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+import business_logic
+from main import app
+from pipeline import get_pipeline_executor
+from result_cache import ResultCache, make_cache_key, get_result_cache
+from serialization import build_result_body, encode_result_tail
+from workbook_fixtures import workbook_bytes
+
+def test_body_matches_json_response():
+    """Тело из кэшированной части совпадает с JSONResponse побайтно"""
+    print("=== Тест сборки тела ответа ===")
+
+    products = [{"parsed_name": "Кредо GL", "price": 399, "brand": None, "markup": 7.5}]
+    tail = encode_result_tail({"products_count": 1, "products": products})
+    for filename in ("прайс.xlsx", 'кавычки "и" \\слеши.xlsx'):
+        expected = JSONResponse(content=jsonable_encoder({
+            "filename": filename, "products_count": 1, "products": products
+        })).body
+        assert build_result_body(filename, tail) == expected
+    print("  ✓ совпадает")
+
+def test_memory_lru():
+    """Вытеснение по суммарному размеру, давно не использованные - первыми"""
+    print("\n=== Тест LRU в памяти ===")
+
+    cache = ResultCache(memory_limit=30, directory="")
+    cache.put("v-a", b"x" * 10)
+    cache.put("v-b", b"x" * 10)
+    cache.put("v-c", b"x" * 10)
+    assert cache.get("v-a") is not None  # "a" становится самым свежим
+    cache.put("v-d", b"x" * 10)
+
+    stats = cache.get_stats()
+    print(f"  {stats}")
+    assert cache.get("v-b") is None and cache.get("v-a") is not None
+    assert stats["memory_bytes"] == 30 and stats["evictions"] == 1
+
+def test_disk_tier():
+    """Диск переживает пересоздание кэша и вытесняет записи по размеру"""
+    print("\n=== Тест дискового уровня ===")
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = ResultCache(memory_limit=1000, directory=directory, disk_limit=25)
+        cache.put("v1-a", b"a" * 10)
+        time.sleep(0.01)
+        cache.put("v1-b", b"b" * 10)
+
+        restarted = ResultCache(memory_limit=1000, directory=directory, disk_limit=25)
+        assert restarted.get("v1-a") == b"a" * 10
+        assert restarted.get_stats()["disk_hits"] == 1
+
+        time.sleep(0.01)
+        restarted.put("v1-c", b"c" * 10)  # вытесняется "b": к "a" только что обращались
+        names = sorted(os.listdir(directory))
+        print(f"  файлы: {names}")
+        assert names == ["v1-a.json", "v1-c.json"]
+
+        restarted.invalidate(keep_version="v2")
+        assert os.listdir(directory) == [] and restarted.get("v1-a") is None
+
+def test_invalidation_on_reference_change():
+    """Смена справочников и clear_cache() удаляют записи прежней версии"""
+    print("\n=== Тест сброса при смене справочников ===")
+
+    cache = get_result_cache()
+    original = business_logic.get_reference_snapshot()
+    try:
+        snapshot = business_logic.set_reference_data({"Кредо GL": {"unit": "м2", "category_id": "1"}}, [])
+        key = make_cache_key("abc", snapshot.version, engine="streaming")
+        cache.put(key, b"{}")
+        assert cache.get(key) == b"{}"
+
+        changed = business_logic.set_reference_data({"Кредо GL": {"unit": "м2", "category_id": "2"}}, [])
+        assert changed.version != snapshot.version
+        assert cache.get(key) is None
+
+        cache.put(key, b"{}")
+        business_logic.clear_cache()
+        assert cache.get(key) is None
+        print("  ✓ записи сброшены")
+    finally:
+        business_logic.get_reference_cache().install(original)
+
+def test_stale_worker_not_cached():
+    """Результат рабочего процесса на прежней версии справочников не кэшируется"""
+    print("\n=== Тест рабочего процесса на старом снимке ===")
+
+    upload = {"file": ("прайс.xlsx", workbook_bytes({"Прайс": [["Профнастил С-8", "м2", "362 sf"]]}))}
+
+    client = TestClient(app)
+    executor = get_pipeline_executor()
+    run_versioned = executor.run_versioned
+    worker_version = "stale"
+
+    async def versioned(*args, **kwargs):
+        products, version = await run_versioned(*args, **kwargs)
+        assert version == business_logic.get_reference_snapshot().version
+        return products, worker_version or version
+
+    stores = get_result_cache().stores
+    get_result_cache().invalidate()
+    executor.run_versioned = versioned
+    try:
+        responses = [client.post("/parse-excel/", files=upload) for _ in range(2)]
+        assert [r.headers["X-Result-Cache"] for r in responses] == ["miss", "miss"]
+        assert get_result_cache().stores == stores
+
+        worker_version = None
+        responses = [client.post("/parse-excel/", files=upload) for _ in range(2)]
+        print(f"  {[r.headers['X-Result-Cache'] for r in responses]}")
+        assert [r.headers["X-Result-Cache"] for r in responses] == ["miss", "hit"]
+    finally:
+        del executor.run_versioned
+
+def test_sheet_parallel_stores_products():
+    """Товары разбора по листам кэшируются: следующий обычный запрос - из кэша"""
+    print("\n=== Тест кэширования разбора по листам ===")
+
+    client = TestClient(app)
+    upload = {"file": ("прайс.xlsx", workbook_bytes({"Прайс": [["Кредо GL(1190,1125)", "м2", "399оп//439гл"]]}))}
+    get_result_cache().invalidate()
+    parallel = client.post("/parse-excel/", files=upload, params={"sheet_parallel": 1})
+    assert "sheet_timings" in parallel.json()
+    response = client.post("/parse-excel/", files=upload, params={"sheet_parallel": 0})
+    assert response.headers["X-Result-Cache"] == "hit"
+    assert response.json()["products"] == parallel.json()["products"]
+
+if __name__ == "__main__":
+    test_body_matches_json_response()
+    test_memory_lru()
+    test_disk_tier()
+    test_invalidation_on_reference_change()
+    test_stale_worker_not_cached()
+    test_sheet_parallel_stores_products()
+    print("\n✓ Все тесты завершены")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Тест параллельного разбора листов книги
+"""
+
+import asyncio
+import business_logic
+import pipeline
+from excel_parser import list_sheet_names, iter_excel_rows
+from pipeline import PipelineExecutor, run_pipeline, run_pipeline_records
+from workbook_fixtures import workbook_bytes
+
+SHEETS = {
+    "Металлочерепица": [["Кредо GL(1190,1125)", "м2", "399оп//439гл"], ["Ламонтерра МП", "м2", "520"]],
+    "Профнастил": [["C10(1154,1100)sf", "м2", "362sf"], ["С-20", "м2", "410гл/395мп"]],
+    "Пустой": [],
+    "Доборные": [["Планка конька", "шт", "250"]],
+}
+
+def test_sheet_filter():
+    """Чтение только выбранных листов"""
+    print("=== Тест выбора листов ===")
+
+    content = workbook_bytes(SHEETS)
+    assert list_sheet_names(content) == ["Металлочерепица", "Профнастил", "Пустой", "Доборные"]
+    sheets = {sheet for sheet, _ in iter_excel_rows(content, ["Доборные", "Профнастил"])}
+    assert sheets == {"Доборные", "Профнастил"}
+
+    for engine in ("streaming", "columnar"):
+        products = run_pipeline(content, engine, ["Профнастил"])
+        print(f"  {engine}: {len(products)} вариантов с листа 'Профнастил'")
+        assert products and {product["sheet"] for product in products} == {"Профнастил"}
+
+def test_run_by_sheet():
+    """Результат совпадает с последовательным разбором, время - по каждому листу"""
+    print("\n=== Тест параллельного разбора листов ===")
+
+    content = workbook_bytes(SHEETS)
+    executor = PipelineExecutor(workers=0, max_concurrency=4)
+    try:
+        products, timings, version = asyncio.run(executor.run_by_sheet(content))
+    finally:
+        executor.shutdown()
+
+    for timing in timings:
+        print(f"  {timing['sheet']}: {timing['products_count']} вариантов за {timing['seconds']} сек.")
+    assert products == run_pipeline_records(content)
+    assert [timing["sheet"] for timing in timings] == list_sheet_names(content)
+    assert sum(timing["products_count"] for timing in timings) == len(products)
+    assert version == business_logic.get_reference_snapshot().version
+
+def test_one_snapshot_per_file():
+    """Справочники обновились во время разбора - все листы разобраны на прежнем снимке"""
+    print("\n=== Тест одного снимка справочников на файл ===")
+
+    content = workbook_bytes(SHEETS)
+    original = business_logic.get_reference_snapshot()
+    updated = business_logic.build_reference_snapshot(business_logic.FALLBACK_PRODUCT_MAPPING, [])
+    run_sheet = pipeline._run_sheet_in_worker
+
+    def refresh_then_run(*args):
+        business_logic.get_reference_cache().install(updated)
+        return run_sheet(*args)
+
+    executor = PipelineExecutor(workers=0, max_concurrency=4)
+    pipeline._run_sheet_in_worker = refresh_then_run
+    try:
+        products, _, version = asyncio.run(executor.run_by_sheet(content))
+        assert business_logic.get_reference_snapshot() is updated
+    finally:
+        pipeline._run_sheet_in_worker = run_sheet
+        business_logic.get_reference_cache().install(original)
+        executor.shutdown()
+
+    print(f"  версия {version}, вариантов {len(products)}")
+    assert version == original.version
+    with business_logic.pinned_reference_snapshot(updated):
+        assert run_pipeline_records(content) != products  # без наценок вариантов меньше
+    assert products == run_pipeline_records(content)
+
+if __name__ == "__main__":
+    test_sheet_filter()
+    test_run_by_sheet()
+    test_one_snapshot_per_file()
+    print("\n✓ Все тесты завершены")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Тест приема загрузок: перенос на диск, ограничение размера, удаление временных файлов
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi.testclient import TestClient
+import uploads
+from uploads import UploadSizeLimitMiddleware, copy_to_disk
+from excel_parser import iter_excel_rows
+import main
+from workbook_fixtures import workbook_bytes
+
+ROWS = [["Кредо GL(1190,1125)", "м2", "399оп//439гл"]]
+
+def test_copy_to_disk():
+    """Копирование порциями с подсчетом размера и хэша; парсер читает файл по пути"""
+    print("=== Тест переноса загрузки на диск ===")
+
+    content = workbook_bytes({"Прайс": ROWS})
+    upload = copy_to_disk(io.BytesIO(content), ".xlsx")
+    try:
+        print(f"  {upload.path}: {upload.size} байт")
+        assert upload.size == len(content)
+        assert upload.sha256 == hashlib.sha256(content).hexdigest()
+        assert list(iter_excel_rows(upload.path)) == list(iter_excel_rows(content))
+    finally:
+        upload.remove()
+    assert not os.path.exists(upload.path)
+
+    try:
+        copy_to_disk(io.BytesIO(content), ".xlsx", max_size=100)
+        assert False, "ожидалась ошибка 413"
+    except HTTPException as e:
+        print(f"  ✓ {e.status_code}: {e.detail}")
+        assert e.status_code == 413
+
+def test_size_limit_middleware():
+    """Лимит по Content-Length и по фактически полученному телу"""
+    print("\n=== Тест ограничения размера запроса ===")
+
+    app = FastAPI()
+    app.add_middleware(UploadSizeLimitMiddleware, max_size=1000)
+
+    @app.post("/parse-excel/")
+    async def endpoint(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    client = TestClient(app)
+    small = client.post("/parse-excel/", files={"file": ("a.xlsx", b"x" * 500)})
+    assert small.json() == {"size": 500}
+
+    big = client.post("/parse-excel/", files={"file": ("a.xlsx", b"x" * 200_000)})
+    print(f"  {big.status_code}: {big.json()['detail']}")
+    assert big.status_code == 413
+
+    # Без Content-Length (передача частями) - обрывается по фактическому размеру
+    chunks = (b"x" * 10_000 for _ in range(20))
+    chunked = client.post("/parse-excel/", content=chunks,
+                          headers={"Content-Type": "multipart/form-data; boundary=b"})
+    assert chunked.status_code == 413
+
+def test_temp_files_removed():
+    """После ответа (обычного и потокового) временных файлов не остается"""
+    print("\n=== Тест удаления временных файлов ===")
+
+    content = workbook_bytes({"Прайс": ROWS})
+    client = TestClient(main.app)
+    original_dir = uploads.UPLOAD_DIR
+    with tempfile.TemporaryDirectory() as directory:
+        uploads.UPLOAD_DIR = directory
+        try:
+            assert client.post("/parse-excel/", files={"file": ("a.xlsx", content)}).status_code == 200
+            assert client.post("/parse-excel/?stream=1", files={"file": ("a.xlsx", content)}).status_code == 200
+            assert client.post("/parse-excel/", files={"file": ("a.xlsx", b"broken")}).status_code == 500
+            assert client.post("/parse-excel/?stream=1", files={"file": ("a.xlsx", b"broken")}).status_code == 500
+            assert os.listdir(directory) == []
+        finally:
+            uploads.UPLOAD_DIR = original_dir
+    print("  ✓ временные файлы удалены")
+
+if __name__ == "__main__":
+    test_copy_to_disk()
+    test_size_limit_middleware()
+    test_temp_files_removed()
+    print("\n✓ Все тесты завершены")
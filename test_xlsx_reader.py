@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Тест быстрого читателя .xlsx: значения как у openpyxl (read_only, data_only),
+общие строки, пропуски строк, выбор столбцов и переход на openpyxl
+"""
+
+import io
+import re
+import datetime
+import zipfile
+from openpyxl import load_workbook
+import excel_parser
+from excel_parser import PRICE_COLUMNS, ExcelParseError, iter_excel_rows, open_workbook
+from pipeline import run_pipeline_records
+from price_list_generator import generate_workbook
+from records import record_to_dict
+from xlsx_reader import UnsupportedXlsxError, XlsxWorkbook
+from workbook_fixtures import workbook_bytes
+
+def build_workbook() -> bytes:
+    """Книга с разными типами ячеек, пропусками строк и столбцов"""
+    return workbook_bytes({
+        "Прайс": [
+            ["Наименование", "Ед. изм.", "Цена", "Артикул", "Дата"],
+            ["  Кредо GL(1190,1125) ", "м2", "399оп//439гл", 1001, datetime.datetime(2024, 1, 2)],
+            ["Профнастил С-8", "м2", 362, 2.5, datetime.date(2024, 5, 6)],
+            ["Саморез\nкровельный", None, "-", True, "_x000D_"],
+            [],
+            [],
+            [None, "после пропуска"],
+            [None] * 8 + ["далеко справа"],
+            ["=1+2"],
+        ],
+        "Пустой": [],
+        "Склад": [["Профнастил С-8", "м2", "362 sf"]],
+    })
+
+SHARED_STRINGS_REL = (b'<Relationship Id="rId99" Target="sharedStrings.xml" Type='
+                      b'"http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" />')
+SHARED_STRINGS_TYPE = (b'<Override PartName="/xl/sharedStrings.xml" ContentType='
+                       b'"application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml" />')
+
+def rewrite(content: bytes, rewrite_part, added=None) -> bytes:
+    """Копия книги с измененными (и добавленными added) частями архива"""
+    source = zipfile.ZipFile(io.BytesIO(content))
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for item in source.infolist():
+            archive.writestr(item, rewrite_part(item.filename, source.read(item.filename)))
+        for name, data in (added or {}).items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+def to_shared_strings(content: bytes) -> bytes:
+    """
+    Строки ячеек (openpyxl пишет их как inlineStr) переносятся в таблицу
+    общих строк sharedStrings.xml, как в книгах Excel
+    """
+    strings = {}
+
+    def shared(match):
+        index = strings.setdefault(match.group(2), len(strings))
+        return b'<c r="%s" t="s"><v>%d</v></c>' % (match.group(1), index)
+
+    def rewrite_part(name, data):
+        if name.startswith("xl/worksheets/"):
+            return re.sub(rb'<c r="([A-Z]+\d+)" t="inlineStr"><is><t>(.*?)</t></is></c>', shared, data)
+        if name == "xl/_rels/workbook.xml.rels":
+            return data.replace(b"</Relationships>", SHARED_STRINGS_REL + b"</Relationships>")
+        if name == "[Content_Types].xml":
+            return data.replace(b"</Types>", SHARED_STRINGS_TYPE + b"</Types>")
+        return data
+
+    sheets = rewrite(content, rewrite_part)
+    table = b"".join(b"<si><t>%s</t></si>" % text for text in strings)
+    return rewrite(sheets, lambda name, data: data, {
+        "xl/sharedStrings.xml": b'<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">%s</sst>' % table
+    })
+
+def assert_same_rows(content: bytes):
+    expected = load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+    actual = XlsxWorkbook(io.BytesIO(content))
+    assert actual.sheetnames == expected.sheetnames
+    for expected_sheet, actual_sheet in zip(expected.worksheets, actual.worksheets):
+        assert actual_sheet.title == expected_sheet.title
+        for bounds in ({}, {"max_col": 3}, {"min_row": 3, "max_row": 5}, {"max_row": 20}):
+            assert list(actual_sheet.iter_rows(**bounds)) == \
+                list(expected_sheet.iter_rows(values_only=True, **bounds)), (actual_sheet.title, bounds)
+    actual.close()
+    expected.close()
+
+def test_values_match_openpyxl():
+    """Строки, типы значений, пропуски и границы листа - как у openpyxl"""
+    print("=== Тест значений быстрого читателя ===")
+
+    content = build_workbook()
+    assert_same_rows(content)
+    rows = list(XlsxWorkbook(io.BytesIO(content))["Прайс"].iter_rows(max_row=3, max_col=3))
+    print(f"  {rows}")
+    assert rows[2] == ("Профнастил С-8", "м2", 362)
+
+    # Без адресов ячеек и <dimension>, даты от 1904 года, общие строки и форматированный текст
+    without_refs = rewrite(content, lambda name, data: re.sub(rb' r="[A-Z]+\d+"|<dimension[^>]*/>', b"", data)
+                           if name.startswith("xl/worksheets/") else data)
+    assert_same_rows(without_refs)
+    date1904 = rewrite(content, lambda name, data: data.replace(b"<workbookPr />", b'<workbookPr date1904="1" />')
+                       if name == "xl/workbook.xml" else data)
+    assert_same_rows(date1904)
+    shared = to_shared_strings(content)
+    assert_same_rows(shared)
+    rich = rewrite(shared, lambda name, data: data.replace(
+        "<si><t>м2</t></si>".encode(),
+        "<si><r><t>м</t></r><r><rPr><b/></rPr><t>2</t></r><rPh sb=\"0\" eb=\"1\"><t>x</t></rPh></si>".encode())
+        if name == "xl/sharedStrings.xml" else data)
+    assert rich != shared
+    assert_same_rows(rich)
+
+def test_broken_dimension():
+    """<dimension> без ref или с неверным ref не мешает чтению: границы - по строкам"""
+    print("\n=== Тест поврежденного <dimension> ===")
+
+    content = build_workbook()
+
+    def with_dimension(dimension: bytes) -> bytes:
+        return rewrite(content, lambda name, data: re.sub(rb"<dimension[^>]*/>", dimension, data)
+                       if name.startswith("xl/worksheets/") else data)
+
+    expected = load_workbook(io.BytesIO(with_dimension(b"")), read_only=True, data_only=True)
+    for dimension in (b"<dimension />", b'<dimension ref="A1:" />'):
+        broken = with_dimension(dimension)
+        actual = XlsxWorkbook(io.BytesIO(broken))
+        for expected_sheet, actual_sheet in zip(expected.worksheets, actual.worksheets):
+            assert list(actual_sheet.iter_rows()) == list(expected_sheet.iter_rows(values_only=True)), dimension
+        actual.close()
+        assert list(iter_excel_rows(broken)) == list(iter_excel_rows(with_dimension(b""))), dimension
+    expected.close()
+
+def test_shared_strings_interned():
+    """Одинаковый текст в разных ячейках - один объект строки"""
+    print("\n=== Тест общих строк ===")
+
+    workbook = XlsxWorkbook(io.BytesIO(to_shared_strings(build_workbook())))
+    assert "м2" in workbook.shared_strings
+    first = next(iter(workbook["Прайс"].iter_rows(min_row=2, max_row=2)))[1]
+    second = next(iter(workbook["Склад"].iter_rows(max_row=1)))[1]
+    assert first == second == "м2" and first is second
+
+def test_fallback_to_openpyxl():
+    """Неподдерживаемая книга читается через openpyxl, поврежденный файл - ExcelParseError"""
+    print("\n=== Тест перехода на openpyxl ===")
+
+    content = build_workbook()
+    strict = rewrite(content, lambda name, data: data.replace(
+        b"http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+        b"http://purl.oclc.org/ooxml/spreadsheetml/main") if name == "xl/workbook.xml" else data)
+    try:
+        XlsxWorkbook(io.BytesIO(strict))
+        assert False, "ожидалась UnsupportedXlsxError"
+    except UnsupportedXlsxError as e:
+        print(f"  {e}")
+    assert not isinstance(open_workbook(strict), XlsxWorkbook)
+    assert isinstance(open_workbook(content), XlsxWorkbook)
+
+    broken = content[:len(content) // 2]
+    try:
+        list(iter_excel_rows(broken))
+        assert False, "ожидалась ExcelParseError"
+    except ExcelParseError as e:
+        print(f"  {e}")
+
+def test_pipeline_matches_openpyxl():
+    """Разбор книги генератора одинаков с быстрым читателем и без него"""
+    print("\n=== Тест разбора через быстрый читатель ===")
+
+    content = generate_workbook(sheets=3, rows=300, seed=7)
+    saved = excel_parser.XLSX_FAST_READER
+    try:
+        results = []
+        for fast in (True, False):
+            excel_parser.XLSX_FAST_READER = fast
+            results.append(([record_to_dict(v) for v in run_pipeline_records(content)],
+                            list(iter_excel_rows(content)), list(iter_excel_rows(content, options=PRICE_COLUMNS))))
+    finally:
+        excel_parser.XLSX_FAST_READER = saved
+    print(f"  вариантов: {len(results[0][0])}")
+    assert results[0] == results[1]
+
+if __name__ == "__main__":
+    test_values_match_openpyxl()
+    test_broken_dimension()
+    test_shared_strings_interned()
+    test_fallback_to_openpyxl()
+    test_pipeline_matches_openpyxl()
+    print("\n✓ Все тесты завершены")
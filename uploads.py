@@ -0,0 +1,128 @@
+"""
+Прием загружаемых файлов без копирования в память.
+Тело запроса ограничивается по размеру еще до разбора multipart,
+файл порциями переносится во временный файл на диске, и парсеры
+читают его по пути (openpyxl открывает .xlsx как zip-архив с диска)
+"""
+
+import hashlib
+import os
+import tempfile
+from typing import BinaryIO, Optional
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+# Максимальный размер загружаемого файла, МБ
+MAX_UPLOAD_SIZE_MB = float(os.getenv("MAX_UPLOAD_SIZE_MB", 100))
+MAX_UPLOAD_SIZE = int(MAX_UPLOAD_SIZE_MB * 1024 * 1024)
+
+# Каталог временных файлов (по умолчанию системный) и размер порции копирования
+UPLOAD_DIR = os.getenv("UPLOAD_DIR") or None
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Запас на заголовки multipart сверх размера файла
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def too_large_detail(max_size: int = MAX_UPLOAD_SIZE) -> str:
+    return f"Файл больше допустимого размера ({max_size / (1024 * 1024):g} МБ)"
+
+
+class UploadSizeLimitMiddleware:
+    """
+    ASGI-middleware: запросы с Content-Length больше лимита отклоняются с 413
+    до чтения тела, а при передаче без Content-Length чтение прерывается,
+    как только тело превысит лимит
+    """
+
+    def __init__(self, app, max_size: int = MAX_UPLOAD_SIZE, paths: tuple = ("/parse-excel", "/jobs")):
+        self.app = app
+        self.max_size = max_size
+        self.max_body_size = max_size + MULTIPART_OVERHEAD
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > self.max_body_size:
+                response = JSONResponse({"detail": too_large_detail(self.max_size)}, status_code=413)
+                await response(scope, receive, send)
+                return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    # Исключение пробрасывается FastAPI из разбора тела и становится ответом 413
+                    raise HTTPException(status_code=413, detail=too_large_detail(self.max_size))
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+class SpooledUpload:
+    """Загруженный файл на диске: путь, размер и SHA-256 содержимого"""
+
+    def __init__(self, path: str, size: int, sha256: str):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+
+    def remove(self):
+        """Удаляет временный файл (повторный вызов безопасен)"""
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def copy_to_disk(source: BinaryIO, suffix: str = "", max_size: int = MAX_UPLOAD_SIZE,
+                 directory: Optional[str] = None) -> SpooledUpload:
+    """
+    Копирует поток порциями во временный файл, считая размер и хэш;
+    при превышении max_size файл удаляется и возвращается 413
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.NamedTemporaryFile(prefix="upload-", suffix=suffix, dir=directory or UPLOAD_DIR,
+                                     delete=False) as target:
+        upload = SpooledUpload(target.name, 0, "")
+        try:
+            while True:
+                chunk = source.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(status_code=413, detail=too_large_detail(max_size))
+                digest.update(chunk)
+                target.write(chunk)
+        except BaseException:
+            target.close()
+            upload.remove()
+            raise
+
+    upload.size = size
+    upload.sha256 = digest.hexdigest()
+    return upload
+
+
+async def spool_upload(file: UploadFile, max_size: int = MAX_UPLOAD_SIZE,
+                       directory: Optional[str] = None) -> SpooledUpload:
+    """Переносит UploadFile во временный файл на диске (копирование - в пуле потоков)"""
+    suffix = os.path.splitext(file.filename or "")[1]
+    await file.seek(0)
+    try:
+        return await run_in_threadpool(copy_to_disk, file.file, suffix, max_size, directory)
+    finally:
+        await file.close()
+
@@ -0,0 +1,22 @@
+"""
+Книги .xlsx для тестов: строки листов задаются данными, файл собирается openpyxl
+"""
+
+import io
+from typing import Any, Dict, List
+from openpyxl import Workbook
+
+def workbook_bytes(sheets: Dict[str, List[List[Any]]]) -> bytes:
+    """
+    Книга {лист: [строки]} в порядке листов. Пустая строка [] оставляет
+    пропуск, None в строке - пустую ячейку
+    """
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    for title, rows in sheets.items():
+        sheet = workbook.create_sheet(title)
+        for row in rows:
+            sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
@@ -0,0 +1,337 @@
+"""
+Быстрое потоковое чтение .xlsx без объектной модели книги.
+Архив открывается zipfile, общие строки (sharedStrings.xml) читаются один раз
+в список интернированных строк (строки в ячейках - inlineStr - тоже интернируются), XML листа разбирается iterparse с удалением
+обработанных строк. Ячейки правее нужных столбцов пропускаются без разбора значений.
+
+По интерфейсу и значениям - как книга openpyxl в режиме read_only, data_only
+(sheetnames, worksheets, [имя], iter_rows(values_only=True), close), поэтому
+excel_parser читает через нее те же строки. Книги с нестандартной структурой
+(нет частей пакета, strict OOXML) вызывают UnsupportedXlsxError - такие книги
+читаются через openpyxl
+"""
+
+import posixpath
+import sys
+import zipfile
+from typing import BinaryIO, Dict, FrozenSet, Iterator, List, Optional, Tuple, Union
+from xml.etree.ElementTree import Element, iterparse, parse
+
+from openpyxl.styles.numbers import builtin_format_code, is_date_format
+from openpyxl.utils.cell import range_boundaries
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, WINDOWS_EPOCH, from_ISO8601, from_excel
+
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PACKAGE_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+WORKBOOK_TAG = f"{{{MAIN_NS}}}workbook"
+WORKBOOK_PR_TAG = f"{{{MAIN_NS}}}workbookPr"
+SHEET_TAG = f"{{{MAIN_NS}}}sheets/{{{MAIN_NS}}}sheet"
+DIMENSION_TAG = f"{{{MAIN_NS}}}dimension"
+SHEET_DATA_TAG = f"{{{MAIN_NS}}}sheetData"
+ROW_TAG = f"{{{MAIN_NS}}}row"
+VALUE_TAG = f"{{{MAIN_NS}}}v"
+INLINE_STRING_TAG = f"{{{MAIN_NS}}}is"
+TEXT_TAG = f"{{{MAIN_NS}}}t"
+RUN_TAG = f"{{{MAIN_NS}}}r"
+STRING_ITEM_TAG = f"{{{MAIN_NS}}}si"
+NUMBER_FORMAT_TAG = f"{{{MAIN_NS}}}numFmts/{{{MAIN_NS}}}numFmt"
+CELL_FORMAT_TAG = f"{{{MAIN_NS}}}cellXfs/{{{MAIN_NS}}}xf"
+RELATIONSHIP_TAG = f"{{{PACKAGE_REL_NS}}}Relationship"
+REL_ID = f"{{{REL_NS}}}id"
+
+OFFICE_DOCUMENT_TYPE = f"{REL_NS}/officeDocument"
+SHARED_STRINGS_TYPE = f"{REL_NS}/sharedStrings"
+STYLES_TYPE = f"{REL_NS}/styles"
+
+# Ячейка листа: значение или None (пустая)
+CellValue = Union[None, str, int, float, bool, object]
+
+
+class UnsupportedXlsxError(Exception):
+    """Книга не читается быстрым читателем - нужен openpyxl"""
+    pass
+
+
+def text_content(element: Element) -> str:
+    """
+    Текст строки (<si> или <is>): <t> и <t> фрагментов форматированного
+    текста <r>; фонетические подсказки <rPh> не входят (как в openpyxl)
+    """
+    parts = []
+    plain = element.findtext(TEXT_TAG)
+    if plain:
+        parts.append(plain)
+    for run in element.iterfind(RUN_TAG):
+        text = run.findtext(TEXT_TAG)
+        if text:
+            parts.append(text)
+    return "".join(parts)
+
+
+def read_shared_strings(source: BinaryIO) -> List[str]:
+    """
+    Таблица общих строк. Строки интернируются: ячейки с одинаковым текстом
+    ссылаются на один объект
+    """
+    strings = []
+    intern = sys.intern
+    root = None
+    for event, element in iterparse(source, events=("start", "end")):
+        if root is None:
+            root = element
+        elif event == "end" and element.tag == STRING_ITEM_TAG:
+            # openpyxl убирает экранирование x005F_ только в общих строках
+            strings.append(intern(text_content(element).replace("x005F_", "")))
+            root.clear()
+    return strings
+
+
+def read_date_styles(source: BinaryIO) -> FrozenSet[int]:
+    """Номера стилей ячеек (cellXfs) с форматом даты: такие числа - даты"""
+    root = parse(source).getroot()
+    custom = {int(fmt.get("numFmtId")): fmt.get("formatCode") for fmt in root.iterfind(NUMBER_FORMAT_TAG)}
+    date_styles = set()
+    for index, xf in enumerate(root.iterfind(CELL_FORMAT_TAG)):
+        format_id = int(xf.get("numFmtId", 0))
+        number_format = custom[format_id] if format_id in custom else builtin_format_code(format_id)
+        if is_date_format(number_format):
+            date_styles.add(index)
+    return frozenset(date_styles)
+
+
+def column_number(reference: str) -> int:
+    """Номер столбца с 1 по адресу ячейки (AB12 -> 28)"""
+    number = 0
+    for char in reference:
+        if char.isdigit():
+            break
+        number = number * 26 + ord(char) - 64
+    return number
+
+
+def row_number(value: str) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        number = float(value)
+        if not number.is_integer():
+            raise ValueError(f"{value} is not a valid row number")
+        return int(number)
+
+
+class XlsxWorksheet:
+    """Лист книги XlsxWorkbook"""
+
+    def __init__(self, workbook: "XlsxWorkbook", title: str, path: str):
+        self.parent = workbook
+        self.title = title
+        self.path = path
+
+    def iter_rows(self, min_row: Optional[int] = None, max_row: Optional[int] = None,
+                  max_col: Optional[int] = None, values_only: bool = True) -> Iterator[Tuple[CellValue, ...]]:
+        """
+        Значения строк с min_row по max_row (номера с 1), столбцы с первого по max_col.
+        Как openpyxl: пропущенные в XML строки отдаются пустыми, границы по
+        умолчанию берутся из <dimension> листа. Только значения (values_only)
+        """
+        return self.parent.iter_sheet_rows(self.path, min_row or 1, max_row, max_col)
+
+
+class XlsxWorkbook:
+    """
+    Книга .xlsx для потокового чтения значений ячеек. Открывает только описание
+    книги; общие строки и стили читаются при первом чтении листа
+    """
+
+    def __init__(self, source: Union[str, BinaryIO]):
+        try:
+            self._archive = zipfile.ZipFile(source)
+        except (zipfile.BadZipFile, OSError) as e:
+            raise UnsupportedXlsxError(f"Не zip-архив: {str(e)}")
+        try:
+            self._read_workbook()
+        except Exception as e:
+            self._archive.close()
+            if isinstance(e, UnsupportedXlsxError):
+                raise
+            raise UnsupportedXlsxError(f"Ошибка чтения описания книги: {str(e)}") from e
+        self._shared_strings: Optional[List[str]] = None
+        self._date_styles: Optional[FrozenSet[int]] = None
+
+    def _read_workbook(self):
+        files = set(self._archive.namelist())
+        package_rels = self._relationships("_rels/.rels", "")
+        workbook_paths = [path for rel_type, path in package_rels.values() if rel_type == OFFICE_DOCUMENT_TYPE]
+        if not workbook_paths or workbook_paths[0] not in files:
+            raise UnsupportedXlsxError("В архиве нет описания книги")
+        workbook_path = workbook_paths[0]
+
+        with self._archive.open(workbook_path) as source:
+            root = parse(source).getroot()
+        if root.tag != WORKBOOK_TAG:
+            raise UnsupportedXlsxError(f"Неподдерживаемый формат книги: {root.tag}")
+        properties = root.find(WORKBOOK_PR_TAG)
+        date1904 = properties is not None and properties.get("date1904") in ("1", "true")
+        self.epoch = CALENDAR_MAC_1904 if date1904 else WINDOWS_EPOCH
+
+        rels = self._relationships(
+            posixpath.join(posixpath.dirname(workbook_path), "_rels", posixpath.basename(workbook_path) + ".rels"),
+            posixpath.dirname(workbook_path))
+        # Листы в порядке книги; у листов-диаграмм нет ячеек (путь None)
+        self.sheetnames: List[str] = []
+        self._sheet_paths: Dict[str, Optional[str]] = {}
+        for sheet in root.iterfind(SHEET_TAG):
+            rel_id = sheet.get(REL_ID)
+            if not rel_id:
+                continue
+            rel_type, path = rels[rel_id]
+            if path not in files:
+                continue
+            name = sheet.get("name")
+            self.sheetnames.append(name)
+            self._sheet_paths[name] = None if "chartsheet" in rel_type else path
+
+        parts = {rel_type: path for rel_type, path in rels.values() if path in files}
+        self._shared_strings_path = parts.get(SHARED_STRINGS_TYPE)
+        self._styles_path = parts.get(STYLES_TYPE)
+
+    def _relationships(self, rels_path: str, base: str) -> Dict[str, Tuple[str, str]]:
+        """Связи части пакета: Id -> (тип, путь в архиве)"""
+        with self._archive.open(rels_path) as source:
+            root = parse(source).getroot()
+        rels = {}
+        for rel in root.iterfind(RELATIONSHIP_TAG):
+            target = rel.get("Target", "")
+            if target.startswith("/"):
+                path = target[1:]
+            else:
+                path = posixpath.normpath(posixpath.join(base, target))
+            rels[rel.get("Id")] = (rel.get("Type"), path)
+        return rels
+
+    @property
+    def worksheets(self) -> List[XlsxWorksheet]:
+        return [XlsxWorksheet(self, name, path) for name, path in self._sheet_paths.items() if path is not None]
+
+    def __getitem__(self, name: str) -> XlsxWorksheet:
+        path = self._sheet_paths.get(name)
+        if path is None:
+            raise KeyError(f"Worksheet {name} does not exist.")
+        return XlsxWorksheet(self, name, path)
+
+    @property
+    def shared_strings(self) -> List[str]:
+        if self._shared_strings is None:
+            self._shared_strings = []
+            if self._shared_strings_path is not None:
+                with self._archive.open(self._shared_strings_path) as source:
+                    self._shared_strings = read_shared_strings(source)
+        return self._shared_strings
+
+    @property
+    def date_styles(self) -> FrozenSet[int]:
+        if self._date_styles is None:
+            self._date_styles = frozenset()
+            if self._styles_path is not None:
+                with self._archive.open(self._styles_path) as source:
+                    self._date_styles = read_date_styles(source)
+        return self._date_styles
+
+    def close(self):
+        self._archive.close()
+
+    def iter_sheet_rows(self, path: str, min_row: int = 1, max_row: Optional[int] = None,
+                        max_col: Optional[int] = None) -> Iterator[Tuple[CellValue, ...]]:
+        """Строки листа по пути в архиве (семантика openpyxl ReadOnlyWorksheet.iter_rows)"""
+        shared_strings = self.shared_strings
+        date_styles = self.date_styles
+        with self._archive.open(path) as source:
+            events = iterparse(source, events=("start", "end"))
+            sheet_data = None
+            for event, element in events:
+                if event == "start":
+                    if element.tag == SHEET_DATA_TAG:
+                        sheet_data = element
+                        break
+                elif element.tag == DIMENSION_TAG and element.get("ref"):
+                    try:
+                        _, _, dimension_col, dimension_row = range_boundaries(element.get("ref"))
+                    except (TypeError, ValueError):
+                        # Поврежденный <dimension>: границы листа определяются по строкам
+                        continue
+                    max_col = max_col or dimension_col
+                    max_row = max_row or dimension_row
+            if sheet_data is None:
+                return
+
+            # Без границ столбцов пропущенная строка - пустой список, как в openpyxl
+            empty_row = (None,) * max_col if max_col else []
+            counter = min_row
+            index = 1
+            current = 0
+            for event, element in events:
+                if event != "end" or element.tag != ROW_TAG:
+                    continue
+                reference = element.get("r")
+                current = row_number(reference) if reference else current + 1
+                index = current
+                if max_row is not None and index > max_row:
+                    break
+                while counter < index:
+                    counter += 1
+                    yield empty_row
+                if counter <= index:
+                    yield self._row_values(element, max_col, shared_strings, date_styles)
+                    counter += 1
+                sheet_data.clear()
+
+            if max_row is not None and max_row < index:
+                for _ in range(counter, max_row + 1):
+                    yield empty_row
+
+    def _row_values(self, row: Element, max_col: Optional[int], shared_strings: List[str],
+                    date_styles: FrozenSet[int]) -> Tuple[CellValue, ...]:
+        """Значения ячеек строки по столбцам; ячейки правее max_col не разбираются"""
+        cells = []
+        column = 0
+        for cell in row:
+            reference = cell.get("r")
+            column = column_number(reference) if reference else column + 1
+            if max_col is not None and column > max_col:
+                continue
+
+            data_type = cell.get("t", "n")
+            if data_type == "inlineStr":
+                inline = cell.find(INLINE_STRING_TAG)
+                value = sys.intern(text_content(inline)) if inline is not None else None
+            else:
+                value = cell.findtext(VALUE_TAG) or None
+                if value is None:
+                    pass
+                elif data_type == "n":
+                    value = float(value) if "." in value or "E" in value or "e" in value else int(value)
+                    style = cell.get("s")
+                    if style and int(style) in date_styles:
+                        try:
+                            value = from_excel(value, self.epoch)
+                        except (OverflowError, ValueError):
+                            value = "#VALUE!"
+                elif data_type == "s":
+                    value = shared_strings[int(value)]
+                elif data_type == "b":
+                    value = bool(int(value))
+                elif data_type == "d":
+                    value = from_ISO8601(value)
+                # str (результат формулы) и e (ошибка) - строка как есть
+            cells.append((column, value))
+
+        if not cells and not max_col:
+            return ()
+        width = max_col or cells[-1][0]
+        values = [None] * width
+        for column, value in cells:
+            if 1 <= column <= width:
+                values[column - 1] = value
+        return tuple(values)